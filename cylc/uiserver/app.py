@@ -73,6 +73,7 @@ log-file viewer. To enable Cylc Review, add the following to your
 """
 
 from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import getpass
 import os
 from pathlib import (
@@ -92,7 +93,9 @@ from packaging.version import Version
 from tornado import ioloop
 from tornado.web import RedirectHandler
 from traitlets import (
+    Bool,
     Dict,
+    Enum,
     Float,
     Int,
     Unicode,
@@ -104,9 +107,7 @@ from traitlets import (
 )
 from traitlets.config.loader import LazyConfigValue
 
-from cylc.flow.network.graphql import (
-    CylcExecutionContext, IgnoreFieldMiddleware
-)
+from cylc.flow.network.graphql import IgnoreFieldMiddleware
 from cylc.uiserver import __file__ as uis_pkg
 from cylc.uiserver.authorise import (
     Authorization,
@@ -117,8 +118,9 @@ from cylc.uiserver.config_util import (
     USER_CONF_ROOT,
     get_conf_dir_hierarchy,
 )
-from cylc.uiserver.data_store_mgr import DataStoreMgr
+from cylc.uiserver.data_store_mgr import SUBSCRIBER_MODES, DataStoreMgr
 from cylc.uiserver.handlers import (
+    CylcMetricsHandler,
     CylcStaticHandler,
     CylcVersionHandler,
     SubscriptionHandler,
@@ -128,8 +130,18 @@ from cylc.uiserver.handlers import (
 from cylc.uiserver.profilers import get_profiler
 from cylc.uiserver.resolvers import Resolvers
 from cylc.uiserver.schema import schema
+from cylc.uiserver.graphql.document_cache import DocumentCache
+from cylc.uiserver.graphql.encoders import JSON_ENCODERS, get_json_encoder
+from cylc.uiserver.graphql.execution import UIServerExecutionContext
+from cylc.uiserver.graphql.persisted_queries import (
+    MANIFEST_FILE,
+    PersistedQueries,
+)
 from cylc.uiserver.graphql.tornado_ws import TornadoSubscriptionServer
-from cylc.uiserver.workflows_mgr import WorkflowsManager
+from cylc.uiserver.workflows_mgr import (
+    WORKFLOW_DISCOVERY_MODES,
+    WorkflowsManager,
+)
 
 
 INFO_FILES_DIR = Path(USER_CONF_ROOT / "info_files")
@@ -336,6 +348,122 @@ class CylcUIServer(ExtensionApp):
         ''',
         default_value=5.0  # default values as kwargs correctly display in docs
     )
+    adaptive_scan_interval = Bool(
+        config=True,
+        help='''
+            Adapt the interval between workflow scans to the rate of change.
+
+            Scans are performed every ``min_scan_interval`` seconds after a
+            workflow is started, stopped or cleaned (or a change is detected),
+            the interval then backs off exponentially towards
+            ``max_scan_interval`` whilst nothing changes. Slow scans also
+            increase the interval to limit filesystem load.
+
+            If set, ``scan_interval`` is not used.
+        ''',
+        default_value=False,
+    )
+    min_scan_interval = Float(
+        config=True,
+        help='''
+            The minimum interval between workflow scans in seconds when
+            ``adaptive_scan_interval`` is set.
+        ''',
+        default_value=1.0,
+    )
+    max_scan_interval = Float(
+        config=True,
+        help='''
+            The maximum interval between workflow scans in seconds when
+            ``adaptive_scan_interval`` is set.
+        ''',
+        default_value=60.0,
+    )
+    max_concurrent_connects = Int(
+        config=True,
+        help='''
+            Limit the number of workflows the server connects to at once.
+
+            Connecting to a workflow involves loading its entire data store.
+            Connecting to many workflows at once (e.g. when the server starts)
+            can make the server unresponsive for some time. Workflows
+            waiting to connect are shown as "connecting", on startup the
+            most recently active workflows are connected first.
+
+            Set to 0 for no limit.
+        ''',
+        default_value=0,
+    )
+    workflow_discovery = Enum(
+        WORKFLOW_DISCOVERY_MODES,
+        config=True,
+        help='''
+            Determines how the server detects workflows which have been
+            installed, started, stopped or removed.
+
+            Options:
+                scan:
+                    Scan the run directory every ``scan_interval`` seconds.
+                inotify:
+                    Watch the run directory and workflow contact files for
+                    changes (Linux only). Only the directories which have
+                    changed are rescanned. A full scan is performed every
+                    ``full_scan_interval`` seconds as a safety net.
+
+                    Falls back to ``scan`` if the run directory cannot be
+                    watched.
+
+                    Note, on network filesystems (e.g. NFS) inotify does
+                    not see changes made from other hosts, e.g. workflows
+                    started on other hosts, these are only detected by the
+                    full scan.
+        ''',
+        default_value='scan',
+    )
+    scan_cache = Bool(
+        config=True,
+        help='''
+            Cache workflow contact information between scans.
+
+            Contact files are only re-read (and parsed) if the workflow's
+            service directory (or contact file) has changed since the last
+            scan.
+
+            This saves reading contact files only, the service directory is
+            still listed (and it and the contact file stat'ed) on every
+            scan so that network filesystems (e.g. NFS) refresh any cached
+            directory metadata and workflows started on other hosts are
+            detected.
+        ''',
+        default_value=False,
+    )
+    full_scan_interval = Float(
+        config=True,
+        help='''
+            Set the interval between full workflow scans in seconds when
+            ``workflow_discovery`` is set to ``inotify``.
+
+            The full scan detects changes which inotify cannot see, e.g.
+            changes made from other hosts on network filesystems (NFS).
+            If workflows are run on other hosts, set this to the
+            ``scan_interval`` you would otherwise use.
+        ''',
+        default_value=300.0,
+    )
+    mutation_deadline = Float(
+        config=True,
+        allow_none=True,
+        help='''
+            The time allowed for a mutation to be sent to all of the
+            workflows it targets in seconds.
+
+            Requests to workflows which do not respond in time fail with a
+            timeout error (the responses from other workflows are still
+            returned). By default (None) there is no overall deadline, each
+            request is subject to the client timeout only.
+        ''',
+        default_value=None,
+    )
     max_workers = Int(
         config=True,
         help='''
@@ -348,11 +476,210 @@ class CylcUIServer(ExtensionApp):
         help='''
             Set the maximum number of threads the Cylc UI Server can use.
 
-            This determines the maximum number of active workflows that the
-            server can track.
+            If ``subscriber_mode`` is set to ``threads``, this determines the
+            maximum number of active workflows that the server can track.
         ''',
         default_value=100,
     )
+    subscriber_mode = Enum(
+        SUBSCRIBER_MODES,
+        config=True,
+        help='''
+            Determines how the server subscribes to updates from active
+            workflows.
+
+            Options:
+                threads:
+                    Each subscription is run in its own thread (see
+                    ``max_threads``).
+                multiplexed:
+                    Subscriptions are run as tasks on a small, fixed pool of
+                    event loops (see ``subscriber_loops``). There is no limit
+                    to the number of active workflows that can be tracked.
+        ''',
+        default_value='threads',
+    )
+    subscriber_loops = Int(
+        config=True,
+        help='''
+            Set the number of event loops (each with its own thread) used to
+            run workflow subscriptions in the ``multiplexed`` subscriber mode.
+        ''',
+        default_value=1,
+    )
+    delta_coalesce_window = Float(
+        config=True,
+        help='''
+            Merge workflow updates which arrive within this many seconds of
+            each other before sending them to the GUI (0 to disable).
+
+            Busy workflows can send many small updates per second, merging
+            them reduces the work done for each connected client at the
+            expense of a small delay. Values in the range 0.1 - 0.5 are
+            sensible.
+        ''',
+        default_value=0.,
+    )
+    delta_inbox_size = Int(
+        config=True,
+        help='''
+            Set the maximum number of updates from a workflow which may be
+            waiting to be applied.
+
+            If a workflow sends updates faster than they can be applied,
+            the pending updates are dropped and the entire workflow is
+            requested again, which is expensive for large workflows.
+            Increase this if short bursts of updates trigger these resyncs
+            (see the ``deltas`` server metrics).
+        ''',
+        default_value=DataStoreMgr.INBOX_SIZE,
+    )
+    lazy_subscriptions = Bool(
+        config=True,
+        help='''
+            Only subscribe to the full data of workflows which are being
+            viewed.
+
+            Other running workflows are tracked at summary level (status,
+            task state totals, etc.) which is refreshed periodically. The
+            full subscription is started when a client first requests a
+            workflow's detailed data and is torn down after
+            ``subscription_idle_timeout``.
+
+            This reduces the load on the UI Server and schedulers when many
+            workflows are running.
+        ''',
+        default_value=False,
+    )
+    subscription_idle_timeout = Float(
+        config=True,
+        help='''
+            With ``lazy_subscriptions``, stop the full subscription to a
+            workflow once its data has not been requested for this many
+            seconds.
+        ''',
+        default_value=300.,
+    )
+    subscription_cache_size = Int(
+        config=True,
+        help='''
+            Set the number of serialised subscription results to keep for
+            sharing between identical subscriptions (0 to disable).
+
+            When several clients (e.g. browser tabs) subscribe to the same
+            workflow with the same query, each update is only resolved and
+            encoded once.
+        ''',
+        default_value=100,
+    )
+    document_cache_size = Int(
+        config=True,
+        help='''
+            Set the number of parsed and validated GraphQL queries to keep
+            (0 to disable).
+
+            The UI sends the same few queries many times, caching them
+            saves parsing and validating each one on every request.
+        ''',
+        default_value=200,
+    )
+    persisted_queries = Bool(
+        config=True,
+        help='''
+            Allow clients to send the hash of a query rather than the query
+            itself ("automatic persisted queries").
+
+            Unknown hashes are learned when the client resends the full
+            query. Queries listed in the UI build's
+            ``persisted-query-manifest.json`` are known in advance.
+
+            If disabled, requests which use persisted queries are rejected
+            (``PERSISTED_QUERY_NOT_SUPPORTED``) and the client falls back to
+            sending the full query.
+        ''',
+        default_value=False,
+    )
+    persisted_query_cache_size = Int(
+        config=True,
+        help='''
+            Set the number of persisted queries learned from clients to
+            keep.
+        ''',
+        default_value=1000,
+    )
+    json_encoder = Enum(
+        JSON_ENCODERS,
+        config=True,
+        help='''
+            The JSON encoder used for GraphQL (HTTP) responses.
+
+            Options:
+                json:
+                    The Python standard library encoder.
+                orjson:
+                    The orjson encoder, this is considerably faster for
+                    large responses. Requires the orjson package.
+
+                    Note, orjson encodes some values differently, e.g.
+                    NaN and Infinity are encoded as ``null``.
+                auto:
+                    Use orjson if it is installed, else json.
+        ''',
+        default_value='json',
+    )
+    compression_level = Int(
+        config=True,
+        help='''
+            The zlib compression level (1-9) for GraphQL (HTTP) responses,
+            0 to disable compression.
+
+            Responses are compressed (gzip or deflate) when the client
+            accepts it. This reduces the amount of data sent at the cost of
+            CPU time on the server, it is most useful where the network
+            between the server and the browser is slow. Higher levels may
+            produce smaller responses at the cost of more CPU time.
+        ''',
+        default_value=0,
+    )
+    response_chunk_size = Int(
+        config=True,
+        help='''
+            Write GraphQL (HTTP) responses to the client in chunks of this
+            many characters.
+
+            Responses are encoded (as JSON) in full, this only controls how
+            the encoded response is compressed and flushed to the client.
+        ''',
+        default_value=65536,
+    )
+    batch_concurrency = Int(
+        config=True,
+        help='''
+            The maximum number of queries in a GraphQL batch request
+            (``/cylc/graphql/batch``) to execute at once.
+
+            Consecutive queries are executed concurrently, mutations are
+            always executed one at a time, in the order they were sent.
+            By default (1), all entries are executed sequentially.
+        ''',
+        default_value=1,
+    )
+    websocket_compression_level = Int(
+        config=True,
+        help='''
+            The zlib compression level (1-9) for GraphQL subscription
+            (websocket) messages, 0 to disable compression.
+
+            Messages are compressed using the "permessage-deflate" websocket
+            extension when the client supports it. Subscription updates are
+            repetitive so compress well, even at low levels, at the cost of
+            CPU time on the server.
+
+            Ignored if ``c.ServerApp.websocket_compression_options`` is
+            set, in which case those options are used.
+        ''',
+        default_value=0,
+    )
     profile = Unicode(
         config=True,
         help='''
@@ -378,6 +705,13 @@ class CylcUIServer(ExtensionApp):
 
                     Results will be saved to
                     ~/.cylc/uiserver/cylc.flow.main_loop.log_memory.pdf.
+
+                    The memory used by stopped workflows is also logged.
+                track_delta_lag
+                    Log the backlog and lag of updates from workflows.
+
+                    These metrics are also available from the
+                    ``/cylc/metrics`` endpoint.
         ''',
         default_value='',
     )
@@ -461,11 +795,22 @@ class CylcUIServer(ExtensionApp):
         super().__init__(*args, **kwargs)
         self._config_file_paths: Optional[List[str]] = None
         self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
-        self.workflows_mgr = WorkflowsManager(self, log=self.log)
+        self.workflows_mgr = WorkflowsManager(
+            self,
+            log=self.log,
+            scan_cache=self.scan_cache,
+            connect_limit=self.max_concurrent_connects,
+        )
         self.data_store_mgr = DataStoreMgr(
             self.workflows_mgr,
             self.log,
             self.max_threads,
+            subscriber_mode=self.subscriber_mode,
+            subscriber_loops=self.subscriber_loops,
+            delta_coalesce_window=self.delta_coalesce_window,
+            lazy=self.lazy_subscriptions,
+            idle_timeout=self.subscription_idle_timeout,
+            inbox_size=self.delta_inbox_size,
         )
         # sub_status dictionary storing status of subscriptions
         self.sub_statuses = {}
@@ -524,14 +869,46 @@ class CylcUIServer(ExtensionApp):
         ioloop.IOLoop.current().add_callback(
             self.workflows_mgr.run
         )
+        ioloop.IOLoop.current().add_callback(self.start_workflow_discovery)
+
+    async def start_workflow_discovery(self):
+        """Start watching or periodically scanning for workflow changes."""
+        scan_interval = self.scan_interval
+        if (
+            self.workflow_discovery == 'inotify'
+            and await self.workflows_mgr.watch()
+        ):
+            # the scan is only a safety net
+            scan_interval = self.full_scan_interval
+        elif self.adaptive_scan_interval:
+            self.workflows_mgr.schedule_scans(
+                self.min_scan_interval, self.max_scan_interval
+            )
+            return
         # configure the scan interval
         ioloop.PeriodicCallback(
-            self.workflows_mgr.scan,
-            self.scan_interval * 1000
+            partial(self.workflows_mgr.scan, full=True),
+            scan_interval * 1000
         ).start()
 
     def initialize_handlers(self):
         self.authobj = self.set_auth()
+        # (this validates the schema)
+        self.document_cache = DocumentCache(
+            schema.graphql_schema, self.document_cache_size
+        )
+        self.query_registry = PersistedQueries(
+            self.persisted_queries, self.persisted_query_cache_size
+        )
+        manifest = Path(self.ui_path, MANIFEST_FILE)
+        if self.persisted_queries and manifest.exists():
+            try:
+                count = self.query_registry.load(manifest)
+            except (OSError, ValueError, AttributeError) as exc:
+                self.log.warning(f'Could not load {manifest}: {exc}')
+            else:
+                self.log.info(f'Loaded {count} persisted queries')
+        json_encoder = get_json_encoder(self.json_encoder)
         self.set_sub_server()
 
         self.handlers.extend([
@@ -550,8 +927,13 @@ class CylcUIServer(ExtensionApp):
                         AuthorizationMiddleware,
                         IgnoreFieldMiddleware
                     ],
-                    'execution_context_class': CylcExecutionContext,
+                    'execution_context_class': UIServerExecutionContext,
                     'auth': self.authobj,
+                    'document_cache': self.document_cache,
+                    'persisted_queries': self.query_registry,
+                    'json_encoder': json_encoder,
+                    'compression_level': self.compression_level,
+                    'chunk_size': self.response_chunk_size,
                 }
             ),
             (
@@ -564,9 +946,15 @@ class CylcUIServer(ExtensionApp):
                         AuthorizationMiddleware,
                         IgnoreFieldMiddleware
                     ],
-                    'execution_context_class': CylcExecutionContext,
+                    'execution_context_class': UIServerExecutionContext,
                     'batch': True,
+                    'batch_concurrency': self.batch_concurrency,
                     'auth': self.authobj,
+                    'document_cache': self.document_cache,
+                    'persisted_queries': self.query_registry,
+                    'json_encoder': json_encoder,
+                    'compression_level': self.compression_level,
+                    'chunk_size': self.response_chunk_size,
                 }
             ),
             (
@@ -575,7 +963,8 @@ class CylcUIServer(ExtensionApp):
                 {
                     'sub_server': self.subscription_server,
                     'resolvers': self.resolvers,
-                    'sub_statuses': self.sub_statuses
+                    'sub_statuses': self.sub_statuses,
+                    'compression_level': self.websocket_compression_level,
                 }
             ),
             (
@@ -583,6 +972,11 @@ class CylcUIServer(ExtensionApp):
                 UserProfileHandler,
                 {'auth': self.authobj}
             ),
+            (
+                'cylc/metrics',
+                CylcMetricsHandler,
+                {'auth': self.authobj, 'metrics': self.get_metrics}
+            ),
             (
                 'cylc/(.*)?',
                 CylcStaticHandler,
@@ -601,6 +995,18 @@ class CylcUIServer(ExtensionApp):
             )
         ])
 
+    def get_metrics(self) -> dict:
+        """Return performance metrics for monitoring."""
+        return {
+            'deltas': self.data_store_mgr.get_delta_stats(),
+            'coalescing': self.data_store_mgr.get_coalescing_stats(),
+            'scan': self.workflows_mgr.get_scan_stats(),
+            'requests': self.workflows_mgr.get_request_stats(),
+            'subscriptions': self.data_store_mgr.get_subscription_stats(),
+            'documents': self.document_cache.stats(),
+            'persisted_queries': self.query_registry.stats(),
+        }
+
     def set_sub_server(self):
         self.subscription_server = TornadoSubscriptionServer(
             schema,
@@ -608,8 +1014,11 @@ class CylcUIServer(ExtensionApp):
                 IgnoreFieldMiddleware,
                 AuthorizationMiddleware,
             ],
-            execution_context_class=CylcExecutionContext,
+            execution_context_class=UIServerExecutionContext,
             auth=self.authobj,
+            result_cache_size=self.subscription_cache_size,
+            document_cache=self.document_cache,
+            persisted_queries=self.query_registry,
         )
 
     def set_auth(self) -> Authorization:
@@ -655,12 +1064,8 @@ class CylcUIServer(ExtensionApp):
         # stop the async scan task
         await self.workflows_mgr.stop()
 
-        # stop active subscriptions
-        for sub in self.data_store_mgr.w_subs.values():
-            sub.stop()
-
-        # Shutdown the thread pool executor (used for subscription processing)
-        self.data_store_mgr.executor.shutdown(wait=False)
+        # stop active subscriptions and the threads/loops running them
+        self.data_store_mgr.stop_subscriptions()
 
         # stop the process pool (used for background commands)
         self.executor.shutdown()
@@ -25,26 +25,59 @@ deleted) then a checksum is generated from the time stamped IDs and compared to
 the published one.
 
 Reconciliation on failed verification is done by requesting all elements of a
-topic, and replacing the respective data-store elements with this.
+topic, and replacing the respective data-store elements with this. Reconciles
+are run in the main loop (see ReconcileScheduler), deltas for the topic are
+held back until they complete.
 
-Subscriptions are currently run in a different thread (via ThreadPoolExecutor).
+Subscriptions are run outside of the main loop, either as tasks multiplexed
+onto a small, fixed pool of subscriber event loops (the "multiplexed" mode), or
+with one thread per workflow (via ThreadPoolExecutor, the "threads" mode).
+
+As the data-store is read from the main loop whilst deltas are being applied
+in subscriber threads, changes are made copy-on-write and swapped in
+atomically (see DataStoreMgr._apply_delta), so readers need not lock.
+Writes to a workflow's data-store may come from its subscriber thread and the
+main loop (e.g. reconciles, contact file updates), so writers hold the
+workflow's write lock (see DataStoreMgr.write_lock).
 
 """
 
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from copy import deepcopy
+from bisect import bisect_left, insort
+from collections import deque
+from collections.abc import Mapping, MutableMapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import count
 from pathlib import Path
+from threading import Event, Lock, RLock, Thread
 import time
-from typing import TYPE_CHECKING, Dict, Optional, Set, cast
+from types import MappingProxyType
+from typing import (
+    Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+)
+import zlib
+
+import zmq
 
-from cylc.flow.exceptions import WorkflowStopped
+from cylc.flow.data_messages_pb2 import PbWorkflow
+from cylc.flow.exceptions import ClientError, ClientTimeout, WorkflowStopped
 from cylc.flow.id import Tokens
 from cylc.flow.network.server import PB_METHOD_MAP
 from cylc.flow.network.subscriber import WorkflowSubscriber, process_delta_msg
 from cylc.flow.data_store_mgr import (
-    EDGES, DATA_TEMPLATE, ALL_DELTAS, DELTAS_MAP, WORKFLOW,
-    apply_delta, generate_checksum, create_delta_store
+    ALL_DELTAS,
+    CLEAR_FIELD_MAP,
+    DATA_TEMPLATE,
+    DELTAS_MAP,
+    EDGES,
+    FAMILIES,
+    FAMILY_PROXIES,
+    JOBS,
+    TASKS,
+    TASK_PROXIES,
+    WORKFLOW,
+    apply_delta,
+    create_delta_store,
 )
 from cylc.flow.workflow_files import (
     ContactFileFields as CFF,
@@ -56,8 +89,11 @@ from cylc.flow.workflow_status import WorkflowStatus
 from .utils import fmt_call
 from .workflows_mgr import workflow_request
 
-if TYPE_CHECKING:
-    from cylc.flow.data_messages_pb2 import PbWorkflow
+SUBSCRIBER_MODES = ('multiplexed', 'threads')
+
+# Key under which each queued delta-store is stamped with a serial number,
+# this allows the results of identical subscriptions to be shared.
+DELTA_SERIAL = 'delta_serial'
 
 
 def log_call(fcn):
@@ -74,6 +110,614 @@ def log_call(fcn):
     return _inner
 
 
+class SubscriberLoopPool:
+    """A fixed pool of event loops for running workflow subscriptions.
+
+    Each loop runs in its own (daemon) thread. Subscriptions are submitted to
+    the loops round-robin and run as tasks, so any number of workflows can be
+    followed by a fixed number of threads.
+
+    Args:
+        size:
+            The number of event loops (and threads) in the pool.
+
+    """
+
+    def __init__(self, size: int = 1):
+        self.size = max(1, size)
+        self.loops: List[asyncio.AbstractEventLoop] = []
+        self.threads: List[Thread] = []
+        self._next = 0
+
+    def _start(self) -> None:
+        """Start the event loop threads."""
+        for ind in range(self.size):
+            loop = asyncio.new_event_loop()
+            thread = Thread(
+                target=loop.run_forever,
+                name=f'cylc-subscriber-{ind}',
+                daemon=True,
+            )
+            thread.start()
+            self.loops.append(loop)
+            self.threads.append(thread)
+
+    def submit(self, coro) -> Future:
+        """Run a coroutine as a task on one of the loops in the pool.
+
+        Returns:
+            A thread-safe future, cancel this to cancel the task.
+
+        """
+        if not self.loops:
+            self._start()
+        loop = self.loops[self._next % self.size]
+        self._next += 1
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def shutdown(self, timeout: float = 1.) -> None:
+        """Stop the event loops and wait for their threads to exit."""
+        for loop in self.loops:
+            loop.call_soon_threadsafe(loop.stop)
+        for thread in self.threads:
+            thread.join(timeout)
+        self.loops.clear()
+        self.threads.clear()
+
+
+def clone_element(element):
+    """Return a copy of a data-store element (protobuf message)."""
+    new_element = type(element)()
+    new_element.CopyFrom(element)
+    return new_element
+
+
+class WorkflowStoreFactory:
+    """Create new workflow data-stores.
+
+    This builds stores from the fixed DATA_TEMPLATE schema directly, which is
+    much cheaper than deepcopying the template.
+
+    Examples:
+        >>> new_store = WorkflowStoreFactory()
+        >>> store = new_store()
+        >>> store == DATA_TEMPLATE
+        True
+        >>> store['jobs'] is new_store()['jobs']
+        False
+
+    """
+
+    TOPICS = (EDGES, FAMILIES, FAMILY_PROXIES, JOBS, TASKS, TASK_PROXIES)
+
+    def __init__(self):
+        if {*self.TOPICS, WORKFLOW} != set(DATA_TEMPLATE):
+            raise ValueError(
+                'The data-store schema has changed:'
+                f' {", ".join(sorted(DATA_TEMPLATE))}'
+            )
+
+    def __call__(
+        self,
+        workflow: Optional[PbWorkflow] = None,
+        delta_times: Optional[Dict[str, float]] = None,
+    ) -> dict:
+        """Return a new workflow store.
+
+        Args:
+            workflow: The workflow summary (a new one is created if None).
+            delta_times: The delta times (omitted if None).
+
+        """
+        store = {
+            EDGES: {},
+            FAMILIES: {},
+            FAMILY_PROXIES: {},
+            JOBS: {},
+            TASKS: {},
+            TASK_PROXIES: {},
+            WORKFLOW: PbWorkflow() if workflow is None else workflow,
+        }
+        if delta_times is not None:
+            store['delta_times'] = delta_times
+        return store
+
+
+new_workflow_store = WorkflowStoreFactory()
+
+
+# shared (read-only) stand-in for the topics of compact workflow stores
+EMPTY_TOPIC: Mapping = MappingProxyType({})
+
+
+class CompactWorkflowStore(MutableMapping):
+    """Memory-compact data-store for a workflow which has never been connected.
+
+    Stopped workflows only show their workflow summary (PbWorkflow), so
+    rather than holding a copy of DATA_TEMPLATE for each, this holds only the
+    summary and the delta times. Other topics read as a shared, empty,
+    read-only mapping until written to.
+
+    Call ``expand`` to convert to a normal data-store (a dict).
+
+    Examples:
+        >>> store = CompactWorkflowStore()
+        >>> store['workflow'].id = '~u/a'
+        >>> dict(store['task_proxies'])
+        {}
+        >>> len(store.expand()) == len(store)
+        True
+
+    """
+
+    __slots__ = ('workflow', 'delta_times', 'topics')
+
+    KEYS = (*DATA_TEMPLATE, 'delta_times')
+
+    def __init__(self):
+        self.workflow = PbWorkflow()
+        self.delta_times = {WORKFLOW: 0.0}
+        # topics which have been written to
+        self.topics: Optional[dict] = None
+
+    def __getitem__(self, key):
+        if key == WORKFLOW:
+            return self.workflow
+        if key == 'delta_times':
+            return self.delta_times
+        if self.topics and key in self.topics:
+            return self.topics[key]
+        if key in DATA_TEMPLATE:
+            return EMPTY_TOPIC
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == WORKFLOW:
+            self.workflow = value
+        elif key == 'delta_times':
+            self.delta_times = value
+        elif key in DATA_TEMPLATE:
+            if self.topics is None:
+                self.topics = {}
+            self.topics[key] = value
+        else:
+            raise KeyError(key)
+
+    def __delitem__(self, key):
+        raise TypeError('Data-store topics cannot be deleted')
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def expand(self) -> dict:
+        """Return the equivalent (full) data-store."""
+        data = new_workflow_store(self.workflow, self.delta_times)
+        data.update(self.topics or {})
+        return data
+
+
+ADLER_BASE = 65521  # largest prime smaller than 65536
+
+
+def adler32_combine(adler1: int, adler2: int, len2: int) -> int:
+    """Combine two Adler-32 checksums.
+
+    Port of the zlib function of the same name.
+
+    Args:
+        adler1: Checksum of the first sequence.
+        adler2: Checksum of the second sequence.
+        len2: Length of the second sequence (in bytes).
+
+    Returns:
+        The checksum of the two sequences concatenated.
+
+    Examples:
+        >>> foo, bar = zlib.adler32(b'foo'), zlib.adler32(b'bar')
+        >>> adler32_combine(foo, bar, 3) == zlib.adler32(b'foobar')
+        True
+
+    """
+    rem = len2 % ADLER_BASE
+    sum1 = adler1 & 0xffff
+    sum2 = (rem * sum1) % ADLER_BASE
+    sum1 += (adler2 & 0xffff) + ADLER_BASE - 1
+    sum2 += (
+        ((adler1 >> 16) & 0xffff)
+        + ((adler2 >> 16) & 0xffff)
+        + ADLER_BASE
+        - rem
+    )
+    if sum1 >= ADLER_BASE:
+        sum1 -= ADLER_BASE
+    if sum1 >= ADLER_BASE:
+        sum1 -= ADLER_BASE
+    if sum2 >= (ADLER_BASE << 1):
+        sum2 -= (ADLER_BASE << 1)
+    if sum2 >= ADLER_BASE:
+        sum2 -= ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+class TopicChecksum:
+    """Incrementally maintain the checksum of a data-store topic.
+
+    Produces the same result as ``generate_checksum`` (the Adler-32 checksum
+    of the sorted, concatenated strings) but adding or removing a string costs
+    O(chunk size) rather than sorting and hashing the whole set.
+
+    The sorted strings are held in chunks, each of which caches its own
+    Adler-32 checksum and length, the checksum of the whole set is then
+    obtained by combining the chunk checksums. Only chunks which have changed
+    are rehashed.
+
+    Args:
+        strings:
+            The initial strings (e.g. the element stamps).
+
+    Examples:
+        >>> from cylc.flow.data_store_mgr import generate_checksum
+        >>> checksum = TopicChecksum(['b', 'c'])
+        >>> checksum.add('a')
+        >>> checksum.value == generate_checksum(['a', 'b', 'c'])
+        True
+        >>> checksum.remove('b')
+        >>> checksum.value == generate_checksum(['a', 'c'])
+        True
+
+    """
+
+    CHUNK_SIZE = 200
+
+    def __init__(self, strings: Iterable[str] = ()):
+        self._chunks: List[List[str]] = []
+        self._maxes: List[str] = []
+        # (checksum, length) of each chunk, None if the chunk has changed
+        self._sums: List[Optional[tuple]] = []
+        self._value: Optional[int] = None
+        self.reset(strings)
+
+    def reset(self, strings: Iterable[str]) -> None:
+        """Rebuild from scratch."""
+        lst = sorted(strings)
+        self._chunks = [
+            lst[ind:ind + self.CHUNK_SIZE]
+            for ind in range(0, len(lst), self.CHUNK_SIZE)
+        ]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._sums = [None] * len(self._chunks)
+        self._value = None
+
+    @staticmethod
+    def _chunk_sum(chunk: List[str]) -> tuple:
+        data = ''.join(chunk).encode()
+        return (zlib.adler32(data), len(data))
+
+    def add(self, string: str) -> None:
+        """Add a string to the set."""
+        if not self._chunks:
+            self._chunks.append([string])
+            self._maxes.append(string)
+            self._sums.append(None)
+            self._value = None
+            return
+        ind = min(bisect_left(self._maxes, string), len(self._maxes) - 1)
+        chunk = self._chunks[ind]
+        insort(chunk, string)
+        self._maxes[ind] = chunk[-1]
+        if len(chunk) > self.CHUNK_SIZE * 2:
+            # split oversized chunks
+            half = chunk[self.CHUNK_SIZE:]
+            del chunk[self.CHUNK_SIZE:]
+            self._chunks.insert(ind + 1, half)
+            self._maxes[ind] = chunk[-1]
+            self._maxes.insert(ind + 1, half[-1])
+            self._sums.insert(ind + 1, None)
+        self._sums[ind] = None
+        self._value = None
+
+    def remove(self, string: str) -> None:
+        """Remove a string from the set (if present)."""
+        ind = bisect_left(self._maxes, string)
+        if ind == len(self._maxes):
+            return
+        chunk = self._chunks[ind]
+        pos = bisect_left(chunk, string)
+        if pos == len(chunk) or chunk[pos] != string:
+            return
+        del chunk[pos]
+        if chunk:
+            self._maxes[ind] = chunk[-1]
+            self._sums[ind] = None
+        else:
+            del self._chunks[ind]
+            del self._maxes[ind]
+            del self._sums[ind]
+        self._value = None
+
+    @property
+    def value(self) -> int:
+        """The checksum of the set."""
+        if self._value is None:
+            value = zlib.adler32(b'')
+            for ind, sums in enumerate(self._sums):
+                if sums is None:
+                    # (re)compute the checksums of changed chunks
+                    sums = self._sums[ind] = self._chunk_sum(
+                        self._chunks[ind]
+                    )
+                value = adler32_combine(value, *sums)
+            self._value = value & 0xffffffff
+        return self._value
+
+
+class DeltaInbox:
+    """Bounded inbox of deltas awaiting application for one workflow.
+
+    This is used by the subscriber loop only, the statistics may be read from
+    any thread.
+
+    Args:
+        maxlen: The maximum number of deltas held.
+
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self.deltas: Deque[Tuple[str, object]] = deque()
+        self.scheduled = False
+        self.received = 0
+        self.applied = 0
+        self.resyncs = 0
+        self.max_depth = 0
+        # publish-to-applied lag (seconds)
+        self.lag = 0.
+        self.max_lag = 0.
+
+    def put(self, topic: str, delta: object) -> bool:
+        """Add a delta to the inbox, return False if the inbox is full."""
+        if len(self.deltas) >= self.maxlen:
+            return False
+        self.deltas.append((topic, delta))
+        self.received += 1
+        self.max_depth = max(self.max_depth, len(self.deltas))
+        return True
+
+    def clear(self) -> None:
+        """Drop all deltas for a full resync."""
+        self.deltas.clear()
+        self.resyncs += 1
+
+    def record_applied(self, delta) -> None:
+        """Record the application of a delta (and the lag if known)."""
+        self.applied += 1
+        publish_time = max(
+            (
+                getattr(sub_delta, 'time', 0.)
+                for _, sub_delta in getattr(delta, 'ListFields', list)()
+            ),
+            default=0.,
+        )
+        if publish_time:
+            self.lag = max(0., time.time() - publish_time)
+            self.max_lag = max(self.max_lag, self.lag)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'depth': len(self.deltas),
+            'max_depth': self.max_depth,
+            'lag': self.lag,
+            'max_lag': self.max_lag,
+            'received': self.received,
+            'applied': self.applied,
+            'resyncs': self.resyncs,
+        }
+
+
+class DeltaCoalescer:
+    """Merge consecutive AllDeltas messages of a workflow into one.
+
+    The merged delta has the same effect as applying the deltas in order:
+
+    * Elements updated several times result in a single update.
+    * Elements added then updated result in a single (updated) addition.
+    * Elements added then pruned are dropped altogether.
+    * A reloaded topic delta replaces any pending changes to the topic.
+
+    Deltas are added from subscriber threads and flushed from wherever, so
+    the lock should be held whilst using this object.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        # set when a flush has been scheduled for the pending changes
+        self.scheduled = False
+        # {topic: {'added': ..., 'updated': ..., 'pruned': ..., ...}}
+        self.topics: Dict[str, dict] = {}
+        # the number of deltas received/published since the last flush
+        self.pending = 0
+        # the total number of deltas received/published
+        self.received = 0
+        self.published = 0
+
+    @staticmethod
+    def _merge_update(element, update, topic):
+        """Merge an updated element into another, as apply_delta would."""
+        field_set = {field.name for field, _ in update.ListFields()}
+        for field in CLEAR_FIELD_MAP[topic]:
+            if field in field_set or (
+                topic == WORKFLOW and update.states_updated
+            ):
+                element.ClearField(field)
+        element.MergeFrom(update)
+
+    def add(self, delta) -> None:
+        """Merge an AllDeltas message into the pending changes."""
+        self.received += 1
+        self.pending += 1
+        for field, sub_delta in delta.ListFields():
+            topic = field.name
+            if sub_delta.reloaded or topic not in self.topics:
+                self.topics[topic] = {
+                    'added': None if topic == WORKFLOW else {},
+                    'updated': None if topic == WORKFLOW else {},
+                    'pruned': None if topic == WORKFLOW else {},
+                    'reloaded': False,
+                    'time': 0.0,
+                    'checksum': None,
+                }
+            pending = self.topics[topic]
+            pending['reloaded'] |= sub_delta.reloaded
+            pending['time'] = sub_delta.time
+            if topic == WORKFLOW:
+                self._add_workflow(pending, sub_delta)
+            else:
+                pending['checksum'] = sub_delta.checksum
+                self._add_elements(pending, sub_delta, topic)
+
+    def _add_workflow(self, pending, sub_delta):
+        if sub_delta.HasField('added'):
+            # replaces any previous changes
+            pending['added'] = clone_element(sub_delta.added)
+            pending['updated'] = None
+        if sub_delta.HasField('updated'):
+            if pending['updated'] is None:
+                pending['updated'] = clone_element(sub_delta.updated)
+            else:
+                self._merge_update(
+                    pending['updated'], sub_delta.updated, WORKFLOW
+                )
+        if sub_delta.pruned:
+            pending['pruned'] = sub_delta.pruned
+
+    def _add_elements(self, pending, sub_delta, topic):
+        added, updated, pruned = (
+            pending['added'], pending['updated'], pending['pruned']
+        )
+        for element in sub_delta.added:
+            # replaces any previous changes
+            added[element.id] = clone_element(element)
+            updated.pop(element.id, None)
+            pruned.pop(element.id, None)
+        for element in sub_delta.updated:
+            if element.id in added:
+                self._merge_update(added[element.id], element, topic)
+            elif element.id in updated:
+                self._merge_update(updated[element.id], element, topic)
+            elif element.id not in pruned:
+                updated[element.id] = clone_element(element)
+        for e_id in sub_delta.pruned:
+            updated.pop(e_id, None)
+            if added.pop(e_id, None) is None:
+                pruned[e_id] = None
+
+    def pop(self):
+        """Return the merged delta (or None) and reset the pending changes."""
+        self.scheduled = False
+        if not self.pending:
+            return None
+        delta = DELTAS_MAP[ALL_DELTAS]()
+        for topic, pending in self.topics.items():
+            sub_delta = getattr(delta, topic)
+            sub_delta.time = pending['time']
+            sub_delta.reloaded = pending['reloaded']
+            if topic == WORKFLOW:
+                if pending['added'] is not None:
+                    sub_delta.added.CopyFrom(pending['added'])
+                if pending['updated'] is not None:
+                    sub_delta.updated.CopyFrom(pending['updated'])
+                if pending['pruned']:
+                    sub_delta.pruned = pending['pruned']
+                continue
+            if pending['checksum'] is not None:
+                sub_delta.checksum = pending['checksum']
+            sub_delta.added.extend(pending['added'].values())
+            sub_delta.updated.extend(pending['updated'].values())
+            sub_delta.pruned.extend(pending['pruned'])
+        self.topics.clear()
+        self.pending = 0
+        self.published += 1
+        return delta
+
+
+class ReconcileScheduler:
+    """Schedule topic reconciles, holding back deltas whilst they are pending.
+
+    Reconciles are deduplicated per (workflow, topic) and rate limited to one
+    per interval. Deltas received for a topic with a pending reconcile are
+    held and applied once it has completed.
+
+    Args:
+        interval: Minimum time between reconciles of a topic (seconds).
+
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lock = Lock()
+        # held deltas for pending reconciles {(w_id, topic): [delta, ...]}
+        self.held: Dict[Tuple[str, str], List[object]] = {}
+        # time of the last reconcile {(w_id, topic): time}
+        self.last_run: Dict[Tuple[str, str], float] = {}
+        self.requested = 0
+        self.deduplicated = 0
+
+    def request(self, key: Tuple[str, str]) -> Optional[float]:
+        """Register a reconcile.
+
+        Returns:
+            The delay (seconds) before the reconcile may run, or None if a
+            reconcile is already pending for this topic.
+
+        """
+        with self.lock:
+            if key in self.held:
+                self.deduplicated += 1
+                return None
+            self.held[key] = []
+            self.requested += 1
+            last_run = self.last_run.get(key)
+            if last_run is None:
+                return 0.
+            return max(0., last_run + self.interval - time.time())
+
+    def hold(self, key: Tuple[str, str], delta: object) -> bool:
+        """Hold back a delta if a reconcile is pending for its topic."""
+        with self.lock:
+            held = self.held.get(key)
+            if held is None:
+                return False
+            held.append(delta)
+            return True
+
+    def complete(self, key: Tuple[str, str], apply) -> None:
+        """Mark a reconcile as complete.
+
+        Args:
+            key: The (workflow, topic) reconciled.
+            apply: Function called with the held deltas (in order of
+                receipt). This is called under the lock so no further deltas
+                are held or applied for the topic until it returns.
+
+        """
+        with self.lock:
+            try:
+                apply(self.held.get(key, []))
+            finally:
+                self.held.pop(key, None)
+                self.last_run[key] = time.time()
+
+    def discard(self, w_id: str) -> None:
+        """Forget about a workflow."""
+        with self.lock:
+            for store in (self.held, self.last_run):
+                for key in [key for key in store if key[0] == w_id]:
+                    del store[key]
+
+
 class DataStoreMgr:
     """Manage the local data-store acquisition/updates for all workflows.
 
@@ -83,30 +727,118 @@ class DataStoreMgr:
         log:
             Application logger.
         max_threads:
-            Max number of threads to use for subscriptions.
+            Max number of threads to use for subscriptions in the "threads"
+            subscriber mode.
+
+            Note, in this mode, this determines the maximum number of active
+            workflows that can be updated.
 
-            Note, this determines the maximum number of active workflows that
-            can be updated.
+            This should be overridden for real use in the UIS app. The
+            default is here for test purposes.
+        subscriber_mode:
+            How workflow subscriptions are run:
+
+            multiplexed:
+                Run each subscription as a task on a small, fixed pool of
+                subscriber event loops.
+            threads:
+                Run each subscription in its own thread (with its own
+                event loop).
 
             This should be overridden for real use in the UIS app. The
             default is here for test purposes.
+        subscriber_loops:
+            The number of event loops (threads) to use in the "multiplexed"
+            subscriber mode.
+        delta_coalesce_window:
+            Deltas received within this many seconds of each other are merged
+            before being pushed to GraphQL subscriptions (0 to disable).
+        lazy:
+            Only subscribe to a workflow's data when it is requested, until
+            then only the workflow summary is tracked (see connect_workflow).
+        idle_timeout:
+            In lazy mode, return workflows to summary level when their data
+            has not been requested for this many seconds.
+        inbox_size:
+            The max number of deltas awaiting application for a workflow,
+            beyond this the deltas are dropped and the entire workflow
+            requested again (resync). Set this large enough to absorb
+            bursts of updates.
 
     """
 
-    INIT_DATA_WAIT_CHECKS = 30  # check attempts
-    INIT_DATA_RETRY_DELAY = 0.5  # seconds
+    INIT_DATA_BUFFER_SIZE = 100  # max deltas held awaiting initial data
+    INBOX_SIZE = 500  # max deltas awaiting application before a resync
+    INBOX_BATCH_SIZE = 20  # max deltas applied before yielding the loop
     RECONCILE_TIMEOUT = 5.  # seconds
+    RECONCILE_INTERVAL = 10.  # min seconds between reconciles of a topic
+    MAX_RECONCILES = 5  # max concurrent reconcile requests
     PENDING_DELTA_CHECK_INTERVAL = 0.5
+    PARSE_WORKERS = 4  # threads for parsing entire workflow dumps
+    SUMMARY_INTERVAL = 10.  # seconds between summary-level workflow updates
+    DEMAND_TIMEOUT = 10.  # max seconds a query waits for workflow data
 
-    def __init__(self, workflows_mgr, log, max_threads=10):
+    def __init__(
+        self,
+        workflows_mgr,
+        log,
+        max_threads=10,
+        subscriber_mode='threads',
+        subscriber_loops=1,
+        delta_coalesce_window=0.,
+        lazy=False,
+        idle_timeout=300.,
+        inbox_size=INBOX_SIZE,
+    ):
+        if subscriber_mode not in SUBSCRIBER_MODES:
+            raise ValueError(
+                f'Invalid subscriber mode: {subscriber_mode}'
+                f'\nValid options: {", ".join(SUBSCRIBER_MODES)}'
+            )
         self.workflows_mgr = workflows_mgr
         self.log = log
         self.data = {}
         self.w_subs: Dict[str, WorkflowSubscriber] = {}
         self.topics = {ALL_DELTAS.encode('utf-8'), b'shutdown'}
         self.loop = None
+        self.subscriber_mode = subscriber_mode
         self.executor = ThreadPoolExecutor(max_threads)
+        self.subscriber_pool = SubscriberLoopPool(subscriber_loops)
+        # multiplexed subscription tasks
+        self.w_sub_tasks: Dict[str, Future] = {}
         self.delta_queues = {}
+        # running checksums {w_id: {topic: TopicChecksum}}
+        self.checksums: Dict[str, Dict[str, TopicChecksum]] = {}
+        # held by writers to each workflow's data-store {w_id: RLock}
+        self.write_locks: Dict[str, RLock] = {}
+        # set when the initial data for a connecting workflow has arrived
+        self.init_data_ready: Dict[str, Event] = {}
+        # deltas received before the initial data {w_id: [(topic, delta)]}
+        self.early_deltas: Dict[str, Deque[Tuple[str, object]]] = {}
+        # deltas awaiting application
+        self.inboxes: Dict[str, DeltaInbox] = {}
+        self.inbox_size = inbox_size
+        self.delta_coalesce_window = delta_coalesce_window
+        self.coalescers: Dict[str, DeltaCoalescer] = {}
+        self.delta_serials = count()
+        self.reconciler = ReconcileScheduler(self.RECONCILE_INTERVAL)
+        self.reconcile_limit = asyncio.Semaphore(self.MAX_RECONCILES)
+        self.reconcile_tasks: Set[asyncio.Task] = set()
+        # for parsing entire workflow dumps off the main loop
+        self.parse_executor = ThreadPoolExecutor(
+            self.PARSE_WORKERS, thread_name_prefix='cylc-parse'
+        )
+        self.lazy = lazy
+        self.idle_timeout = idle_timeout
+        # workflows tracked at summary level only (lazy mode)
+        self.summaries: Set[str] = set()
+        # number of GraphQL subscriptions holding each workflow's data
+        self.demand: Dict[str, int] = {}
+        # time each workflow's data was last requested
+        self.last_demand: Dict[str, float] = {}
+        # workflows being upgraded from summary level to full subscription
+        self.upgrades: Dict[str, asyncio.Task] = {}
+        self.summary_task: Optional[asyncio.Task] = None
 
     @log_call
     async def register_workflow(self, w_id: str, is_active: bool) -> None:
@@ -117,9 +849,10 @@ class DataStoreMgr:
         """
         self.delta_queues[w_id] = {}
 
-        # create new entry in the data store
-        data = deepcopy(DATA_TEMPLATE)
-        self.data[w_id] = data
+        # create new entry in the data store, this is compact until the
+        # workflow is connected
+        self.data[w_id] = CompactWorkflowStore()
+        self.checksums.pop(w_id, None)
 
         # create new entry in the delta store
         self._update_contact(
@@ -128,6 +861,10 @@ class DataStoreMgr:
             status_msg=self._get_status_msg(w_id, is_active),
         )
 
+    def set_status_msg(self, w_id: str, status_msg: str) -> None:
+        """Update the status message of a workflow."""
+        self._update_contact(w_id, status_msg=status_msg)
+
     @log_call
     async def unregister_workflow(self, w_id):
         """Remove a workflow from the data store entirely.
@@ -149,29 +886,48 @@ class DataStoreMgr:
 
         Call this when a workflow has started.
 
-        Subscriptions and sync management is instantiated and run in
-        a separate thread for each workflow. This is to avoid the sync loop
+        Subscriptions and sync management are run outside of the main loop,
+        either as a task on a subscriber loop, or in a separate thread,
+        depending on the subscriber mode. This is to avoid the sync loop
         blocking the main loop.
 
+        In lazy mode, workflows whose data has not been requested are only
+        tracked at summary level, the subscription is started when the data
+        is requested (see request_data, hold_data).
+
         """
         if self.loop is None:
             self.loop = asyncio.get_running_loop()
 
+        if self.lazy and not self._in_demand(w_id):
+            return await self._connect_summary(w_id)
+        self.summaries.discard(w_id)
+
         # don't sync if subscription exists
-        if w_id in self.w_subs:
+        if w_id in self.w_subs or (
+            w_id in self.w_sub_tasks and not self.w_sub_tasks[w_id].done()
+        ):
             return
 
         self.delta_queues[w_id] = {}
+        self._expand_workflow(w_id)
+        # hold back deltas until the initial data has arrived
+        self.init_data_ready[w_id] = Event()
+        self.early_deltas[w_id] = deque(maxlen=self.INIT_DATA_BUFFER_SIZE)
+        self.inboxes[w_id] = DeltaInbox(self.inbox_size)
 
-        # Might be options other than threads to achieve
-        # non-blocking subscriptions, but this works.
-        self.executor.submit(
-            self._start_subscription,
+        sub_args = (
             w_id,
             contact_data['name'],
             contact_data[CFF.HOST],
             contact_data[CFF.PUBLISH_PORT]
         )
+        if self.subscriber_mode == 'multiplexed':
+            self.w_sub_tasks[w_id] = self.subscriber_pool.submit(
+                self._subscribe(*sub_args)
+            )
+        else:
+            self.executor.submit(self._start_subscription, *sub_args)
         successful_updates = await self._entire_workflow_update(ids=[w_id])
 
         if w_id not in successful_updates:
@@ -181,6 +937,210 @@ class DataStoreMgr:
             self.disconnect_workflow(w_id)
             return False
 
+        # the data-store has been replaced, make subscribers re-register
+        # so that they receive it (initial burst)
+        self.delta_queues[w_id] = {}
+
+    async def _connect_summary(self, w_id):
+        """Track a running workflow at summary level only.
+
+        The workflow summary (PbWorkflow) is requested now and periodically
+        thereafter, no subscription is made to the workflow.
+        """
+        self.summaries.add(w_id)
+        if not await self._update_summary(w_id):
+            self.log.info(f'failed to connect to {w_id}')
+            self.disconnect_workflow(w_id)
+            return False
+        if self.summary_task is None:
+            self.summary_task = asyncio.create_task(self._summary_loop())
+
+    async def _update_summary(self, w_id) -> bool:
+        """Request the summary of a summary-level workflow.
+
+        Returns:
+            False if the workflow could not be contacted.
+
+        """
+        client = self.workflows_mgr.workflows.get(w_id, {}).get('req_client')
+        if not client:
+            return False
+        try:
+            result = await workflow_request(
+                client,
+                'pb_data_elements',
+                {'element_type': WORKFLOW},
+                log=self.log,
+            )
+        except (ClientError, ClientTimeout):
+            return False
+        store = self.data.get(w_id)
+        if w_id not in self.summaries or store is None:
+            # the workflow has since been upgraded or disconnected
+            return True
+        w_delta = DELTAS_MAP[WORKFLOW]()
+        w_delta.ParseFromString(result)
+        summary = w_delta.added
+        if (
+            summary.last_updated
+            and summary.last_updated == store[WORKFLOW].last_updated
+        ):
+            # nothing has changed
+            return True
+        delta = DELTAS_MAP[ALL_DELTAS]()
+        delta.workflow.time = time.time()
+        delta.workflow.updated.CopyFrom(summary)
+        delta.workflow.updated.stamp = f'{w_id}@{delta.workflow.time}'
+        self._apply_all_delta(w_id, delta)
+        self._delta_store_to_queues(w_id, ALL_DELTAS, delta)
+        return True
+
+    async def _summary_loop(self):
+        """Update summary-level workflows and release idle workflows."""
+        while True:
+            await asyncio.sleep(self.SUMMARY_INTERVAL)
+            try:
+                # (iterate over snapshots, these are modified by connects,
+                # disconnects and releases)
+                await asyncio.gather(*(
+                    self._update_summary(w_id)
+                    for w_id in list(self.summaries)
+                ))
+                for w_id in {*self.w_subs, *self.w_sub_tasks}:
+                    if (
+                        w_id not in self.upgrades
+                        and not self._in_demand(w_id)
+                    ):
+                        self._release_workflow(w_id)
+            except Exception as exc:
+                self.log.exception(exc)
+
+    def _in_demand(self, w_id) -> bool:
+        """Return True if the data of a workflow has been requested."""
+        return bool(
+            self.demand.get(w_id)
+            or (
+                time.time() - self.last_demand.get(w_id, 0.)
+                < self.idle_timeout
+            )
+        )
+
+    def _upgrade_workflow(self, w_id) -> Optional[asyncio.Task]:
+        """Start the full subscription of a summary-level workflow.
+
+        Returns:
+            The upgrade task if the workflow is being upgraded.
+
+        """
+        if w_id in self.summaries and w_id not in self.upgrades:
+            task = asyncio.create_task(self._upgrade(w_id))
+            self.upgrades[w_id] = task
+            task.add_done_callback(
+                lambda _: self.upgrades.pop(w_id, None)
+            )
+        return self.upgrades.get(w_id)
+
+    async def _upgrade(self, w_id):
+        flow = self.workflows_mgr.workflows.get(w_id)
+        if not flow or not flow.get('req_client'):
+            return
+        self.log.info(f'[data-store] subscribing to {w_id} (requested)')
+        await self.connect_workflow(w_id, flow)
+
+    def _release_workflow(self, w_id):
+        """Return an idle workflow to summary level."""
+        self.log.info(f'[data-store] unsubscribing from {w_id} (idle)')
+        self.disconnect_workflow(w_id, update_contact=False)
+        if w_id not in self.data:
+            return
+        # drop everything but the workflow summary
+        with self.write_lock(w_id):
+            store = CompactWorkflowStore()
+            store[WORKFLOW] = self.data[w_id][WORKFLOW]
+            store['delta_times'] = {
+                WORKFLOW: self.data[w_id]['delta_times'].get(WORKFLOW, 0.)
+            }
+            self.data[w_id] = store
+        self.checksums.pop(w_id, None)
+        self.coalescers.pop(w_id, None)
+        self.reconciler.discard(w_id)
+        # make subscribers re-register so that they drop the data
+        self.delta_queues[w_id] = {}
+        self.summaries.add(w_id)
+
+    async def request_data(self, w_ids: Iterable[str]) -> None:
+        """Ensure the data of workflows is available (e.g. for a query).
+
+        In lazy mode this starts the subscription of any summary-level
+        workflows and waits (up to DEMAND_TIMEOUT) for their data to arrive.
+        """
+        if not self.lazy:
+            return
+        now = time.time()
+        tasks = []
+        for w_id in w_ids:
+            self.last_demand[w_id] = now
+            task = self._upgrade_workflow(w_id)
+            if task:
+                tasks.append(task)
+        if tasks:
+            await asyncio.wait(tasks, timeout=self.DEMAND_TIMEOUT)
+
+    def hold_data(self, w_ids: Iterable[str]) -> None:
+        """Hold the data of workflows (e.g. for a GraphQL subscription).
+
+        In lazy mode this starts the subscription of any summary-level
+        workflows, the data is retained until released (see release_data).
+        """
+        if not self.lazy:
+            return
+        for w_id in w_ids:
+            self.demand[w_id] = self.demand.get(w_id, 0) + 1
+            self._upgrade_workflow(w_id)
+
+    def release_data(self, w_ids: Iterable[str]) -> None:
+        """Release data held by hold_data.
+
+        The data is retained until idle_timeout has elapsed.
+        """
+        if not self.lazy:
+            return
+        now = time.time()
+        for w_id in w_ids:
+            self.last_demand[w_id] = now
+            if self.demand.get(w_id, 0) > 1:
+                self.demand[w_id] -= 1
+            else:
+                self.demand.pop(w_id, None)
+
+    def get_subscription_stats(self) -> Dict[str, int]:
+        """Return the number of workflows by subscription level."""
+        return {
+            'full': len({*self.w_subs, *self.w_sub_tasks}),
+            'summary': len(self.summaries),
+            'held': len(self.demand),
+        }
+
+    def write_lock(self, w_id) -> RLock:
+        """Return the lock to hold whilst writing to a workflow's store.
+
+        Readers do not need this (changes are swapped in atomically), but
+        writers do, else two writers cloning the same element would each
+        discard the other's changes.
+
+        If both are needed, take this before the ReconcileScheduler lock.
+        """
+        lock = self.write_locks.get(w_id)
+        if lock is None:
+            lock = self.write_locks.setdefault(w_id, RLock())
+        return lock
+
+    def _expand_workflow(self, w_id):
+        """Convert a compact workflow data-store to a full one."""
+        data = self.data.get(w_id)
+        if isinstance(data, CompactWorkflowStore):
+            self.data[w_id] = data.expand()
+
     @log_call
     def disconnect_workflow(self, w_id, update_contact=True):
         """Terminate workflow subscriptions.
@@ -203,10 +1163,41 @@ class DataStoreMgr:
                 status=WorkflowStatus.STOPPED.value,
                 status_msg=disconnect_msg,
             )
-        if w_id in self.w_subs:
+        self.summaries.discard(w_id)
+        self.init_data_ready.pop(w_id, None)
+        if w_id in self.early_deltas:
+            self.early_deltas.pop(w_id).clear()
+        self.inboxes.pop(w_id, None)
+        if w_id in self.w_sub_tasks:
+            # the task closes the subscription in its own loop
+            self.w_sub_tasks.pop(w_id).cancel()
+            self.w_subs.pop(w_id, None)
+        elif w_id in self.w_subs:
             self.w_subs[w_id].stop()
             del self.w_subs[w_id]
 
+    def stop_subscriptions(self):
+        """Stop all workflow subscriptions.
+
+        Call this on shutdown.
+        """
+        for w_id, sub in list(self.w_subs.items()):
+            if w_id not in self.w_sub_tasks:
+                # (multiplexed subscriptions are stopped by their task)
+                sub.stop()
+        for task in self.w_sub_tasks.values():
+            task.cancel()
+        self.w_sub_tasks.clear()
+        for task in self.reconcile_tasks:
+            task.cancel()
+        if self.summary_task is not None:
+            self.summary_task.cancel()
+        for task in list(self.upgrades.values()):
+            task.cancel()
+        self.subscriber_pool.shutdown()
+        self.executor.shutdown(wait=False)
+        self.parse_executor.shutdown(wait=False)
+
     def get_workflows(self):
         """Return all workflows the data store is currently tracking.
 
@@ -217,7 +1208,7 @@ class DataStoreMgr:
         """
         active = set()
         inactive = set()
-        for w_id, workflow in self.data.items():
+        for w_id, workflow in list(self.data.items()):
             status = getattr(workflow.get('workflow'), 'status', 'stopped')
             if status == 'stopped':
                 inactive.add(w_id)
@@ -235,6 +1226,12 @@ class DataStoreMgr:
             del self.data[w_id]
         if w_id in self.delta_queues:
             del self.delta_queues[w_id]
+        self.checksums.pop(w_id, None)
+        self.coalescers.pop(w_id, None)
+        self.inboxes.pop(w_id, None)
+        self.write_locks.pop(w_id, None)
+        self.reconciler.discard(w_id)
+        self.last_demand.pop(w_id, None)
 
     def _start_subscription(self, w_id, reg, host, port):
         """Instantiate and run subscriber data-store sync.
@@ -253,78 +1250,530 @@ class DataStoreMgr:
             context=self.workflows_mgr.context,
             topics=self.topics
         )
+        self._schedule_early_delta_replay(w_id)
         self.w_subs[w_id].loop.run_until_complete(
             self.w_subs[w_id].subscribe(
                 process_delta_msg,
                 func=self._update_workflow_data,
                 w_id=w_id))
 
+    async def _subscribe(self, w_id, reg, host, port):
+        """Run a subscriber data-store sync as a task on a subscriber loop.
+
+        Unlike WorkflowSubscriber.subscribe, this awaits messages rather than
+        polling for them so that many subscriptions can share a loop.
+
+        Args:
+            w_id (str): Workflow external ID.
+            reg (str): Registered workflow name.
+            host (str): Hostname of target workflow.
+            port (int): Port of target workflow.
+
+        """
+        try:
+            # the subscriber adopts the running (subscriber) loop
+            sub = WorkflowSubscriber(
+                reg,
+                host=host,
+                port=port,
+                context=self.workflows_mgr.context,
+                topics=self.topics
+            )
+        except Exception as exc:
+            self.log.error(f'Could not subscribe to {w_id}: {exc}')
+            return
+        self.w_subs[w_id] = sub
+        self._schedule_early_delta_replay(w_id)
+        try:
+            while not sub.stopping:
+                topic, msg = await sub.socket.recv_multipart()
+                process_delta_msg(
+                    topic, msg, func=self._update_workflow_data, w_id=w_id
+                )
+        except asyncio.CancelledError:
+            pass
+        except zmq.ZMQError as exc:
+            if not sub.stopping:
+                self.log.error(f'Subscription to {w_id} failed: {exc}')
+        finally:
+            # don't stop the loop, it's shared with other subscriptions
+            sub.stop(stop_loop=False)
+            if self.w_subs.get(w_id) is sub:
+                del self.w_subs[w_id]
+
+    def _set_init_data_ready(self, w_id):
+        """Signal that the initial data for a workflow has arrived.
+
+        Any deltas received in the meantime are replayed (in the subscriber's
+        own thread).
+        """
+        ready = self.init_data_ready.get(w_id)
+        if ready is not None and not ready.is_set():
+            ready.set()
+            self._schedule_early_delta_replay(w_id)
+
+    def _schedule_early_delta_replay(self, w_id):
+        """Replay early deltas in the subscriber loop if the data is ready.
+
+        Note: This is called both when the initial data arrives and when the
+        subscriber starts as either may happen first.
+        """
+        ready = self.init_data_ready.get(w_id)
+        sub = self.w_subs.get(w_id)
+        if (
+            ready is not None
+            and ready.is_set()
+            and sub is not None
+            and sub.loop is not None
+            and not sub.loop.is_closed()
+        ):
+            sub.loop.call_soon_threadsafe(self._replay_early_deltas, w_id)
+
+    def _replay_early_deltas(self, w_id):
+        """Apply, in order, the deltas received before the initial data."""
+        early_deltas = self.early_deltas.get(w_id)
+        while early_deltas:
+            topic, delta = early_deltas.popleft()
+            self._process_delta(topic, delta, w_id)
+
     def _update_workflow_data(self, topic, delta, w_id):
         """Manage and apply incoming data-store deltas.
 
+        Deltas received before the initial data has arrived are held back
+        (up to INIT_DATA_BUFFER_SIZE, the oldest are dropped beyond this),
+        and replayed when it does. Deltas which pre-date the initial data are
+        ignored, errors will be reconciled with data validation.
+
+        Otherwise, deltas are put in the workflow's inbox and applied in
+        batches by the subscriber loop. If the inbox fills up (i.e. we can't
+        keep up with the workflow) it is dropped and the entire workflow
+        requested again (see _resync_workflow).
+
         Args:
             topic (str): topic of published data.
             delta (object): Published protobuf message data container.
             w_id (str): Workflow external ID.
 
         """
-        # Wait until data-store is populated for this workflow,
-        # carry on otherwise, errors will be reconciled with data validation.
-        if self.data[w_id][WORKFLOW].last_updated == 0:
-            loop_cnt = 0
-            while loop_cnt < self.INIT_DATA_WAIT_CHECKS:
-                if self.data[w_id][WORKFLOW].last_updated > 0:
-                    break
-                time.sleep(self.INIT_DATA_RETRY_DELAY)
-                loop_cnt += 1
-                continue
+        ready = self.init_data_ready.get(w_id)
+        if ready is not None and not ready.is_set():
+            early_deltas = self.early_deltas.get(w_id)
+            if early_deltas is not None:
+                if len(early_deltas) == early_deltas.maxlen:
+                    self.log.debug(
+                        f'Delta buffer full for {w_id}, dropping oldest.'
+                    )
+                early_deltas.append((topic, delta))
+            return
+        self._replay_early_deltas(w_id)
+        inbox = self.inboxes.get(w_id)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if inbox is None or loop is None:
+            self._process_delta(topic, delta, w_id)
+            return
+        if not inbox.put(topic, delta):
+            self._overload(w_id, inbox, ready)
+            return
+        if not inbox.scheduled:
+            inbox.scheduled = True
+            loop.call_soon(self._drain_inbox, w_id)
+
+    def _drain_inbox(self, w_id):
+        """Apply a batch of deltas from the workflow's inbox."""
+        inbox = self.inboxes.get(w_id)
+        if inbox is None:
+            return
+        inbox.scheduled = False
+        for _ in range(self.INBOX_BATCH_SIZE):
+            if not inbox.deltas:
+                return
+            topic, delta = inbox.deltas.popleft()
+            self._process_delta(topic, delta, w_id)
+            inbox.record_applied(delta)
+            if topic == 'shutdown':
+                # the workflow has been disconnected, drop anything after it
+                inbox.deltas.clear()
+                return
+        if inbox.deltas:
+            # yield to the subscriber loop before continuing
+            inbox.scheduled = True
+            asyncio.get_running_loop().call_soon(self._drain_inbox, w_id)
+
+    def _overload(self, w_id, inbox, ready):
+        """Drop a workflow's pending deltas and request a full resync.
+
+        New deltas are held back as early deltas until the resync completes.
+        """
+        self.log.warning(
+            f'Unable to keep up with updates from {w_id}'
+            f' ({len(inbox.deltas)} pending), resyncing.'
+        )
+        inbox.clear()
+        if ready is not None:
+            ready.clear()
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(
+                self._resync_workflow(w_id), self.loop
+            )
+
+    async def _resync_workflow(self, w_id):
+        """Replace the entire data-store of a workflow."""
+        if w_id in await self._entire_workflow_update(ids=[w_id]):
+            # the dropped deltas were never sent to subscribers, make them
+            # re-register so that they receive the new data (initial burst)
+            self.delta_queues[w_id] = {}
+        else:
+            # carry on with the deltas we have
+            self._set_init_data_ready(w_id)
+
+    def get_delta_stats(self) -> Dict[str, Dict[str, float]]:
+        """Return the delta inbox statistics for each connected workflow.
+
+        Returns:
+            {w_id: {
+                'depth': n,  # deltas awaiting application
+                'max_depth': n,
+                'lag': n,  # publish-to-applied time of the last delta
+                'max_lag': n,
+                'received': n,
+                'applied': n,
+                'resyncs': n,  # full resyncs due to overload
+            }}
+
+        Note the lag is subject to clock differences between the workflow
+        and UI Server hosts.
+
+        """
+        return {
+            w_id: inbox.stats()
+            for w_id, inbox in list(self.inboxes.items())
+        }
+
+    def _process_delta(self, topic, delta, w_id):
+        """Apply a delta and push it to the subscription queues."""
         if topic == 'shutdown':
             self._delta_store_to_queues(w_id, topic, delta)
             # close connections
             self.disconnect_workflow(w_id)
             return
         self._apply_all_delta(w_id, delta)
-        self._delta_store_to_queues(w_id, topic, delta)
+        if delta.ListFields():
+            # (all topics may have been held back for reconciling)
+            self._coalesce_delta(w_id, topic, delta)
 
     def _clear_data_field(self, w_id, field_name):
+        # (swap in an empty field rather than clearing it under readers)
         if field_name == WORKFLOW:
-            self.data[w_id][field_name].Clear()
+            self.data[w_id][field_name] = type(self.data[w_id][field_name])()
         else:
-            self.data[w_id][field_name].clear()
+            self.data[w_id][field_name] = {}
+            self.checksums.get(w_id, {}).pop(field_name, None)
 
     def _apply_all_delta(self, w_id, delta):
-        """Apply the AllDeltas delta."""
-        delta_times = self.data[w_id]['delta_times']
+        """Apply the AllDeltas delta.
+
+        Topics with a pending reconcile are held back (and removed from the
+        delta) until the reconcile has completed.
+        """
         for field, sub_delta in delta.ListFields():
+            if (
+                field.name != WORKFLOW
+                and self.reconciler.hold((w_id, field.name), sub_delta)
+            ):
+                delta.ClearField(field.name)
+                continue
+            self._apply_topic_delta(w_id, field.name, sub_delta)
+
+    def _apply_topic_delta(self, w_id, topic, sub_delta, reconcile=True):
+        """Apply a topic delta if it is newer than the previously applied.
+
+        Returns:
+            True if the delta was applied.
+
+        """
+        with self.write_lock(w_id):
+            delta_times = self.data[w_id]['delta_times']
             delta_time = getattr(sub_delta, 'time', 0.0)
             # If the workflow has reloaded clear the data before
             # delta application.
             if sub_delta.reloaded:
-                self._clear_data_field(w_id, field.name)
-                delta_times[field.name] = 0.0
+                self._clear_data_field(w_id, topic)
+                delta_times[topic] = 0.0
             # hard to catch errors in a threaded async app, so use try-except.
             try:
                 # Apply the delta if newer than the previously applied.
-                if delta_time >= delta_times.get(field.name, 0.0):
-                    apply_delta(field.name, sub_delta, self.data[w_id])
-                    delta_times[field.name] = delta_time
-                    if not sub_delta.reloaded:
-                        self._reconcile_update(field.name, sub_delta, w_id)
+                if delta_time >= delta_times.get(topic, 0.0):
+                    self._apply_delta(w_id, topic, sub_delta)
+                    delta_times[topic] = delta_time
+                    if reconcile and not sub_delta.reloaded:
+                        self._reconcile_update(topic, sub_delta, w_id)
+                    return True
             except Exception as exc:
                 self.log.exception(exc)
+            return False
+
+    def _apply_delta(self, w_id, topic, delta):
+        """Apply a topic delta, updating the running checksum (if any).
+
+        Deltas are applied copy-on-write so that readers (i.e. GraphQL
+        resolvers in the main thread) never see a topic change size or an
+        element part way through an update:
+
+        * Updated elements are cloned, the delta applied to the clones, which
+          are then swapped in with a single ``dict.update`` call.
+        * If the delta adds or prunes elements, it is applied to a copy of the
+          topic which is then swapped in. This is a shallow copy (references
+          to the elements only), a dict cannot change size whilst another
+          thread is iterating over it.
+        * Pruning an element also removes references to it from related
+          elements, possibly in other topics (see _clone_related). These are
+          cloned and swapped in the same way as updated elements.
+
+        Changes to different topics are swapped in one after another, so
+        readers may briefly see, e.g. a pruned task proxy which its task no
+        longer references, but never a partially updated element.
+
+        Writers hold the workflow's write lock, so changes made by other
+        writers (e.g. the main loop) are not lost.
+
+        The running checksum is updated for the elements touched by the
+        delta only.
+        """
+        with self.write_lock(w_id):
+            if topic != WORKFLOW:
+                self._expand_workflow(w_id)
+            store = self.data[w_id]
+            # working copy of the workflow store (topics are shared)
+            work = dict(store)
+            live = store[topic]
+            resize = False
+            related: Dict[str, Any] = {}
+            if topic == WORKFLOW:
+                work[topic] = clone_element(live)
+            else:
+                updated = {
+                    element.id: clone_element(live[element.id])
+                    for element in delta.updated
+                    if element.id in live
+                }
+                resize = bool(delta.added or delta.pruned)
+                if resize:
+                    work[topic] = live.copy()
+                    work[topic].update(updated)
+                else:
+                    work[topic] = updated
+                if delta.pruned:
+                    related = self._clone_related(store, topic, delta)
+                    for r_topic, elements in related.items():
+                        if r_topic == topic:
+                            work[topic].update(elements)
+                        else:
+                            work[r_topic] = elements
+            apply_delta(topic, delta, work)
+
+            checksum = self.checksums.get(w_id, {}).get(topic)
+            if checksum is not None:
+                self._update_checksum(
+                    checksum, topic, delta, live, work[topic]
+                )
+
+            # swap in the changes
+            if topic == WORKFLOW or resize:
+                store[topic] = work[topic]
+            else:
+                live.update(work[topic])
+            for r_topic in related:
+                if r_topic == WORKFLOW:
+                    store[WORKFLOW] = work[WORKFLOW]
+                elif r_topic != topic:
+                    store[r_topic].update(work[r_topic])
+
+    @staticmethod
+    def _clone_related(store, topic, delta) -> Dict[str, Any]:
+        """Clone the elements which pruning the delta's elements will change.
+
+        When an element is pruned, references to it are removed from related
+        elements (see cylc.flow.data_store_mgr.apply_delta):
+
+        * task proxies: their task, parent family proxy and the workflow.
+        * family proxies: their family, parent family proxy and the workflow.
+        * edges: their source and target task proxies and the workflow.
+        * jobs: the workflow.
+
+        Returns:
+            {topic: {id: clone}} for related elements, and {WORKFLOW: clone}
+            if the workflow is changed.
+
+        """
+        live = store[topic]
+        pruned = [live[e_id] for e_id in delta.pruned if e_id in live]
+        if not pruned or topic not in {
+            TASK_PROXIES, FAMILY_PROXIES, EDGES, JOBS
+        }:
+            return {}
+        refs: Dict[str, Set[str]] = {}
+        for element in pruned:
+            if topic == TASK_PROXIES:
+                refs.setdefault(TASKS, set()).add(element.task)
+                refs.setdefault(FAMILY_PROXIES, set()).add(
+                    element.first_parent
+                )
+            elif topic == FAMILY_PROXIES:
+                refs.setdefault(FAMILIES, set()).add(element.family)
+                refs.setdefault(FAMILY_PROXIES, set()).add(
+                    element.first_parent
+                )
+            elif topic == EDGES:
+                refs.setdefault(TASK_PROXIES, set()).update(
+                    (element.source, element.target)
+                )
+        related: Dict[str, Any] = {
+            r_topic: {
+                e_id: clone_element(store[r_topic][e_id])
+                for e_id in e_ids
+                if e_id in store[r_topic]
+            }
+            for r_topic, e_ids in refs.items()
+        }
+        related[WORKFLOW] = clone_element(store[WORKFLOW])
+        return related
+
+    def _update_checksum(self, checksum, topic, delta, before, after):
+        """Update a running checksum with the elements touched by a delta.
+
+        Args:
+            checksum: The running checksum of the topic.
+            topic: The data-store topic.
+            delta: The applied delta.
+            before: The topic elements before the delta was applied.
+            after: The changed topic elements (may contain others).
+
+        """
+        s_att = self._checksum_attr(topic)
+        pruned = set(delta.pruned)
+        for e_id in {
+            *(element.id for element in delta.added),
+            *(element.id for element in delta.updated),
+            *pruned,
+        }:
+            old = getattr(before[e_id], s_att) if e_id in before else None
+            if e_id in after:
+                new = getattr(after[e_id], s_att)
+            elif e_id in pruned:
+                new = None
+            else:
+                # (unchanged)
+                new = old
+            if old != new:
+                if old is not None:
+                    checksum.remove(old)
+                if new is not None:
+                    checksum.add(new)
+
+    @staticmethod
+    def _checksum_attr(topic):
+        """Return the element attribute the topic checksum is made from."""
+        if topic == EDGES:
+            return 'id'
+        return 'stamp'
+
+    def _get_checksum(self, w_id, topic, recompute=False):
+        """Return the running checksum for a topic.
+
+        Args:
+            w_id: Workflow external ID.
+            topic: The data-store topic.
+            recompute: Rebuild the checksum from the whole topic.
+
+        """
+        checksum = self.checksums.setdefault(w_id, {}).get(topic)
+        if checksum is None or recompute:
+            s_att = self._checksum_attr(topic)
+            strings = (
+                getattr(e, s_att) for e in self.data[w_id][topic].values()
+            )
+            if checksum is None:
+                checksum = TopicChecksum(strings)
+                self.checksums[w_id][topic] = checksum
+            else:
+                checksum.reset(strings)
+        return checksum
+
+    def _coalesce_delta(self, w_id, topic, delta):
+        """Queue a delta for subscriptions, merged with those that follow.
+
+        Deltas are held for up to delta_coalesce_window seconds and merged
+        into one, which is converted to a delta-store once and shared by all
+        subscription queues.
+        """
+        if self.delta_coalesce_window <= 0 or not self.delta_queues.get(w_id):
+            self._delta_store_to_queues(w_id, topic, delta)
+            return
+        try:
+            # the flush is run in the subscriber's loop
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._delta_store_to_queues(w_id, topic, delta)
+            return
+        coalescer = self.coalescers.setdefault(w_id, DeltaCoalescer())
+        with coalescer.lock:
+            coalescer.add(delta)
+            if coalescer.scheduled:
+                return
+            coalescer.scheduled = True
+        loop.call_later(self.delta_coalesce_window, self._flush_deltas, w_id)
+
+    def _flush_deltas(self, w_id):
+        """Queue any pending coalesced deltas for subscriptions."""
+        coalescer = self.coalescers.get(w_id)
+        if coalescer is None:
+            return
+        with coalescer.lock:
+            delta = coalescer.pop()
+            if delta is not None:
+                self._push_delta_store(w_id, ALL_DELTAS, delta)
+
+    def get_coalescing_stats(self) -> Dict[str, Dict[str, float]]:
+        """Return the delta coalescing statistics for each workflow.
+
+        Returns:
+            {w_id: {'received': n, 'published': n, 'ratio': n}}
+
+            Where ratio is the number of deltas received per delta published.
+
+        """
+        return {
+            w_id: {
+                'received': coalescer.received,
+                'published': coalescer.published,
+                'ratio': coalescer.received / max(coalescer.published, 1),
+            }
+            for w_id, coalescer in list(self.coalescers.items())
+        }
 
     def _delta_store_to_queues(self, w_id, topic, delta):
-        # Queue delta for graphql subscription resolving
-        if self.delta_queues[w_id]:
+        """Queue delta for graphql subscription resolving."""
+        # queue any pending (coalesced) deltas first to preserve ordering
+        self._flush_deltas(w_id)
+        self._push_delta_store(w_id, topic, delta)
+
+    def _push_delta_store(self, w_id, topic, delta):
+        delta_queues = self.delta_queues.get(w_id)
+        if delta_queues:
             delta_store = create_delta_store(delta, w_id)
-            for delta_queue in self.delta_queues[w_id].values():
+            delta_store[DELTA_SERIAL] = next(self.delta_serials)
+            for delta_queue in delta_queues.values():
                 delta_queue.put((w_id, topic, delta_store))
 
     def _reconcile_update(self, topic, delta, w_id):
         """Reconcile local with workflow data-store.
 
         Verify data-store is in sync by topic/element-type
-        and on failure request entire set of respective data elements.
+        and on failure schedule a request for the entire set of respective
+        data elements (see _reconcile).
 
         Args:
             topic (str): topic of published data.
@@ -332,42 +1781,94 @@ class DataStoreMgr:
             w_id (str): Workflow external ID.
 
         """
-        if topic == WORKFLOW:
+        if topic == WORKFLOW or self.loop is None:
             return
-        if topic == EDGES:
-            s_att = 'id'
-        else:
-            s_att = 'stamp'
-        local_checksum = generate_checksum(
-            [getattr(e, s_att)
-             for e in self.data[w_id][topic].values()])
-        if local_checksum != delta.checksum:
+        if (
+            self._get_checksum(w_id, topic).value != delta.checksum
+            # check the running checksum hasn't drifted before reconciling
+            and self._get_checksum(w_id, topic, recompute=True).value != (
+                delta.checksum
+            )
+        ):
+            delay = self.reconciler.request((w_id, topic))
+            if delay is None:
+                # a reconcile is already pending
+                return
             self.log.debug(
-                f'Out of sync with {topic} of {w_id}... Reconciling.')
-            try:
-                # use threadsafe as client socket is in main loop thread.
-                future = asyncio.run_coroutine_threadsafe(
+                f'Out of sync with {topic} of {w_id}... Reconciling'
+                f' (in {delay:.1f}s).'
+            )
+            # client socket is in main loop thread.
+            self.loop.call_soon_threadsafe(
+                self._start_reconcile, w_id, topic, delay
+            )
+
+    def _start_reconcile(self, w_id, topic, delay):
+        task = asyncio.ensure_future(self._reconcile(w_id, topic, delay))
+        self.reconcile_tasks.add(task)
+        task.add_done_callback(self.reconcile_tasks.discard)
+
+    async def _reconcile(self, w_id, topic, delay):
+        """Replace a topic with the workflow's copy, then apply held deltas.
+
+        This runs in the main loop, deltas for the topic are held back by
+        the subscriber until it completes.
+        """
+        new_delta = None
+        try:
+            await asyncio.sleep(delay)
+            async with self.reconcile_limit:
+                new_delta_msg = await asyncio.wait_for(
                     workflow_request(
                         self.workflows_mgr.workflows[w_id]['req_client'],
                         'pb_data_elements',
                         args={'element_type': topic}
                     ),
-                    self.loop
+                    self.RECONCILE_TIMEOUT
                 )
-                new_delta_msg = future.result(self.RECONCILE_TIMEOUT)
-                new_delta = DELTAS_MAP[topic]()
-                new_delta.ParseFromString(new_delta_msg)
-                self._clear_data_field(w_id, topic)
-                apply_delta(topic, new_delta, self.data[w_id])
+            new_delta = DELTAS_MAP[topic]()
+            new_delta.ParseFromString(new_delta_msg)
+        except asyncio.TimeoutError:
+            self.log.debug(
+                f'The reconcile update coroutine {w_id} {topic}'
+                f' took too long, cancelling the sync.'
+            )
+        except Exception as exc:
+            self.log.exception(exc)
+        finally:
+            # release the held deltas, even if the reconcile failed
+            self._finish_reconcile(w_id, topic, new_delta)
+
+    def _finish_reconcile(self, w_id, topic, new_delta):
+        """Swap in the reconciled topic (if any) and apply held deltas."""
+        applied = []
+
+        def _apply(held):
+            if w_id not in self.data:
+                return
+            if new_delta is not None:
+                # build the replacement topic, then swap it in
+                work = dict(self.data[w_id])
+                work[topic] = {}
+                apply_delta(topic, new_delta, work)
+                self.data[w_id][topic] = work[topic]
+                self.checksums.get(w_id, {}).pop(topic, None)
                 self.data[w_id]['delta_times'][topic] = new_delta.time
-            except asyncio.TimeoutError:
-                self.log.debug(
-                    f'The reconcile update coroutine {w_id} {topic}'
-                    f'took too long, cancelling the subscription/sync.'
-                )
-                future.cancel()
-            except Exception as exc:
-                self.log.exception(exc)
+            # apply deltas received since (older ones are ignored)
+            for sub_delta in held:
+                if self._apply_topic_delta(
+                    w_id, topic, sub_delta, reconcile=False
+                ):
+                    applied.append(sub_delta)
+
+        # (the write lock is always taken before the reconciler lock)
+        with self.write_lock(w_id):
+            self.reconciler.complete((w_id, topic), _apply)
+        # push the held deltas to the subscriptions
+        for sub_delta in applied:
+            delta = DELTAS_MAP[ALL_DELTAS]()
+            getattr(delta, topic).CopyFrom(sub_delta)
+            self._delta_store_to_queues(w_id, ALL_DELTAS, delta)
 
     async def _entire_workflow_update(
         self, ids: Optional[list] = None
@@ -389,12 +1890,17 @@ class DataStoreMgr:
             w_id: workflow_request(
                 client=info['req_client'], command=req_method, log=self.log
             )
-            for w_id, info in self.workflows_mgr.workflows.items()
+            for w_id, info in list(self.workflows_mgr.workflows.items())
             if info.get('req_client')  # skip stopped workflows
             and (not ids or w_id in ids)
         }
+        # apply each workflow as soon as its own response has been parsed
         results = await asyncio.gather(
-            *requests.values(), return_exceptions=True
+            *(
+                self._workflow_snapshot_update(w_id, request, req_time)
+                for w_id, request in requests.items()
+            ),
+            return_exceptions=True
         )
         successes: Set[str] = set()
         for w_id, result in zip(requests, results):
@@ -405,25 +1911,58 @@ class DataStoreMgr:
                         f'of a workflow: {result}'
                     )
                 continue
-            pb_data = PB_METHOD_MAP[req_method]()
-            pb_data.ParseFromString(result)
-            new_data = deepcopy(DATA_TEMPLATE)
-            for field, value in pb_data.ListFields():
-                if field.name == WORKFLOW:
-                    # If the workflow is still loading this initial dump will
-                    # be empty, so use time immediately before request.
-                    value.last_updated = value.last_updated or req_time
-                    cast('PbWorkflow', new_data[field.name]).CopyFrom(value)
-                    new_data['delta_times'] = {
-                        key: value.last_updated
-                        for key in DATA_TEMPLATE
-                    }
-                    continue
-                new_data[field.name] = {n.id: n for n in value}
-            self.data[w_id] = new_data
             successes.add(w_id)
         return successes
 
+    async def _workflow_snapshot_update(self, w_id, request, req_time):
+        """Await, parse and apply the entire data-store of one workflow.
+
+        Parsing is done in the parse executor to avoid blocking the loop.
+        """
+        start = time.time()
+        result = await request
+        received = time.time()
+        new_data = await asyncio.get_running_loop().run_in_executor(
+            self.parse_executor,
+            self._parse_entire_workflow,
+            result,
+            req_time,
+        )
+        parsed = time.time()
+        with self.write_lock(w_id):
+            self.data[w_id] = new_data
+            self.checksums.pop(w_id, None)
+        self._set_init_data_ready(w_id)
+        self.log.debug(
+            f'[data-store] entire workflow update {w_id}:'
+            f' request={received - start:.3f}s'
+            f' parse={parsed - received:.3f}s'
+            f' ({len(result)} bytes)'
+        )
+
+    @staticmethod
+    def _parse_entire_workflow(
+        result: bytes, req_time: float
+    ) -> dict:
+        """Create a new workflow data-store from a pb_entire_workflow dump."""
+        pb_data = PB_METHOD_MAP['pb_entire_workflow']()
+        pb_data.ParseFromString(result)
+        new_data = new_workflow_store()
+        for field, value in pb_data.ListFields():
+            if field.name == WORKFLOW:
+                # If the workflow is still loading this initial dump will
+                # be empty, so use time immediately before request.
+                value.last_updated = value.last_updated or req_time
+                # (the message is owned by the new store, no need to copy)
+                new_data[WORKFLOW] = value
+                new_data['delta_times'] = {
+                    key: value.last_updated
+                    for key in DATA_TEMPLATE
+                }
+                continue
+            new_data[field.name] = {n.id: n for n in value}
+        return new_data
+
     def _update_contact(
         self,
         w_id,
@@ -480,9 +2019,10 @@ class DataStoreMgr:
             delta.workflow.pruned = w_id
 
         # Apply to existing workflow data
-        if 'delta_times' not in self.data[w_id]:
-            self.data[w_id]['delta_times'] = {WORKFLOW: 0.0}
-        self._apply_all_delta(w_id, delta)
+        with self.write_lock(w_id):
+            if 'delta_times' not in self.data[w_id]:
+                self.data[w_id]['delta_times'] = {WORKFLOW: 0.0}
+            self._apply_all_delta(w_id, delta)
         # Queue delta for subscription push
         self._delta_store_to_queues(w_id, ALL_DELTAS, delta)
 
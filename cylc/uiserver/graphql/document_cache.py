@@ -0,0 +1,113 @@
+# Copyright (C) NIWA & British Crown (Met Office) & Contributors.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cache of parsed and validated GraphQL documents."""
+
+from collections import OrderedDict
+from hashlib import sha256
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from graphql import GraphQLError, parse, validate, validate_schema
+
+if TYPE_CHECKING:
+    from graphql import DocumentNode, GraphQLSchema
+
+
+DocumentEntry = Tuple[Optional['DocumentNode'], List[GraphQLError]]
+
+
+class DocumentCache:
+    """LRU cache of parsed and validated GraphQL documents.
+
+    The UI sends the same few queries over and over, this saves parsing and
+    validating each one every time it is received (over HTTP or websocket).
+
+    Documents are keyed by a hash of the query string. The schema is
+    validated once on creation.
+
+    Args:
+        schema:
+            The schema to validate documents against.
+        size:
+            The maximum number of documents to hold (0 to disable).
+
+    Examples:
+        >>> from graphene import ObjectType, Schema, String
+        >>> class Query(ObjectType):
+        ...     a = String()
+        >>> cache = DocumentCache(Schema(query=Query).graphql_schema)
+        >>> document, errors = cache.get('{ a }')
+        >>> errors
+        []
+        >>> cache.get('{ a }')[0] is document
+        True
+        >>> cache.get('{ xyz }')[1][0].message
+        "Cannot query field 'xyz' on type 'Query'."
+        >>> cache.stats()['hits'], cache.stats()['misses']
+        (1, 2)
+
+    """
+
+    def __init__(self, schema: 'GraphQLSchema', size: int = 100):
+        self.schema = schema
+        self.size = size
+        self.schema_errors = validate_schema(schema)
+        self.documents: 'OrderedDict[str, DocumentEntry]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> DocumentEntry:
+        """Return the parsed document and validation errors for a query.
+
+        Returns:
+            (document, errors)
+
+            The document is None if the query could not be parsed.
+
+        """
+        if self.schema_errors:
+            return None, self.schema_errors
+        key = sha256(query.encode()).hexdigest()
+        try:
+            entry = self.documents[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.documents.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        try:
+            document = parse(query)
+        except GraphQLError as error:
+            entry = (None, [error])
+        else:
+            entry = (document, validate(self.schema, document))
+        if self.size > 0:
+            self.documents[key] = entry
+            while len(self.documents) > self.size:
+                self.documents.popitem(last=False)
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache statistics."""
+        total = self.hits + self.misses
+        return {
+            'size': self.size,
+            'documents': len(self.documents),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.,
+        }
@@ -0,0 +1,90 @@
+# Copyright (C) NIWA & British Crown (Met Office) & Contributors.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""JSON encoders for GraphQL responses.
+
+The "orjson" encoder is considerably faster for large results but requires
+the optional orjson package (``pip install cylc-uiserver[orjson]``).
+"""
+
+import json
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+
+JSON_ENCODERS = ('auto', 'json', 'orjson')
+
+JSONEncoder = Callable[..., str]
+
+
+def json_dumps(data: Any, pretty: bool = False) -> str:
+    """Encode JSON with the standard library.
+
+    Examples:
+        >>> json_dumps({'b': 1, 'a': [None]})
+        '{"b":1,"a":[null]}'
+
+    """
+    if pretty:
+        return json.dumps(
+            data, sort_keys=True, indent=2, separators=(",", ": ")
+        )
+    return json.dumps(data, separators=(",", ":"))
+
+
+def orjson_dumps(data: Any, pretty: bool = False) -> str:
+    """Encode JSON with orjson.
+
+    Raises:
+        TypeError: If the data cannot be encoded.
+
+    """
+    options = orjson.OPT_NON_STR_KEYS
+    if pretty:
+        options |= orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2
+    return orjson.dumps(data, option=options).decode()
+
+
+def get_json_encoder(name: str = 'json') -> JSONEncoder:
+    """Return the named JSON encoder.
+
+    Args:
+        name:
+            One of JSON_ENCODERS, "auto" uses orjson if it is installed.
+
+    Raises:
+        ValueError: If the encoder is unknown or unavailable.
+
+    Examples:
+        >>> get_json_encoder('json') is json_dumps
+        True
+        >>> get_json_encoder('x')
+        Traceback (most recent call last):
+        ValueError: Invalid JSON encoder: x
+
+    """
+    if name == 'auto':
+        name = 'json' if orjson is None else 'orjson'
+    if name == 'json':
+        return json_dumps
+    if name == 'orjson':
+        if orjson is None:
+            raise ValueError('The orjson encoder requires orjson')
+        return orjson_dumps
+    raise ValueError(f'Invalid JSON encoder: {name}')
@@ -0,0 +1,101 @@
+# Copyright (C) NIWA & British Crown (Met Office) & Contributors.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""GraphQL execution."""
+
+from inspect import isawaitable
+from typing import Any, List
+
+from graphql import GraphQLError, is_leaf_type
+
+from cylc.flow.network.graphql import (
+    NULL_VALUE,
+    CylcExecutionContext,
+    strip_null,
+)
+
+
+def collect_exceptions(data: Any, errors: List[Exception]) -> Any:
+    """Replace exceptions within a value with null, collecting them.
+
+    Examples:
+        >>> errors = []
+        >>> collect_exceptions({'a': [1, ValueError('x')], 'b': 2}, errors)
+        {'a': [1, None], 'b': 2}
+        >>> errors
+        [ValueError('x')]
+
+    """
+    if isinstance(data, Exception):
+        errors.append(data)
+        return NULL_VALUE
+    if isinstance(data, dict):
+        return {
+            key: collect_exceptions(val, errors)
+            for key, val in data.items()
+        }
+    if isinstance(data, (list, tuple)):
+        return [collect_exceptions(val, errors) for val in data]
+    return data
+
+
+def _contains_exception(data: Any) -> bool:
+    if isinstance(data, Exception):
+        return True
+    if isinstance(data, dict):
+        return any(_contains_exception(val) for val in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(_contains_exception(val) for val in data)
+    return False
+
+
+class UIServerExecutionContext(CylcExecutionContext):
+    """Execution context which reports exceptions returned by resolvers.
+
+    Resolvers may return exceptions within scalar values (e.g. the results
+    of mutations sent to workflows which could not be contacted). These
+    are replaced with null and added to the errors of the result so that
+    the result can be JSON encoded.
+
+    Only scalar values need checking (the rest of the result is built by
+    graphql-core) so this is cheap compared to searching the whole result.
+    """
+
+    def complete_value(self, return_type, field_nodes, info, path, result):
+        completed = super().complete_value(
+            return_type, field_nodes, info, path, result
+        )
+        if (
+            is_leaf_type(return_type)
+            and not isawaitable(completed)
+            and _contains_exception(completed)
+        ):
+            exceptions: List[Exception] = []
+            completed = strip_null(collect_exceptions(completed, exceptions))
+            errors = (
+                self.collected_errors.errors
+                if hasattr(self, 'collected_errors')
+                else self.errors  # graphql-core < 3.2.7
+            )
+            for exc in exceptions:
+                errors.append(
+                    GraphQLError(
+                        f'{exc.value}' if hasattr(exc, 'value') else f'{exc}',
+                        field_nodes,
+                        path=path.as_list(),
+                        original_error=exc,
+                    )
+                )
+        return completed
@@ -0,0 +1,213 @@
+# Copyright (C) NIWA & British Crown (Met Office) & Contributors.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Persisted GraphQL queries.
+
+Implements the "automatic persisted queries" protocol used by Apollo:
+
+* The client sends the SHA-256 hash of the query in the request
+  extensions rather than the query itself::
+
+    {"extensions": {"persistedQuery": {"version": 1, "sha256Hash": "..."}}}
+
+* If the hash is known, the server executes the corresponding query.
+* Otherwise the server responds with a ``PersistedQueryNotFound`` error,
+  the client then resends the request with both the hash and the query
+  which the server learns for next time.
+
+The registry may also be pre-seeded from the UI build (see ``load``).
+"""
+
+from collections import OrderedDict
+from hashlib import sha256
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from graphql import GraphQLError
+
+
+# the file (in the UI build) which lists the queries the UI uses
+MANIFEST_FILE = 'persisted-query-manifest.json'
+
+
+class PersistedQueryError(GraphQLError):
+    """Error resolving a persisted query."""
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message, extensions={'code': code})
+
+
+class PersistedQueryNotFound(PersistedQueryError):
+    """The client must resend the request with the query."""
+
+    def __init__(self):
+        super().__init__('PersistedQueryNotFound', 'PERSISTED_QUERY_NOT_FOUND')
+
+
+class PersistedQueryNotSupported(PersistedQueryError):
+    """The client must not send persisted queries."""
+
+    def __init__(self):
+        super().__init__(
+            'PersistedQueryNotSupported', 'PERSISTED_QUERY_NOT_SUPPORTED'
+        )
+
+
+def query_hash(query: str) -> str:
+    """Return the hash which identifies a query.
+
+    Examples:
+        >>> query_hash('{ a }')[:8]
+        '1c7e1e34'
+
+    """
+    return sha256(query.encode()).hexdigest()
+
+
+class PersistedQueries:
+    """Registry of persisted queries by hash.
+
+    Args:
+        enabled:
+            If False, requests which use persisted queries are rejected
+            (with ``PersistedQueryNotSupported``).
+        size:
+            The maximum number of queries to learn from clients.
+            Queries loaded from the UI build do not count towards this.
+
+    Examples:
+        >>> registry = PersistedQueries()
+        >>> ext = {'persistedQuery': {'version': 1}}
+        >>> ext['persistedQuery']['sha256Hash'] = query_hash('{ a }')
+        >>> registry.resolve(None, ext)
+        Traceback (most recent call last):
+        ...
+        cylc.uiserver.graphql.persisted_queries.PersistedQueryNotFound: ...
+        >>> registry.resolve('{ a }', ext)
+        '{ a }'
+        >>> registry.resolve(None, ext)
+        '{ a }'
+
+    """
+
+    def __init__(self, enabled: bool = True, size: int = 1000):
+        self.enabled = enabled
+        self.size = size
+        # queries from the UI build {hash: query}
+        self.seeded: Dict[str, str] = {}
+        # queries learned from clients {hash: query}
+        self.learned: 'OrderedDict[str, str]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path: Path) -> int:
+        """Pre-seed the registry from a persisted query manifest.
+
+        Accepts the Apollo persisted query manifest format
+        (``{"operations": [{"id": hash, "body": query}, ...]}``) or a
+        mapping of ``{hash: query}``.
+
+        Entries whose hash does not match their query are ignored.
+
+        Returns:
+            The number of queries loaded.
+
+        """
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+        if 'operations' in manifest:
+            entries = [
+                (operation.get('id'), operation.get('body'))
+                for operation in manifest['operations']
+            ]
+        else:
+            entries = list(manifest.items())
+        count = 0
+        for hash_, query in entries:
+            if isinstance(query, str) and query_hash(query) == hash_:
+                self.seeded[hash_] = query
+                count += 1
+        return count
+
+    def get(self, hash_: str) -> Optional[str]:
+        """Return the query for a hash (or None if unknown)."""
+        query = self.seeded.get(hash_)
+        if query is None:
+            query = self.learned.get(hash_)
+            if query is not None:
+                self.learned.move_to_end(hash_)
+        if query is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return query
+
+    def add(self, hash_: str, query: str) -> None:
+        """Learn a query."""
+        if hash_ in self.seeded or self.size <= 0:
+            return
+        self.learned[hash_] = query
+        self.learned.move_to_end(hash_)
+        while len(self.learned) > self.size:
+            self.learned.popitem(last=False)
+
+    def resolve(
+        self, query: Optional[str], extensions: Optional[Dict[str, Any]]
+    ) -> Optional[str]:
+        """Return the query for a request.
+
+        Args:
+            query: The query sent with the request (if any).
+            extensions: The request extensions (if any).
+
+        Raises:
+            PersistedQueryError
+
+        """
+        if not isinstance(extensions, dict):
+            return query
+        persisted = extensions.get('persistedQuery')
+        if not persisted:
+            return query
+        if not self.enabled:
+            raise PersistedQueryNotSupported()
+        if not isinstance(persisted, dict) or persisted.get('version') != 1:
+            raise PersistedQueryError(
+                'Unsupported persisted query version', 'BAD_REQUEST'
+            )
+        hash_ = persisted.get('sha256Hash')
+        if query:
+            if query_hash(query) != hash_:
+                raise PersistedQueryError(
+                    'provided sha does not match query', 'BAD_REQUEST'
+                )
+            self.add(hash_, query)
+            return query
+        query = self.get(hash_) if isinstance(hash_, str) else None
+        if query is None:
+            raise PersistedQueryNotFound()
+        return query
+
+    def stats(self) -> Dict[str, Any]:
+        """Return registry statistics."""
+        total = self.hits + self.misses
+        return {
+            'seeded': len(self.seeded),
+            'learned': len(self.learned),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.,
+        }
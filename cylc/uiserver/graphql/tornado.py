@@ -22,10 +22,11 @@
 #
 # Excludes GraphiQL
 
-from asyncio import iscoroutinefunction
+from asyncio import Semaphore, gather, iscoroutinefunction
 import json
 import re
 import sys
+from time import perf_counter
 import traceback
 from typing import (
     TYPE_CHECKING,
@@ -37,6 +38,7 @@ from typing import (
     Tuple,
     Union,
 )
+import zlib
 
 from tornado import web
 from tornado.escape import json_encode
@@ -60,38 +62,77 @@ from graphql.execution.middleware import MiddlewareManager
 from graphql.pyutils import is_awaitable
 from graphql.validation import validate
 
-from cylc.flow.network.graphql import (
-    NULL_VALUE,
-    instantiate_middleware,
-    strip_null
+from cylc.flow.network.graphql import instantiate_middleware
+from cylc.uiserver.graphql.encoders import json_dumps
+from cylc.uiserver.graphql.persisted_queries import (
+    PersistedQueries,
+    PersistedQueryNotFound,
+    PersistedQueryNotSupported,
 )
 
 if TYPE_CHECKING:
     from graphene import Schema
+
+    from cylc.uiserver.graphql.document_cache import DocumentCache
+    from cylc.uiserver.graphql.encoders import JSONEncoder
     from tornado.httputil import HTTPServerRequest
 
 MUTATION_ERRORS_FLAG = "graphene_mutation_has_errors"
 MAX_VALIDATION_ERRORS = None
 
-
-def data_search_action(data, action):
-    if isinstance(data, dict):
-        return {
-            key: data_search_action(val, action)
-            for key, val in data.items()
-        }
-    if isinstance(data, list):
-        return [
-            data_search_action(val, action)
-            for val in data
-        ]
-    return action(data)
+# responses smaller than this are not compressed
+MIN_COMPRESS_LENGTH = 1024
+# zlib window bits for the supported content encodings (in preference order)
+CONTENT_ENCODINGS = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
 
 
 def get_content_type(request: 'HTTPServerRequest') -> str:
     return request.headers.get("Content-Type", "").split(";", 1)[0].lower()
 
 
+def get_content_encoding(request: 'HTTPServerRequest') -> Optional[str]:
+    """Return the content encoding to compress a response with (if any).
+
+    Negotiated from the Accept-Encoding header, see CONTENT_ENCODINGS.
+
+    Examples:
+        >>> from types import SimpleNamespace
+        >>> def request(accept):
+        ...     return SimpleNamespace(headers={'Accept-Encoding': accept})
+        >>> get_content_encoding(request('gzip, deflate, br'))
+        'gzip'
+        >>> get_content_encoding(request('gzip;q=0.5, deflate'))
+        'deflate'
+        >>> get_content_encoding(request('*'))
+        'gzip'
+        >>> get_content_encoding(request('gzip;q=0, br'))
+        >>> get_content_encoding(request(''))
+
+    """
+    accepted: Dict[str, float] = {}
+    for item in request.headers.get("Accept-Encoding", "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.
+        accepted[coding.lower()] = quality
+    default = accepted.get("*", 0.)
+    best, best_quality = None, 0.
+    for encoding in CONTENT_ENCODINGS:
+        quality = accepted.get(encoding, default)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
 def get_accepted_content_types(request: 'HTTPServerRequest') -> list:
     def qualify(x):
         parts = x.split(";", 1)
@@ -125,7 +166,6 @@ class ExecutionError(Exception):
 class TornadoGraphQLHandler(web.RequestHandler):
 
     document: Optional[DocumentNode]
-    graphql_params: Optional[Tuple[Any, Any, Any, Any]]
     middleware: Optional[Union[MiddlewareManager, List[Callable], None]]
     parsed_body: Optional[Dict[str, Any]]
 
@@ -139,6 +179,12 @@ class TornadoGraphQLHandler(web.RequestHandler):
         subscription_path=None,
         execution_context_class=None,
         validation_rules=None,
+        document_cache: Optional['DocumentCache'] = None,
+        persisted_queries: Optional[PersistedQueries] = None,
+        json_encoder: Optional['JSONEncoder'] = None,
+        compression_level: int = 0,
+        chunk_size: int = 65536,
+        batch_concurrency: int = 1,
     ) -> None:
         super(TornadoGraphQLHandler, self).initialize()
         self.schema = schema
@@ -148,8 +194,20 @@ class TornadoGraphQLHandler(web.RequestHandler):
         self.subscription_path = subscription_path
         self.execution_context_class = execution_context_class
         self.validation_rules = validation_rules
+        # (only used with the default validation rules)
+        self.document_cache = (
+            document_cache if validation_rules is None else None
+        )
+
+        self.persisted_queries = persisted_queries
+        self.json_encoder = json_encoder or json_dumps
+        # zlib compression level for responses (0 to disable compression)
+        self.compression_level = compression_level
+        # write (and flush) the response in chunks of this many characters
+        self.chunk_size = chunk_size
+        # the max number of batch entries to execute at once
+        self.batch_concurrency = batch_concurrency
 
-        self.graphql_params = None
         self.parsed_body = None
 
         if isinstance(middleware, MiddlewareManager):
@@ -159,7 +217,7 @@ class TornadoGraphQLHandler(web.RequestHandler):
         else:
             self.middleware = None
 
-    def get_context(self):
+    def get_context(self, params=None):
         return self.request
 
     def get_root_value(self):
@@ -188,13 +246,14 @@ class TornadoGraphQLHandler(web.RequestHandler):
             data = self.parse_body()
 
             if self.batch:
-                responses = [
-                    await self.get_response(entry)
-                    for entry in data
-                ]
-                result = "[{}]".format(
-                    ",".join([response[0] for response in responses])
-                )
+                responses = await self.get_batch_responses(data)
+                # (written in chunks rather than joined, see write_body)
+                chunks = ["["]
+                for index, response in enumerate(responses):
+                    if index:
+                        chunks.append(",")
+                    chunks.append(response[0])
+                chunks.append("]")
                 status_code = (
                     responses
                     and max(responses, key=lambda response: response[1])[1]
@@ -202,11 +261,11 @@ class TornadoGraphQLHandler(web.RequestHandler):
                 )
             else:
                 result, status_code = await self.get_response(data)
+                chunks = [result] if result else []
 
             self.set_status(status_code)
             self.set_header("Content-Type", "application/json")
-            self.write(result)
-            await self.finish()
+            await self.write_body(chunks)
 
         except HTTPClientError as e:
             response = e.response
@@ -216,13 +275,142 @@ class TornadoGraphQLHandler(web.RequestHandler):
             )
             return response
 
-    async def get_response(self, data):
-        query, variables, operation_name, _id = self.get_graphql_params(
-            self.request, data
+    async def write_body(self, chunks: List[str]) -> None:
+        """Write the response body and finish the request.
+
+        The chunks are JSON which has already been encoded in full (the
+        JSON encoders are not incremental), this only converts them to
+        bytes, compresses and flushes them chunk_size characters at a time.
+        This avoids building a second full copy of the body (as bytes) and
+        lets the client start receiving data sooner, but does not reduce
+        the cost of encoding the response.
+
+        The body is compressed if the client accepts it (see
+        get_content_encoding) and it is larger than MIN_COMPRESS_LENGTH.
+        """
+        compressor = None
+        if self.compression_level > 0:
+            self.add_header("Vary", "Accept-Encoding")
+            encoding = get_content_encoding(self.request)
+            if (
+                encoding
+                and sum(map(len, chunks)) >= MIN_COMPRESS_LENGTH
+            ):
+                self.set_header("Content-Encoding", encoding)
+                compressor = zlib.compressobj(
+                    self.compression_level,
+                    zlib.DEFLATED,
+                    CONTENT_ENCODINGS[encoding],
+                )
+
+        chunk_size = max(self.chunk_size, 1)
+        pending = 0
+        for text in chunks:
+            for start in range(0, len(text), chunk_size):
+                data = text[start:start + chunk_size].encode()
+                if compressor:
+                    data = compressor.compress(data)
+                self.write(data)
+                pending += len(data)
+                if pending >= chunk_size:
+                    await self.flush()
+                    pending = 0
+        if compressor:
+            self.write(compressor.flush())
+        await self.finish()
+
+    async def get_batch_responses(self, data: list) -> list:
+        """Return the responses to the entries of a batch request.
+
+        Consecutive queries are executed concurrently (at most
+        batch_concurrency at a time). Mutations (and anything else which
+        is not a query) are executed alone, after the preceding entries
+        have completed and before the following ones start, so they keep
+        their sequential semantics.
+
+        Responses are returned in the order of the request.
+        """
+        responses: list = [None] * len(data)
+        semaphore = Semaphore(max(self.batch_concurrency, 1))
+
+        async def _get_response(index, params):
+            queued = perf_counter()
+            async with semaphore:
+                started = perf_counter()
+                responses[index] = await self.get_response(
+                    data[index], params
+                )
+            app_log.debug(
+                "batch entry %d (%s): waited %.3fs, completed in %.3fs",
+                index,
+                (params and params[2]) or "anonymous",
+                started - queued,
+                perf_counter() - started,
+            )
+
+        async def _gather(group):
+            results = await gather(
+                *(_get_response(*item) for item in group),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+        group = []
+        for index, entry in enumerate(data):
+            try:
+                params = self.get_graphql_params(self.request, entry)
+            except Exception:
+                # (reported by get_response)
+                params = None
+            if params and self.is_query(params):
+                group.append((index, params))
+                continue
+            await _gather(group)
+            group = []
+            await _get_response(index, params)
+        await _gather(group)
+        return responses
+
+    def is_query(self, params: Tuple[Any, Any, Any, Any]) -> bool:
+        """Return True if the request is for a query operation.
+
+        Queries are safe to execute concurrently.
+        """
+        query, _, operation_name, _ = params
+        if not query:
+            return False
+        if self.document_cache is not None:
+            document, _ = self.document_cache.get(query)
+        else:
+            try:
+                document = parse(query)
+            except GraphQLError:
+                document = None
+        if document is None:
+            return False
+        operation_ast = get_operation_ast(document, operation_name)
+        return (
+            operation_ast is not None
+            and operation_ast.operation == OperationType.QUERY
         )
 
+    async def get_response(self, data, params=None):
+        try:
+            if params is None:
+                params = self.get_graphql_params(self.request, data)
+            query, variables, operation_name, _id = params
+        except (PersistedQueryNotFound, PersistedQueryNotSupported) as exc:
+            # the client should retry with the full query
+            response = {"errors": [exc.formatted]}
+            if self.batch:
+                response["id"] = data.get("id")
+                response["status"] = 200
+            return self.json_encode(response), 200
+
         execution_result = await self.execute_graphql_request(
-            data, query, variables, operation_name
+            data, query, variables, operation_name, params
         )
 
         status_code = 200
@@ -252,42 +440,23 @@ class TornadoGraphQLHandler(web.RequestHandler):
             if self.batch:
                 response["id"] = _id
                 response["status"] = status_code
-            try:
-                result = self.json_encode(response)
-            except TypeError:
-                # Catch exceptions in response
-                errors = []
-
-                def exc_to_errors(data):
-                    if isinstance(data, Exception):
-                        errors.append({
-                            'message': (
-                                f'{data.value}'
-                                if hasattr(data, 'value') else f'{data}'
-                            )
-                        })
-                        return NULL_VALUE
-                    return data
-
-                response = data_search_action(
-                    response,
-                    exc_to_errors
-                )
-                response.setdefault("errors", []).extend(errors)
-                response = strip_null(response)
-
-                result = self.json_encode(response)
+            # (exceptions returned by resolvers are reported as errors by
+            # the execution context, see UIServerExecutionContext)
+            result = self.json_encode(response)
         else:
             result = None
 
         return result, status_code
 
     def json_encode(self, d, pretty=False):
-        if (self.pretty or pretty) or self.get_query_argument("pretty", False):
-            return json.dumps(
-                d, sort_keys=True, indent=2, separators=(",", ": "))
-
-        return json.dumps(d, separators=(",", ":"))
+        return self.json_encoder(
+            d,
+            pretty=bool(
+                self.pretty
+                or pretty
+                or self.get_query_argument("pretty", False)
+            ),
+        )
 
     def parse_body(self):
         content_type = get_content_type(self.request)
@@ -308,9 +477,9 @@ class TornadoGraphQLHandler(web.RequestHandler):
                     if not isinstance(request_json, list):
                         raise AssertionError(
                             "Batch requests should receive a list"
-                            ", but received {}."
-                        ).format(repr(request_json))
-                    if len(request_json <= 0):
+                            ", but received {}.".format(repr(request_json))
+                        )
+                    if len(request_json) <= 0:
                         raise AssertionError(
                             "Received an empty list in the batch request."
                         )
@@ -339,8 +508,10 @@ class TornadoGraphQLHandler(web.RequestHandler):
         return self.parsed_body
 
     async def execute_graphql_request(
-        self, data, query, variables, operation_name
+        self, data, query, variables, operation_name, params=None
     ):
+        # (batch entries may be executed concurrently, so the document and
+        # params are passed as locals rather than stored on the handler)
         if not query:
             raise HTTPError(
                 status_code=400, log_message="Must provide query string."
@@ -348,16 +519,27 @@ class TornadoGraphQLHandler(web.RequestHandler):
 
         schema = self.schema.graphql_schema
 
-        schema_validation_errors = validate_schema(schema)
-        if schema_validation_errors:
-            return ExecutionResult(data=None, errors=schema_validation_errors)
+        validation_errors = None
+        if self.document_cache is not None:
+            try:
+                document, validation_errors = self.document_cache.get(query)
+            except Exception as e:
+                return ExecutionResult(errors=[e])
+            if document is None:
+                return ExecutionResult(data=None, errors=validation_errors)
+        else:
+            schema_validation_errors = validate_schema(schema)
+            if schema_validation_errors:
+                return ExecutionResult(
+                    data=None, errors=schema_validation_errors
+                )
 
-        try:
-            self.document = parse(query)
-        except Exception as e:
-            return ExecutionResult(errors=[e])
+            try:
+                document = parse(query)
+            except Exception as e:
+                return ExecutionResult(errors=[e])
 
-        operation_ast = get_operation_ast(self.document, operation_name)
+        operation_ast = get_operation_ast(document, operation_name)
 
         if (
             self.request.method.lower() == "get"
@@ -372,19 +554,20 @@ class TornadoGraphQLHandler(web.RequestHandler):
                 ),
             )
 
-        validation_errors = validate(
-            schema,
-            self.document,
-            self.validation_rules,
-            MAX_VALIDATION_ERRORS,
-        )
+        if validation_errors is None:
+            validation_errors = validate(
+                schema,
+                document,
+                self.validation_rules,
+                MAX_VALIDATION_ERRORS,
+            )
         if validation_errors:
             return ExecutionResult(data=None, errors=validation_errors)
 
         try:
             execute_options = {
                 "root_value": self.get_root_value(),
-                "context_value": self.get_context(),
+                "context_value": self.get_context(params),
                 "variable_values": variables,
                 "operation_name": operation_name,
                 "middleware": self.get_middleware(),
@@ -396,7 +579,7 @@ class TornadoGraphQLHandler(web.RequestHandler):
 
             result = await self.execute(
                 schema,
-                self.document,
+                document,
                 **execute_options
             )
 
@@ -426,9 +609,6 @@ class TornadoGraphQLHandler(web.RequestHandler):
         return html_priority > json_priority
 
     def get_graphql_params(self, request, data):
-        if self.graphql_params:
-            return self.graphql_params
-
         single_args = {}
         for key in request.arguments.keys():
             single_args[key] = self.decode_argument(
@@ -453,8 +633,21 @@ class TornadoGraphQLHandler(web.RequestHandler):
         if operation_name == "null":
             operation_name = None
 
-        self.graphql_params = query, variables, operation_name, _id
-        return self.graphql_params
+        if self.persisted_queries is not None:
+            extensions = (
+                single_args.get("extensions") or data.get("extensions")
+            )
+            if extensions and isinstance(extensions, str):
+                try:
+                    extensions = json.loads(extensions)
+                except Exception as e:
+                    raise HTTPError(
+                        status_code=400,
+                        log_message="Extensions are invalid JSON."
+                    ) from e
+            query = self.persisted_queries.resolve(query, extensions)
+
+        return query, variables, operation_name, _id
 
     def handle_error(self, ex: Exception) -> None:
         if not isinstance(ex, (web.HTTPError, ExecutionError, GraphQLError)):
@@ -24,25 +24,41 @@
 # It has been evolved to suit and ported to graphql-core v3.
 
 import asyncio
-from asyncio.queues import QueueEmpty
+from collections import OrderedDict
 from contextlib import suppress
+from hashlib import sha256
 from inspect import isawaitable
 import json
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Optional, Tuple
 
 from graphql import (
     ExecutionResult,
     GraphQLError,
     MiddlewareManager,
+    execute,
     parse,
     validate,
 )
+from graphql.execution.map_async_iterator import MapAsyncIterator
 from graphql.pyutils import is_awaitable
+from tornado.escape import json_encode
 from tornado.websocket import WebSocketClosedError
 
+msgpack: Any
+try:
+    import msgpack  # type: ignore[no-redef]
+except ImportError:
+    msgpack = None
+
 from cylc.flow.network.graphql import instantiate_middleware
-from cylc.flow.network.graphql_subscribe import subscribe
+from cylc.flow.network.graphql_subscribe import create_source_event_stream
 from cylc.uiserver.authorise import AuthorizationMiddleware
+from cylc.uiserver.data_store_mgr import DELTA_SERIAL
+from cylc.uiserver.graphql.document_cache import DocumentCache
+from cylc.uiserver.graphql.persisted_queries import (
+    PersistedQueries,
+    PersistedQueryError,
+)
 from cylc.uiserver.schema import SUB_RESOLVER_MAPPING
 
 
@@ -50,10 +66,14 @@ if TYPE_CHECKING:
     from cylc.uiserver.handlers import SubscriptionHandler
 
 
-NO_MSG_DELAY = 1.0
-
 GRAPHQL_WS = "graphql-ws"
+# graphql-ws with MessagePack encoded (binary) rather than JSON (text) messages
+GRAPHQL_WS_MSGPACK = "graphql-ws.msgpack"
 WS_PROTOCOL = GRAPHQL_WS
+# the subprotocols clients may select (the msgpack one requires msgpack)
+SUBPROTOCOLS = (
+    (GRAPHQL_WS,) if msgpack is None else (GRAPHQL_WS, GRAPHQL_WS_MSGPACK)
+)
 GQL_CONNECTION_INIT = "connection_init"  # Client -> Server
 GQL_CONNECTION_ACK = "connection_ack"  # Server -> Client
 GQL_CONNECTION_ERROR = "connection_error"  # Server -> Client
@@ -75,6 +95,114 @@ REQ_HEADER_INFO = {
 }
 
 
+class SerialisedResult:
+    """An execution result which is encoded (once) ready for sending.
+
+    These are immutable so may be sent to any number of clients.
+
+    The result is encoded on demand in the format(s) the clients use, as JSON
+    (payload) or MessagePack (packed_payload).
+    """
+
+    __slots__ = ('data', 'formatted', '_payload', '_packed_payload')
+
+    def __init__(self, execution_result: ExecutionResult):
+        self.data = execution_result.data
+        self.formatted = execution_result.formatted
+        self._payload: Optional[str] = None
+        self._packed_payload: Optional[bytes] = None
+
+    @property
+    def payload(self) -> str:
+        """The JSON encoded result."""
+        if self._payload is None:
+            self._payload = json_encode(self.formatted)
+        return self._payload
+
+    @property
+    def packed_payload(self) -> bytes:
+        """The MessagePack encoded result."""
+        if self._packed_payload is None:
+            self._packed_payload = msgpack.packb(self.formatted)
+        return self._packed_payload
+
+
+class SubscriptionResultCache:
+    """LRU cache of serialised subscription results.
+
+    Each delta is yielded to every subscription for the workflow. Identical
+    subscriptions (same query, variables and user) produce identical results
+    so only the first needs executing and encoding, the rest reuse it.
+
+    Results are keyed by (workflow, delta serial, selection hash).
+
+    Args:
+        size: The maximum number of results to hold (0 to disable).
+
+    """
+
+    def __init__(self, size: int = 100):
+        self.size = size
+        self.results: 'OrderedDict[Tuple, SerialisedResult]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def selection_hash(params: dict) -> str:
+        """Return a hash of everything which determines a result's content.
+
+        Examples:
+            >>> params = {'query': 'a', 'kwargs': {'variable_values': {}}}
+            >>> a = SubscriptionResultCache.selection_hash(params)
+            >>> params['kwargs']['variable_values']['x'] = 1
+            >>> a == SubscriptionResultCache.selection_hash(params)
+            False
+
+        """
+        kwargs = params['kwargs']
+        return sha256(
+            json.dumps(
+                [
+                    params['query'],
+                    kwargs.get('operation_name'),
+                    kwargs.get('variable_values'),
+                    (kwargs.get('context_value') or {}).get('current_user'),
+                ],
+                sort_keys=True,
+                default=str,
+            ).encode()
+        ).hexdigest()
+
+    def key(self, payload: Any, selection: str) -> Optional[Tuple]:
+        """Return the cache key for a payload (None if it can't be cached).
+
+        Only delta-stores queued by the data store manager are stamped with
+        a serial, anything else (e.g. initial bursts) is specific to one
+        subscription.
+        """
+        if self.size <= 0 or not isinstance(payload, dict):
+            return None
+        serial = payload.get(DELTA_SERIAL)
+        if serial is None:
+            return None
+        return (payload.get('id'), serial, selection)
+
+    def get(self, key: Tuple) -> Optional[SerialisedResult]:
+        try:
+            result = self.results[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.results.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: Tuple, result: SerialisedResult) -> None:
+        self.results[key] = result
+        while len(self.results) > self.size:
+            self.results.popitem(last=False)
+
+
 class TornadoConnectionContext:
 
     def __init__(self, ws, request_context=None):
@@ -99,12 +227,21 @@ class TornadoConnectionContext:
             return
 
     async def receive(self):
-        return self.ws.recv_nowait()
+        """Wait for the next message, returns None once the socket closes."""
+        return await self.ws.recv()
 
     @property
     def closed(self):
         return self.ws.close_code is not None
 
+    @property
+    def binary(self) -> bool:
+        """True if messages are MessagePack encoded rather than JSON."""
+        return (
+            getattr(self.ws, 'selected_subprotocol', None)
+            == GRAPHQL_WS_MSGPACK
+        )
+
     def remember_task(self, task: asyncio.Task) -> None:
         self.pending_tasks.add(task)
         task.add_done_callback(self.pending_tasks.discard)
@@ -144,33 +281,90 @@ class TornadoSubscriptionServer:
         loop=None,
         middleware=None,
         execution_context_class=None,
-        auth=None
+        auth=None,
+        result_cache_size=100,
+        document_cache=None,
+        persisted_queries=None,
     ):
         self.schema = schema
         self.loop = loop
         self.middleware = middleware
         self.execution_context_class = execution_context_class
         self.auth = auth
+        self.result_cache = SubscriptionResultCache(result_cache_size)
+        self.document_cache: Optional[DocumentCache] = document_cache
+        self.persisted_queries: Optional[PersistedQueries] = (
+            persisted_queries
+        )
 
     async def execute(self, params):
-        # Parse query to document
-        try:
-            document = parse(params['query'])
-        except GraphQLError as error:
-            return ExecutionResult(data=None, errors=[error])
+        if self.document_cache is not None:
+            # Parse and validate the query (or reuse the cached document)
+            document, validation_errors = self.document_cache.get(
+                params['query']
+            )
+            if document is None:
+                return ExecutionResult(data=None, errors=validation_errors)
+        else:
+            # Parse query to document
+            try:
+                document = parse(params['query'])
+            except GraphQLError as error:
+                return ExecutionResult(data=None, errors=[error])
 
-        # Validate document against schema
-        validation_errors = validate(self.schema.graphql_schema, document)
+            # Validate document against schema
+            validation_errors = validate(self.schema.graphql_schema, document)
         if validation_errors:
             return ExecutionResult(data=None, errors=validation_errors)
 
         # execute subscription
-        return await subscribe(
-            self.schema.graphql_schema,
+        return await self.subscribe(
             document,
+            self.result_cache.selection_hash(params),
             **params['kwargs']
         )
 
+    async def subscribe(self, document, selection, **kwargs):
+        """Create a subscription which shares results via the result cache.
+
+        This is cylc.flow.network.graphql_subscribe.subscribe, except that
+        each source event is looked up in the result cache before executing.
+        """
+        result_or_stream = await create_source_event_stream(
+            self.schema.graphql_schema,
+            document,
+            **kwargs
+        )
+        if isinstance(result_or_stream, ExecutionResult):
+            return result_or_stream
+
+        # the remaining arguments are passed on to execute
+        kwargs.pop('root_value', None)
+        kwargs.pop('subscribe_resolver_map', None)
+        cache = self.result_cache
+
+        async def map_source_to_response(payload):
+            key = cache.key(payload, selection)
+            if key is not None:
+                cached = cache.get(key)
+                if cached is not None:
+                    return cached
+            result = execute(
+                self.schema.graphql_schema,
+                document,
+                payload,
+                **kwargs
+            )
+            if isawaitable(result):
+                result = await result
+            if key is None or result.errors:
+                return result
+            serialised = SerialisedResult(result)
+            cache.put(key, serialised)
+            return serialised
+
+        return MapAsyncIterator(result_or_stream, map_source_to_response)
+
     def process_message(self, connection_context, parsed_message):
         task = asyncio.ensure_future(
             self._process_message(connection_context, parsed_message),
@@ -195,7 +389,10 @@ class TornadoSubscriptionServer:
         elif op_type == GQL_START:
             if not isinstance(payload, dict):
                 raise AssertionError("The payload must be a dict")
-            params = self.get_graphql_params(connection_context, payload)
+            try:
+                params = self.get_graphql_params(connection_context, payload)
+            except PersistedQueryError as exc:
+                return await self.send_error(connection_context, op_id, exc)
             return await self.on_start(connection_context, op_id, params)
 
         elif op_type == GQL_STOP:
@@ -246,8 +443,13 @@ class TornadoSubscriptionServer:
         for mw in self.middleware:
             if mw == AuthorizationMiddleware:
                 mw.auth = self.auth
+        query = payload.get("query")
+        if self.persisted_queries is not None:
+            query = self.persisted_queries.resolve(
+                query, payload.get("extensions")
+            )
         return {
-            'query': payload.get("query"),
+            'query': query,
             'kwargs': dict(
                 params,
                 middleware=MiddlewareManager(
@@ -272,13 +474,11 @@ class TornadoSubscriptionServer:
     async def _handle(self, ws, request_context=None):
         connection_context = TornadoConnectionContext(ws, request_context)
         await self.on_open(connection_context)
-        while not connection_context.closed:
-            try:
-                message = await connection_context.receive()
-            except QueueEmpty:
-                await asyncio.sleep(NO_MSG_DELAY)
-            else:
-                await self.on_message(connection_context, message)
+        while True:
+            message = await connection_context.receive()
+            if message is None:
+                break
+            await self.on_message(connection_context, message)
 
         await self.on_close(connection_context)
 
@@ -319,9 +519,15 @@ class TornadoSubscriptionServer:
     async def send_message(
         self, connection_context, op_id=None, op_type=None, payload=None
     ):
-        message = self.build_message(op_id, op_type, payload)
+        binary = connection_context.binary
+        if binary:
+            message = self.build_packed_message(op_id, op_type, payload)
+        else:
+            message = self.build_message(op_id, op_type, payload)
         try:
-            return await connection_context.ws.write_message(message)
+            return await connection_context.ws.write_message(
+                message, binary=binary
+            )
         except WebSocketClosedError:
             resolvers = connection_context.request_context.get('resolvers')
             if resolvers is not None:
@@ -347,6 +553,10 @@ class TornadoSubscriptionServer:
             raise
 
     def build_message(self, _id, op_type, payload):
+        if isinstance(payload, SerialisedResult):
+            # splice in the pre-encoded payload
+            message = json_encode(self.build_message(_id, op_type, None))
+            return f'{message[:-1]}, "payload": {payload.payload}}}'
         message = {}
         if _id is not None:
             message["id"] = _id
@@ -358,6 +568,21 @@ class TornadoSubscriptionServer:
             raise AssertionError("You need to send at least one thing")
         return message
 
+    def build_packed_message(self, _id, op_type, payload) -> bytes:
+        """Return a MessagePack encoded message (see build_message)."""
+        if isinstance(payload, SerialisedResult):
+            # splice in the pre-encoded payload, the message (without the
+            # payload) has at most two fields so is packed as a "fixmap"
+            # which holds the number of fields in its first byte
+            message = msgpack.packb(self.build_message(_id, op_type, None))
+            return b''.join((
+                bytes((message[0] + 1,)),
+                message[1:],
+                msgpack.packb('payload'),
+                payload.packed_payload,
+            ))
+        return msgpack.packb(self.build_message(_id, op_type, payload))
+
     async def send_execution_result(
             self, connection_context, op_id, execution_result):
         # Resolve any pending promises
@@ -368,7 +593,10 @@ class TornadoSubscriptionServer:
             await request_context['resolvers'].flow_delta_processed(
                 request_context, op_id)
 
-        result = execution_result.formatted
+        if isinstance(execution_result, SerialisedResult):
+            result = execution_result
+        else:
+            result = execution_result.formatted
         return await self.send_message(
             connection_context, op_id, GQL_DATA, result
         )
@@ -13,6 +13,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
 from asyncio import Queue
 from functools import wraps
 import getpass
@@ -33,7 +34,12 @@ from cylc.uiserver import __version__
 from cylc.uiserver.authorise import Authorization, AuthorizationMiddleware
 from cylc.uiserver.graphql import authenticated as websockets_authenticated
 from cylc.uiserver.graphql.tornado import TornadoGraphQLHandler
-from cylc.uiserver.graphql.tornado_ws import GRAPHQL_WS
+from cylc.uiserver.graphql.tornado_ws import (
+    GRAPHQL_WS,
+    GRAPHQL_WS_MSGPACK,
+    SUBPROTOCOLS,
+    msgpack,
+)
 from cylc.uiserver.utils import is_bearer_token_authenticated
 
 
@@ -227,6 +233,22 @@ class CylcVersionHandler(CylcJSONHandler):
         )
 
 
+class CylcMetricsHandler(CylcJSONHandler):
+    """Renders UI Server performance metrics in JSON format.
+
+    E.G. the backlog and lag of updates from each workflow.
+    """
+
+    def initialize(self, auth, metrics):
+        super().initialize(auth)
+        self.metrics = metrics
+
+    @authorised
+    @web.authenticated
+    def get(self):
+        self.write(json.dumps(self.metrics()))
+
+
 def snake_to_camel(snake):
     """Converts snake_case to camelCase
         Examples:
@@ -322,6 +344,12 @@ class UIServerGraphQLHandler(CylcAppHandler, TornadoGraphQLHandler):
         execution_context_class=None,
         validation_rules=None,
         auth=None,
+        document_cache=None,
+        persisted_queries=None,
+        json_encoder=None,
+        compression_level=0,
+        chunk_size=65536,
+        batch_concurrency=1,
         **kwargs,
     ):
         TornadoGraphQLHandler.initialize(
@@ -333,6 +361,12 @@ class UIServerGraphQLHandler(CylcAppHandler, TornadoGraphQLHandler):
             batch=batch,
             execution_context_class=execution_context_class,
             validation_rules=validation_rules,
+            document_cache=document_cache,
+            persisted_queries=persisted_queries,
+            json_encoder=json_encoder,
+            compression_level=compression_level,
+            chunk_size=chunk_size,
+            batch_concurrency=batch_concurrency,
         )
         CylcAppHandler.initialize(self, auth)
 
@@ -346,10 +380,10 @@ class UIServerGraphQLHandler(CylcAppHandler, TornadoGraphQLHandler):
             if hasattr(self, key):
                 setattr(self, key, value)
 
-    def get_context(self):
+    def get_context(self, params=None):
         """The GraphQL context passed to resolvers (incl middleware)."""
         return {
-            'graphql_params': self.graphql_params,
+            'graphql_params': params,
             'request': self.request,
             'resolvers': self.resolvers,
             'current_user': get_user_info(self)['username'],
@@ -369,15 +403,35 @@ class UIServerGraphQLHandler(CylcAppHandler, TornadoGraphQLHandler):
 class SubscriptionHandler(CylcAppHandler, websocket.WebSocketHandler):
     """Endpoint for performing GraphQL subscriptions."""
     # No authorization decorators here, auth handled in AuthorizationMiddleware
-    def initialize(self, sub_server, resolvers, sub_statuses=None):
+    def initialize(
+        self, sub_server, resolvers, sub_statuses=None, compression_level=0
+    ):
         self.queue: Queue = Queue(100)
+        # set when the websocket closes (see recv)
+        self.closing = asyncio.Event()
         self.subscription_server: TornadoSubscriptionServer = sub_server
         self.resolvers: Resolvers = resolvers
         self.sub_statuses: Dict = sub_statuses
+        # zlib level for permessage-deflate (0 to disable compression)
+        self.compression_level = compression_level
 
     def select_subprotocol(self, subprotocols):
+        # the first supported subprotocol in the client's preference order
+        for subprotocol in subprotocols:
+            if subprotocol in SUBPROTOCOLS:
+                return subprotocol
         return GRAPHQL_WS
 
+    def get_compression_options(self):
+        # enables permessage-deflate (if the client supports it)
+        # (the Jupyter Server websocket_compression_options take precedence)
+        options = self.settings.get('websocket_compression_options')
+        if options is not None:
+            return options
+        if self.compression_level > 0:
+            return {'compression_level': self.compression_level}
+        return None
+
     @websockets_authenticated
     def get(self, *args, **kwargs):
         # forward this call so we can authenticate/authorise it
@@ -393,7 +447,14 @@ class SubscriptionHandler(CylcAppHandler, websocket.WebSocketHandler):
 
     async def on_message(self, message):
         try:
-            message_dict = json.loads(message)
+            if (
+                isinstance(message, bytes)
+                and self.selected_subprotocol == GRAPHQL_WS_MSGPACK
+            ):
+                message = msgpack.unpackb(message)
+            message_dict = (
+                message if isinstance(message, dict) else json.loads(message)
+            )
             op_id = message_dict.get("id", None)
             if (message_dict['type'] == 'start'):
                 self.sub_statuses[op_id] = 'start'
@@ -403,8 +464,27 @@ class SubscriptionHandler(CylcAppHandler, websocket.WebSocketHandler):
             pass
         await self.queue.put(message)
 
-    async def recv(self):
-        return await self.queue.get()
+    def on_close(self):
+        self.closing.set()
+
+    async def recv(self) -> Optional[str]:
+        """Wait for the next message.
+
+        Returns None once the websocket has closed and any messages received
+        before it closed have been consumed.
+        """
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        if self.closing.is_set():
+            return None
+        get = asyncio.ensure_future(self.queue.get())
+        close = asyncio.ensure_future(self.closing.wait())
+        await asyncio.wait((get, close), return_when=asyncio.FIRST_COMPLETED)
+        close.cancel()
+        if get.done():
+            return get.result()
+        get.cancel()
+        return None
 
     def recv_nowait(self):
         return self.queue.get_nowait()
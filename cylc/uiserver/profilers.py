@@ -103,17 +103,79 @@ class TrackObjects(Profiler):
 
 
 class TrackDataStore(TrackObjects):
-    """Like TrackObjects but for the Data Store."""
+    """Like TrackObjects but for the Data Store.
+
+    Also logs the memory used by compact (stopped) workflow data-stores and
+    the saving made over the full data-stores they stand in for.
+    """
 
     def __init__(self, app):
         TrackObjects.__init__(self, app)
         self.obj = self.app.data_store_mgr
 
+        from pympler.asizeof import asizeof
+
+        from cylc.uiserver.data_store_mgr import CompactWorkflowStore
+
+        self._asizeof = asizeof
+        self._compact_type = CompactWorkflowStore
+
+    def periodic(self):
+        TrackObjects.periodic(self)
+        compact = [
+            data
+            for data in self.obj.data.values()
+            if isinstance(data, self._compact_type)
+        ]
+        if not compact:
+            return
+        # (exclude the workflow summaries, these are held either way)
+        summaries = [data['workflow'] for data in compact]
+        compact_size = self._asizeof(compact) - self._asizeof(summaries)
+        full_size = (
+            self._asizeof([data.expand() for data in compact])
+            - self._asizeof(summaries)
+        )
+        per_1000 = 1000 / len(compact) / 1024
+        self.app.log.info(
+            f'Compact workflow data-stores: {len(compact)} workflows,'
+            f' {compact_size * per_1000:.0f}kb per 1000'
+            f' (saving {(full_size - compact_size) * per_1000:.0f}kb'
+            ' per 1000)'
+        )
+
+
+class TrackDeltaLag(Profiler):
+    """Log the backlog and lag of workflow updates (deltas).
+
+    Logs the totals and the workflows which are furthest behind.
+    """
+
+    TOP = 5
+
+    def periodic(self):
+        stats = self.app.data_store_mgr.get_delta_stats()
+        if not stats:
+            return
+        lagging = sorted(
+            stats.items(), key=lambda item: item[1]['lag'], reverse=True
+        )[:self.TOP]
+        self.app.log.info(
+            f'Delta lag: {len(stats)} workflows,'
+            f' {sum(stat["depth"] for stat in stats.values())} pending,'
+            f' {sum(stat["resyncs"] for stat in stats.values())} resyncs;'
+            ' most lagging: ' + ', '.join(
+                f'{w_id} ({stat["lag"]:.2f}s, {stat["depth"]} pending)'
+                for w_id, stat in lagging
+            )
+        )
+
 
 PROFILERS = {
     'cprofile': CProfiler,
     'track_objects': TrackObjects,
     'track_data_store': TrackDataStore,
+    'track_delta_lag': TrackDeltaLag,
 }
 
 
@@ -40,6 +40,7 @@ from typing import (
     Iterable,
     List,
     Optional,
+    Set,
     Tuple,
     Union,
 )
@@ -50,7 +51,7 @@ import psutil
 from cylc.flow.data_store_mgr import WORKFLOW
 from cylc.flow.exceptions import CylcError
 from cylc.flow.id import Tokens
-from cylc.flow.network.resolvers import BaseResolvers
+from cylc.flow.network.resolvers import BaseResolvers, workflow_filter
 from cylc.flow.scripts.clean import CleanOptions, run
 from cylc.flow.util import natural_sort_key
 
@@ -267,8 +268,8 @@ class Services:
                 log.exception(exc)
             return cls._error(msg)
 
-        # trigger a re-scan
-        await workflows_mgr.scan()
+        # trigger a re-scan (and keep scanning frequently for a while)
+        await workflows_mgr.scan(expedite=True)
         return cls._return("Workflow(s) cleaned")
 
     @classmethod
@@ -277,7 +278,7 @@ class Services:
         args: dict,
         workflows_mgr: 'WorkflowsManager',
     ):
-        await workflows_mgr.scan()
+        await workflows_mgr.scan(full=True)
         return cls._return("Scan requested")
 
     @classmethod
@@ -354,8 +355,8 @@ class Services:
                 )
             )
 
-        # trigger a re-scan
-        await workflows_mgr.scan()
+        # trigger a re-scan (and keep scanning frequently for a while)
+        await workflows_mgr.scan(expedite=True)
         # send a success message
         return cls._return('Workflow(s) started')
 
@@ -592,9 +593,17 @@ class Resolvers(BaseResolvers):
             'request_string': print_ast(operation_ast),
             'variables': variables,
         }
-        return await self.workflows_mgr.multi_request(  # type: ignore # TODO
-            'graphql', w_ids, graphql_args, req_meta=req_meta
+        ret = await self.workflows_mgr.multi_request(
+            'graphql',
+            w_ids,
+            graphql_args,
+            req_meta=req_meta,
+            deadline=self.app.mutation_deadline,
         )
+        if command == 'stop':
+            # the workflow(s) will shut down shortly, watch for it
+            await self.workflows_mgr.scan(expedite=True)
+        return ret  # type: ignore # TODO
 
     async def service(
         self,
@@ -655,6 +664,96 @@ class Resolvers(BaseResolvers):
     ):
         return await Services.cat_log_files(id_, self.log)
 
+    # Lazy subscriptions (see DataStoreMgr.connect_workflow)
+    def _requested_workflows(self, args: Dict[str, Any]) -> Set[str]:
+        """Return the IDs of workflows explicitly requested by args.
+
+        Returns an empty set unless lazy subscriptions are enabled.
+        """
+        if (
+            not self.data_store_mgr.lazy  # type: ignore[attr-defined]
+            or not args.get('workflows')
+        ):
+            return set()
+        # (subscriptions are passed workflow IDs, queries Tokens)
+        args = {
+            **args,
+            'workflows': [
+                Tokens(w_id) if isinstance(w_id, str) else w_id
+                for w_id in args['workflows']
+            ],
+            'exworkflows': [
+                Tokens(w_id) if isinstance(w_id, str) else w_id
+                for w_id in args.get('exworkflows') or []
+            ],
+        }
+        return {
+            w_id
+            for w_id, flow in list(self.data_store_mgr.data.items())
+            if workflow_filter(flow, args)
+        }
+
+    async def _request_data(
+        self, args: Dict[str, Any], w_ids: Iterable[str]
+    ) -> None:
+        """Ensure the data of workflows is available to a query."""
+        if 'sub_id' in args:
+            # subscriptions hold their data (see subscribe_delta)
+            return
+        await self.data_store_mgr.request_data(  # type: ignore[attr-defined]
+            w_ids
+        )
+
+    def subscribe_delta(
+        self, root, info: 'GraphQLResolveInfo', args
+    ) -> AsyncGenerator[Any, None]:
+        if not self.data_store_mgr.lazy:  # type: ignore[attr-defined]
+            return super().subscribe_delta(root, info, args)
+        return self._subscribe_delta_held(root, info, args)
+
+    async def _subscribe_delta_held(
+        self, root, info: 'GraphQLResolveInfo', args
+    ) -> AsyncGenerator[Any, None]:
+        """Delta subscription which holds the data of its workflows."""
+        w_ids = self._requested_workflows(args)
+        self.data_store_mgr.hold_data(w_ids)  # type: ignore[attr-defined]
+        sub = super().subscribe_delta(root, info, args)
+        try:
+            async for delta in sub:
+                yield delta
+        finally:
+            self.data_store_mgr.release_data(  # type: ignore[attr-defined]
+                w_ids
+            )
+            # (the base generator yields in its finally block so raises
+            # RuntimeError on close)
+            with suppress(RuntimeError):
+                await sub.aclose()
+
+    async def get_nodes_all(self, node_type, args):
+        await self._request_data(args, self._requested_workflows(args))
+        return await super().get_nodes_all(node_type, args)
+
+    async def get_nodes_by_ids(self, node_type, args):
+        await self._request_data(args, {
+            Tokens(n_id).workflow_id for n_id in args.get('native_ids', [])
+        })
+        return await super().get_nodes_by_ids(node_type, args)
+
+    async def get_node_by_id(self, node_type, args):
+        await self._request_data(args, [Tokens(args['id']).workflow_id])
+        return await super().get_node_by_id(node_type, args)
+
+    async def get_edges_all(self, args):
+        await self._request_data(args, self._requested_workflows(args))
+        return await super().get_edges_all(args)
+
+    async def get_edges_by_ids(self, args):
+        await self._request_data(args, {
+            Tokens(n_id).workflow_id for n_id in args.get('native_ids', [])
+        })
+        return await super().get_edges_by_ids(args)
+
 
 def kill_process_tree(
     pid,
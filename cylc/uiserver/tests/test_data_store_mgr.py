@@ -15,18 +15,49 @@
 
 """Tests for the ``data_store_mgr`` module and its objects and functions."""
 
+import asyncio
+from copy import deepcopy
 import logging
+from queue import Queue
+from random import Random
+import sys
+from threading import Event, Thread, current_thread
 from time import time
 
 import pytest
 import zmq
 
+from cylc.flow.data_messages_pb2 import (  # type: ignore
+    PbFamilyProxy,
+    PbTask,
+    PbTaskProxy,
+    PbWorkflow,
+    TPDeltas,
+    WDeltas,
+)
+from cylc.flow.data_store_mgr import (
+    DATA_TEMPLATE,
+    FAMILY_PROXIES,
+    TASKS,
+    TASK_PROXIES,
+    WORKFLOW,
+    apply_delta,
+    generate_checksum,
+)
 from cylc.flow.exceptions import ClientTimeout, WorkflowStopped
 from cylc.flow.id import Tokens
 from cylc.flow.network import ZMQSocketBase
 from cylc.flow.workflow_files import ContactFileFields as CFF
 
-from cylc.uiserver.data_store_mgr import DataStoreMgr, ALL_DELTAS
+from cylc.uiserver.data_store_mgr import (
+    ALL_DELTAS,
+    CompactWorkflowStore,
+    DataStoreMgr,
+    DeltaCoalescer,
+    ReconcileScheduler,
+    SubscriberLoopPool,
+    TopicChecksum,
+)
 
 from typing import TYPE_CHECKING
 
@@ -146,6 +177,55 @@ async def test_entire_workflow_update__stopped_workflow(
     ]
 
 
+async def test_entire_workflow_update_streaming(
+    async_client: 'AsyncClientFixture',
+    data_store_mgr: DataStoreMgr,
+    make_entire_workflow,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Each workflow should be applied as soon as its own response arrives.
+    """
+    slow_response = asyncio.Event()
+    parse_threads = set()
+
+    class Client(type(async_client)):  # type: ignore[misc]
+        async def async_request(self, *args, **kwargs):
+            if self.workflow == 'slow':
+                await slow_response.wait()
+            return make_entire_workflow(self.workflow).SerializeToString()
+
+    for w_id in ('fast', 'slow'):
+        client = Client()
+        client.workflow = w_id
+        data_store_mgr.workflows_mgr.workflows[w_id] = {'req_client': client}
+
+    parse = data_store_mgr._parse_entire_workflow
+
+    def _parse_entire_workflow(*args):
+        parse_threads.add(current_thread())
+        return parse(*args)
+
+    monkeypatch.setattr(
+        data_store_mgr, '_parse_entire_workflow', _parse_entire_workflow
+    )
+
+    update = asyncio.ensure_future(data_store_mgr._entire_workflow_update())
+    for _ in range(100):
+        if 'fast' in data_store_mgr.data:
+            break
+        await asyncio.sleep(0.01)
+    # the fast workflow is applied whilst the slow one is outstanding
+    assert data_store_mgr.data['fast']['workflow'].id == 'fast'
+    assert 'slow' not in data_store_mgr.data
+    assert data_store_mgr.init_data_ready.get('slow') is None
+
+    slow_response.set()
+    assert await update == {'fast', 'slow'}
+    assert data_store_mgr.data['slow']['workflow'].id == 'slow'
+    # parsing happened off the main loop
+    assert current_thread() not in parse_threads
+
+
 async def test_register_workflow(
     data_store_mgr: DataStoreMgr
 ):
@@ -158,6 +238,39 @@ async def test_register_workflow(
     assert w_id in data_store_mgr.delta_queues
 
 
+async def test_compact_workflow_store(
+    data_store_mgr: DataStoreMgr,
+    make_all_delta,
+):
+    """Registered workflows are stored compactly until written in depth."""
+    w_tokens = Tokens(user='user', workflow='workflow_id')
+    w_id = w_tokens.id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=False)
+    data = data_store_mgr.data[w_id]
+    assert isinstance(data, CompactWorkflowStore)
+    assert data[WORKFLOW].status == 'stopped'
+    assert not data[TASK_PROXIES]
+    assert set(data) == {*DATA_TEMPLATE, 'delta_times'}
+    # the empty topics are shared and read-only
+    assert data[TASK_PROXIES] is data['jobs']
+    with pytest.raises(TypeError):
+        data[TASK_PROXIES]['x'] = None
+
+    # workflow summary updates do not expand the store
+    data_store_mgr._update_contact(w_id, status_msg='hello')
+    assert data_store_mgr.data[w_id] is data
+    assert data[WORKFLOW].status_msg == 'hello'
+
+    # task updates do
+    tp_id = w_tokens.duplicate(cycle='1', task='foo').id
+    delta = make_all_delta(w_id, 'added', tp_id, 'running', time())
+    data_store_mgr._apply_all_delta(w_id, delta)
+    expanded = data_store_mgr.data[w_id]
+    assert isinstance(expanded, dict)
+    assert expanded[WORKFLOW].id == w_id
+    assert expanded[TASK_PROXIES][tp_id].state == 'running'
+
+
 async def test_update_contact_no_contact_data(
     data_store_mgr: DataStoreMgr
 ):
@@ -334,5 +447,760 @@ async def test_update_workflow_data(
     data_store_mgr._update_workflow_data(ALL_DELTAS, all_updated_delta, w_id)
 
     # The data-store sould now contain info from the delta
+    # (the compact store of the registered workflow has been expanded)
+    w_id_data = data_store_mgr.data[w_id]
     assert w_id_data['workflow'].status == 'running'
+
+    # The reconcile is run asynchronously
+    for _ in range(100):
+        if not data_store_mgr.reconciler.held:
+            break
+        await asyncio.sleep(0.01)
     assert w_id_data['task_proxies'][tp_id].state == 'running'
+
+
+def test_reconcile_scheduler(monkeypatch: pytest.MonkeyPatch):
+    """Reconciles are deduplicated and rate limited, deltas held meanwhile.
+    """
+    monkeypatch.setattr('cylc.uiserver.data_store_mgr.time.time', lambda: 100)
+    scheduler = ReconcileScheduler(interval=10)
+    key = ('~u/a', TASK_PROXIES)
+    assert not scheduler.hold(key, 'delta0')
+    assert scheduler.request(key) == 0.
+    # further requests are deduplicated whilst pending
+    assert scheduler.request(key) is None
+    assert scheduler.hold(key, 'delta1')
+    assert scheduler.hold(key, 'delta2')
+    # other topics are unaffected
+    assert not scheduler.hold(('~u/a', 'jobs'), 'delta3')
+
+    held = []
+    scheduler.complete(key, held.extend)
+    assert held == ['delta1', 'delta2']
+    assert not scheduler.hold(key, 'delta4')
+    assert (scheduler.requested, scheduler.deduplicated) == (1, 1)
+
+    # the next reconcile is held off until the interval has passed
+    monkeypatch.setattr('cylc.uiserver.data_store_mgr.time.time', lambda: 104)
+    assert scheduler.request(key) == 6.
+    scheduler.discard('~u/a')
+    assert not scheduler.held
+    assert not scheduler.last_run
+
+
+async def test_reconcile_holds_deltas(
+    async_client: 'AsyncClientFixture',
+    data_store_mgr: DataStoreMgr,
+    make_all_delta,
+):
+    """Deltas for a topic are held back until its reconcile completes."""
+    w_tokens = Tokens(user='user', workflow='workflow_id')
+    w_id = w_tokens.id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=False)
+    data_store_mgr.loop = asyncio.get_running_loop()
+    data_store_mgr.delta_queues[w_id] = {'sub': Queue()}
+    data_store_mgr.workflows_mgr.workflows[w_id] = {
+        'req_client': async_client
+    }
+    tp_id = w_tokens.duplicate(cycle='1', task='foo').id
+    reply = asyncio.get_running_loop().create_future()
+
+    async def async_request(*args, **kwargs):
+        return await reply
+
+    async_client.async_request = async_request
+
+    # an update for an unknown task causes a checksum mismatch
+    delta = make_all_delta(w_id, 'updated', tp_id, 'waiting', 1)
+    data_store_mgr._process_delta(ALL_DELTAS, delta, w_id)
+    await asyncio.sleep(0)
+    assert data_store_mgr.reconcile_tasks
+    assert data_store_mgr.delta_queues[w_id]['sub'].qsize() == 1
+
+    # whilst the reconcile is pending, task proxy deltas are held back
+    delta = make_all_delta(w_id, 'added', tp_id, 'running', 3)
+    data_store_mgr._process_delta(ALL_DELTAS, delta, w_id)
+    assert tp_id not in data_store_mgr.data[w_id][TASK_PROXIES]
+    # (the rest of the delta is pushed as normal)
+    queue = data_store_mgr.delta_queues[w_id]['sub']
+    assert queue.qsize() == 2
+    assert not queue.queue[-1][2]['added'][TASK_PROXIES]
+
+    # the reconcile completes, then the held deltas are applied and pushed
+    reconciled = make_all_delta(w_id, 'added', tp_id, 'submitted', 2)
+    reply.set_result(reconciled.task_proxies.SerializeToString())
+    for _ in range(100):
+        if not data_store_mgr.reconcile_tasks:
+            break
+        await asyncio.sleep(0.01)
+    assert data_store_mgr.data[w_id][TASK_PROXIES][tp_id].state == 'running'
+    assert queue.qsize() == 3
+    assert tp_id in queue.queue[-1][2]['added'][TASK_PROXIES]
+    assert not data_store_mgr.reconciler.held
+
+
+def test_subscriber_loop_pool():
+    """Coroutines are run round-robin on a fixed pool of loops."""
+    async def get_thread_name():
+        await asyncio.sleep(0)
+        return current_thread().name
+
+    pool = SubscriberLoopPool(2)
+    try:
+        names = [
+            pool.submit(get_thread_name()).result(1)
+            for _ in range(4)
+        ]
+        assert names == [
+            'cylc-subscriber-0',
+            'cylc-subscriber-1',
+            'cylc-subscriber-0',
+            'cylc-subscriber-1',
+        ]
+    finally:
+        pool.shutdown()
+    assert not pool.loops
+    assert not pool.threads
+
+
+def test_invalid_subscriber_mode(workflows_manager):
+    with pytest.raises(ValueError, match='Invalid subscriber mode'):
+        DataStoreMgr(
+            workflows_manager,
+            logging.getLogger('cylc'),
+            subscriber_mode='elephant',
+        )
+
+
+async def test_disconnect_workflow_multiplexed(
+    workflows_manager,
+    monkeypatch,
+):
+    """Disconnecting a multiplexed subscription cancels its task."""
+    data_store_mgr = DataStoreMgr(
+        workflows_manager,
+        logging.getLogger('cylc'),
+        subscriber_mode='multiplexed',
+    )
+    w_id = Tokens(user='user', workflow='workflow_id').id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=False)
+
+    started = Event()
+    cancelled = Event()
+
+    async def _subscribe(*args):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def _entire_workflow_update(ids):
+        return set(ids)
+
+    monkeypatch.setattr(data_store_mgr, '_subscribe', _subscribe)
+    monkeypatch.setattr(
+        data_store_mgr, '_entire_workflow_update', _entire_workflow_update
+    )
+    try:
+        await data_store_mgr.connect_workflow(
+            w_id,
+            {'name': 'workflow_id', CFF.HOST: 'localhost', CFF.PUBLISH_PORT: 1}
+        )
+        assert started.wait(1)
+        assert w_id in data_store_mgr.w_sub_tasks
+
+        data_store_mgr.disconnect_workflow(w_id)
+        assert cancelled.wait(1)
+        assert w_id not in data_store_mgr.w_sub_tasks
+    finally:
+        data_store_mgr.stop_subscriptions()
+
+
+async def test_lazy_subscriptions(
+    async_client: 'AsyncClientFixture',
+    workflows_manager,
+    monkeypatch,
+):
+    """Workflows are tracked at summary level until their data is held."""
+    data_store_mgr = DataStoreMgr(
+        workflows_manager,
+        logging.getLogger('cylc'),
+        subscriber_mode='multiplexed',
+        lazy=True,
+    )
+    monkeypatch.setattr(data_store_mgr, 'SUMMARY_INTERVAL', 0.01)
+    w_id = Tokens(user='user', workflow='workflow_id').id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=True)
+
+    # the workflow summary returned by the scheduler
+    summary = WDeltas()
+    summary.added.CopyFrom(
+        PbWorkflow(id=w_id, status='running', last_updated=1.)
+    )
+    async_client.will_return(summary.SerializeToString())
+    flow = {
+        'name': 'workflow_id',
+        CFF.HOST: 'localhost',
+        CFF.PUBLISH_PORT: 1,
+        'req_client': async_client,
+    }
+    workflows_manager.workflows[w_id] = flow
+
+    async def _subscribe(*args):
+        await asyncio.sleep(10)
+
+    async def _entire_workflow_update(ids):
+        return set(ids)
+
+    monkeypatch.setattr(data_store_mgr, '_subscribe', _subscribe)
+    monkeypatch.setattr(
+        data_store_mgr, '_entire_workflow_update', _entire_workflow_update
+    )
+    try:
+        # the workflow should be connected at summary level
+        await data_store_mgr.connect_workflow(w_id, flow)
+        assert data_store_mgr.summaries == {w_id}
+        assert not data_store_mgr.w_sub_tasks
+        assert isinstance(data_store_mgr.data[w_id], CompactWorkflowStore)
+        assert data_store_mgr.data[w_id][WORKFLOW].status == 'running'
+        assert data_store_mgr.get_workflows() == ({w_id}, set())
+
+        # holding the data should start the subscription
+        data_store_mgr.hold_data([w_id])
+        await data_store_mgr.upgrades[w_id]
+        assert w_id in data_store_mgr.w_sub_tasks
+        assert not data_store_mgr.summaries
+        assert data_store_mgr.get_subscription_stats() == {
+            'full': 1, 'summary': 0, 'held': 1
+        }
+
+        # the subscription should be retained whilst the data is held
+        data_store_mgr.idle_timeout = 0
+        await asyncio.sleep(0.05)
+        assert w_id in data_store_mgr.w_sub_tasks
+
+        # once released, the workflow should return to summary level
+        data_store_mgr.release_data([w_id])
+        await asyncio.sleep(0.05)
+        assert not data_store_mgr.w_sub_tasks
+        assert data_store_mgr.summaries == {w_id}
+        assert isinstance(data_store_mgr.data[w_id], CompactWorkflowStore)
+        assert data_store_mgr.data[w_id][WORKFLOW].status == 'running'
+
+        # a query should start the subscription and wait for the data
+        data_store_mgr.idle_timeout = 300
+        await data_store_mgr.request_data([w_id])
+        assert w_id in data_store_mgr.w_sub_tasks
+        assert not data_store_mgr.summaries
+    finally:
+        data_store_mgr.stop_subscriptions()
+
+
+def test_topic_checksum():
+    """The running checksum always matches a full recompute."""
+    rand = Random(42)
+    TopicChecksum.CHUNK_SIZE, chunk_size = 4, TopicChecksum.CHUNK_SIZE
+    try:
+        strings = {f'~u/w//{ind}/foo@{rand.random()}' for ind in range(20)}
+        checksum = TopicChecksum(strings)
+        assert checksum.value == generate_checksum(strings)
+        for _ in range(200):
+            if strings and rand.random() < 0.4:
+                string = rand.choice(sorted(strings))
+                strings.remove(string)
+                checksum.remove(string)
+            else:
+                string = f'~u/w//{rand.randint(0, 50)}/foo@{rand.random()}'
+                strings.add(string)
+                checksum.add(string)
+            assert checksum.value == generate_checksum(strings)
+        # removing a missing string is a no-op
+        checksum.remove('elephant')
+        assert checksum.value == generate_checksum(strings)
+    finally:
+        TopicChecksum.CHUNK_SIZE = chunk_size
+
+
+async def test_apply_delta_running_checksum(
+    data_store_mgr: DataStoreMgr,
+    make_all_delta,
+):
+    """Applying deltas keeps the running checksum in sync."""
+    w_tokens = Tokens(user='user', workflow='workflow_id')
+    w_id = w_tokens.id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=False)
+    tp_id = w_tokens.duplicate(cycle='1', task='foo').id
+
+    def checksum():
+        return data_store_mgr._get_checksum(w_id, TASK_PROXIES).value
+
+    # add a task
+    delta = make_all_delta(w_id, 'added', tp_id, 'waiting', 1.)
+    data_store_mgr._apply_all_delta(w_id, delta)
+    assert checksum() == delta.task_proxies.checksum
+
+    # update it (the running checksum now exists)
+    delta = make_all_delta(w_id, 'updated', tp_id, 'running', 2.)
+    data_store_mgr._apply_all_delta(w_id, delta)
+    assert checksum() == delta.task_proxies.checksum
+    assert (
+        data_store_mgr.data[w_id][TASK_PROXIES][tp_id].state == 'running'
+    )
+
+    # prune it
+    delta = make_all_delta(w_id, 'updated', tp_id, 'running', 3.)
+    del delta.task_proxies.updated[:]
+    delta.task_proxies.pruned.append(tp_id)
+    delta.task_proxies.checksum = generate_checksum([])
+    data_store_mgr._apply_all_delta(w_id, delta)
+    assert checksum() == delta.task_proxies.checksum
+    assert not data_store_mgr.data[w_id][TASK_PROXIES]
+
+
+async def test_early_deltas(
+    data_store_mgr: DataStoreMgr,
+    make_all_delta,
+    monkeypatch,
+):
+    """Deltas received before the initial data are replayed in order."""
+    w_tokens = Tokens(user='user', workflow='workflow_id')
+    w_id = w_tokens.id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=False)
+    tp_id = w_tokens.duplicate(cycle='1', task='foo').id
+    monkeypatch.setattr(data_store_mgr, 'INIT_DATA_BUFFER_SIZE', 2)
+
+    # simulate the connection of a workflow
+    async def _entire_workflow_update(ids):
+        return set(ids)
+
+    monkeypatch.setattr(
+        data_store_mgr, '_entire_workflow_update', _entire_workflow_update
+    )
+    monkeypatch.setattr(
+        data_store_mgr, '_start_subscription', lambda *args: None
+    )
+    await data_store_mgr.connect_workflow(
+        w_id,
+        {'name': 'workflow_id', CFF.HOST: 'localhost', CFF.PUBLISH_PORT: 1}
+    )
+
+    # deltas should be held back until the initial data arrives
+    deltas = [
+        make_all_delta(w_id, 'added', tp_id, 'waiting', 1.),
+        make_all_delta(w_id, 'added', tp_id, 'preparing', 2.),
+        make_all_delta(w_id, 'added', tp_id, 'running', 3.),
+    ]
+    for delta in deltas:
+        data_store_mgr._update_workflow_data(ALL_DELTAS, delta, w_id)
+    assert tp_id not in data_store_mgr.data[w_id]['task_proxies']
+    # the buffer is bounded (the oldest delta is dropped)
+    assert [
+        delta.task_proxies.time
+        for _, delta in data_store_mgr.early_deltas[w_id]
+    ] == [2., 3.]
+
+    # initial data arrives, the deltas are replayed in order
+    data_store_mgr._set_init_data_ready(w_id)
+    data_store_mgr._replay_early_deltas(w_id)
+    assert not data_store_mgr.early_deltas[w_id]
+    assert (
+        data_store_mgr.data[w_id]['task_proxies'][tp_id].state == 'running'
+    )
+
+    # subsequent deltas are applied via the inbox
+    delta = make_all_delta(w_id, 'added', tp_id, 'succeeded', 4.)
+    data_store_mgr._update_workflow_data(ALL_DELTAS, delta, w_id)
+    await asyncio.sleep(0)
+    assert (
+        data_store_mgr.data[w_id]['task_proxies'][tp_id].state == 'succeeded'
+    )
+
+
+async def test_delta_inbox(
+    data_store_mgr: DataStoreMgr,
+    make_all_delta,
+    monkeypatch,
+):
+    """Deltas are applied via a bounded inbox, overload triggers a resync."""
+    w_tokens = Tokens(user='user', workflow='workflow_id')
+    w_id = w_tokens.id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=False)
+    tp_id = w_tokens.duplicate(cycle='1', task='foo').id
+    monkeypatch.setattr(data_store_mgr, 'inbox_size', 3)
+    monkeypatch.setattr(data_store_mgr, 'INBOX_BATCH_SIZE', 2)
+    resyncs = []
+
+    async def _entire_workflow_update(ids):
+        resyncs.append(ids)
+        return set(ids)
+
+    monkeypatch.setattr(
+        data_store_mgr, '_entire_workflow_update', _entire_workflow_update
+    )
+    monkeypatch.setattr(
+        data_store_mgr, '_start_subscription', lambda *args: None
+    )
+    await data_store_mgr.connect_workflow(
+        w_id,
+        {'name': 'workflow_id', CFF.HOST: 'localhost', CFF.PUBLISH_PORT: 1}
+    )
+    data_store_mgr._set_init_data_ready(w_id)
+    resyncs.clear()
+    # a GraphQL subscription
+    data_store_mgr.delta_queues[w_id]['sub'] = Queue()
+
+    # deltas are queued then applied in batches
+    now = time()
+    for ind, state in enumerate(('waiting', 'preparing', 'running')):
+        data_store_mgr._update_workflow_data(
+            ALL_DELTAS,
+            make_all_delta(w_id, 'added', tp_id, state, now - 10 + ind),
+            w_id
+        )
+    stats = data_store_mgr.get_delta_stats()[w_id]
+    assert stats['depth'] == 3
+    assert stats['applied'] == 0
+    await asyncio.sleep(0)
+    assert data_store_mgr.get_delta_stats()[w_id]['depth'] == 1
+    await asyncio.sleep(0)
+    stats = data_store_mgr.get_delta_stats()[w_id]
+    assert stats['depth'] == 0
+    assert stats['applied'] == 3
+    assert stats['max_depth'] == 3
+    assert 8 < stats['lag'] < 9
+    assert 10 < stats['max_lag'] < 11
+    assert (
+        data_store_mgr.data[w_id]['task_proxies'][tp_id].state == 'running'
+    )
+
+    # if the inbox overflows, it is dropped in favour of a resync
+    for ind in range(4):
+        data_store_mgr._update_workflow_data(
+            ALL_DELTAS,
+            make_all_delta(w_id, 'added', tp_id, 'succeeded', now + ind),
+            w_id
+        )
+    stats = data_store_mgr.get_delta_stats()[w_id]
+    assert stats['depth'] == 0
+    assert stats['resyncs'] == 1
+    assert not data_store_mgr.init_data_ready[w_id].is_set()
+    # the subscription was sent the deltas applied before the overload
+    assert data_store_mgr.delta_queues[w_id]['sub'].qsize() == 3
+    await asyncio.sleep(0.1)
+    assert resyncs == [[w_id]]
+    # the subscription must re-register to receive the resynced data
+    # (initial burst)
+    assert data_store_mgr.delta_queues[w_id] == {}
+
+
+async def test_delta_inbox_shutdown(
+    data_store_mgr: DataStoreMgr,
+    make_all_delta,
+    monkeypatch,
+):
+    """Deltas queued behind a shutdown are dropped."""
+    w_tokens = Tokens(user='user', workflow='workflow_id')
+    w_id = w_tokens.id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=False)
+    tp_id = w_tokens.duplicate(cycle='1', task='foo').id
+
+    async def _entire_workflow_update(ids):
+        return set(ids)
+
+    monkeypatch.setattr(
+        data_store_mgr, '_entire_workflow_update', _entire_workflow_update
+    )
+    monkeypatch.setattr(
+        data_store_mgr, '_start_subscription', lambda *args: None
+    )
+    await data_store_mgr.connect_workflow(
+        w_id,
+        {'name': 'workflow_id', CFF.HOST: 'localhost', CFF.PUBLISH_PORT: 1}
+    )
+    data_store_mgr._set_init_data_ready(w_id)
+    inbox = data_store_mgr.inboxes[w_id]
+
+    now = time()
+    data_store_mgr._update_workflow_data(
+        ALL_DELTAS, make_all_delta(w_id, 'added', tp_id, 'running', now), w_id
+    )
+    data_store_mgr._update_workflow_data('shutdown', b'', w_id)
+    data_store_mgr._update_workflow_data(
+        ALL_DELTAS,
+        make_all_delta(w_id, 'added', tp_id, 'succeeded', now + 1),
+        w_id
+    )
+    assert len(inbox.deltas) == 3
+    await asyncio.sleep(0)
+
+    # the workflow was disconnected and the remaining delta dropped
+    assert w_id not in data_store_mgr.inboxes
+    assert not inbox.deltas
+    assert inbox.applied == 2
+    assert (
+        data_store_mgr.data[w_id]['task_proxies'][tp_id].state == 'running'
+    )
+
+
+async def test_concurrent_read_write(data_store_mgr: DataStoreMgr):
+    """The data-store can be read whilst deltas are being applied.
+
+    Deltas are applied copy-on-write so readers should never see a topic
+    change size during iteration or a partially updated element.
+    """
+    w_tokens = Tokens(user='user', workflow='workflow_id')
+    w_id = w_tokens.id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=False)
+    tp_ids = [
+        w_tokens.duplicate(cycle=str(cycle), task='foo').id
+        for cycle in range(200)
+    ]
+
+    def make_delta(delta_type, state):
+        delta = TPDeltas()
+        for tp_id in tp_ids:
+            if delta_type == 'pruned':
+                delta.pruned.append(tp_id)
+                continue
+            task_proxy = PbTaskProxy(id=tp_id, state=state)
+            task_proxy.outputs['x'].message = state
+            getattr(delta, delta_type).append(task_proxy)
+        return delta
+
+    deltas = [
+        make_delta('added', 'waiting'),
+        make_delta('updated', 'running'),
+        make_delta('pruned', ''),
+    ]
+    stop = Event()
+    errors = []
+
+    def writer():
+        try:
+            while not stop.is_set():
+                for delta in deltas:
+                    data_store_mgr._apply_delta(w_id, TASK_PROXIES, delta)
+        except Exception as exc:
+            errors.append(exc)
+
+    thread = Thread(target=writer)
+    thread.start()
+    reads = 0
+    try:
+        deadline = time() + 0.5
+        while time() < deadline and not errors:
+            for task_proxy in (
+                data_store_mgr.data[w_id][TASK_PROXIES].values()
+            ):
+                # state and outputs are updated together
+                assert task_proxy.outputs['x'].message == task_proxy.state
+            reads += 1
+    finally:
+        stop.set()
+        thread.join()
+    assert not errors
+    assert reads
+
+
+async def test_concurrent_writers(data_store_mgr: DataStoreMgr):
+    """Concurrent writers do not lose each other's changes.
+
+    Writers clone the elements they change, if two writers cloned the same
+    element, whichever swapped it in last would discard the other's change.
+    """
+    w_tokens = Tokens(user='user', workflow='workflow_id')
+    w_id = w_tokens.id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=False)
+    tp_ids = [
+        w_tokens.duplicate(cycle=str(cycle), task='foo').id
+        for cycle in range(50)
+    ]
+    extra_id = w_tokens.duplicate(cycle='x', task='foo').id
+    added = TPDeltas()
+    added.added.extend(PbTaskProxy(id=tp_id) for tp_id in tp_ids)
+    data_store_mgr._apply_delta(w_id, TASK_PROXIES, added)
+    number = 500
+
+    def task_writer():
+        # update the task state, add and prune another task (which
+        # changes the workflow)
+        for ind in range(number):
+            delta = TPDeltas()
+            delta.updated.extend(
+                PbTaskProxy(id=tp_id, state=str(ind)) for tp_id in tp_ids
+            )
+            if ind % 2:
+                delta.pruned.append(extra_id)
+            else:
+                delta.added.append(PbTaskProxy(id=extra_id))
+            data_store_mgr._apply_delta(w_id, TASK_PROXIES, delta)
+
+    def other_writer():
+        # update other fields of the same elements, and the workflow
+        for ind in range(number):
+            delta = TPDeltas()
+            delta.updated.extend(
+                PbTaskProxy(id=tp_id, job_submits=ind + 1)
+                for tp_id in tp_ids
+            )
+            data_store_mgr._apply_delta(w_id, TASK_PROXIES, delta)
+            data_store_mgr._apply_delta(
+                w_id, WORKFLOW, WDeltas(updated=PbWorkflow(status_msg=str(ind)))
+            )
+
+    # switch threads often to provoke races
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    threads = [Thread(target=task_writer), Thread(target=other_writer)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    store = data_store_mgr.data[w_id]
+    for tp_id in tp_ids:
+        assert store[TASK_PROXIES][tp_id].state == str(number - 1)
+        assert store[TASK_PROXIES][tp_id].job_submits == number
+    assert store[WORKFLOW].status_msg == str(number - 1)
+
+
+async def test_prune_copy_on_write(data_store_mgr: DataStoreMgr):
+    """Pruning does not change elements of other topics in place.
+
+    References to pruned elements are removed from clones of the related
+    elements, so readers holding the old elements are unaffected.
+    """
+    w_tokens = Tokens(user='user', workflow='workflow_id')
+    w_id = w_tokens.id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=False)
+    data_store_mgr._expand_workflow(w_id)
+    store = data_store_mgr.data[w_id]
+    t_id = w_tokens.duplicate(task='foo').id
+    fp_id = w_tokens.duplicate(cycle='1', task='root').id
+    tp_ids = [
+        w_tokens.duplicate(cycle='1', task=name).id
+        for name in ('foo', 'bar')
+    ]
+    store[WORKFLOW].task_proxies.extend(tp_ids)
+    store[TASKS][t_id] = PbTask(id=t_id, proxies=tp_ids)
+    store[FAMILY_PROXIES][fp_id] = PbFamilyProxy(
+        id=fp_id, child_tasks=tp_ids
+    )
+    for tp_id in tp_ids:
+        store[TASK_PROXIES][tp_id] = PbTaskProxy(
+            id=tp_id, task=t_id, first_parent=fp_id
+        )
+
+    # a reader's snapshot of the data
+    old = {key: dict(value) for key, value in store.items() if key != WORKFLOW}
+    old[WORKFLOW] = store[WORKFLOW]
+
+    delta = TPDeltas()
+    delta.pruned.append(tp_ids[0])
+    data_store_mgr._apply_delta(w_id, TASK_PROXIES, delta)
+
+    # the pruned element and references to it have gone
+    assert list(store[TASK_PROXIES]) == tp_ids[1:]
+    assert list(store[TASKS][t_id].proxies) == tp_ids[1:]
+    assert list(store[FAMILY_PROXIES][fp_id].child_tasks) == tp_ids[1:]
+    assert list(store[WORKFLOW].task_proxies) == tp_ids[1:]
+
+    # but the elements in the snapshot are unchanged
+    assert list(old[TASK_PROXIES]) == tp_ids
+    assert list(old[TASKS][t_id].proxies) == tp_ids
+    assert list(old[FAMILY_PROXIES][fp_id].child_tasks) == tp_ids
+    assert list(old[WORKFLOW].task_proxies) == tp_ids
+
+
+def test_delta_coalescer(make_all_delta):
+    """Merged deltas have the same effect as the deltas applied in order."""
+    w_tokens = Tokens(user='user', workflow='workflow_id')
+    w_id = w_tokens.id
+    foo = w_tokens.duplicate(cycle='1', task='foo').id
+    bar = w_tokens.duplicate(cycle='1', task='bar').id
+    baz = w_tokens.duplicate(cycle='1', task='baz').id
+
+    # baz exists already
+    data = deepcopy(DATA_TEMPLATE)
+    apply_delta(
+        TASK_PROXIES,
+        make_all_delta(w_id, 'added', baz, 'waiting', 0.).task_proxies,
+        data,
+    )
+
+    pruned = make_all_delta(w_id, 'added', foo, 'waiting', 5.)
+    del pruned.task_proxies.added[:]
+    pruned.task_proxies.pruned.extend([bar, baz])
+    deltas = [
+        # foo: added then updated
+        make_all_delta(w_id, 'added', foo, 'waiting', 1.),
+        make_all_delta(w_id, 'updated', foo, 'running', 2.),
+        # bar: added then pruned, baz: updated then pruned
+        make_all_delta(w_id, 'added', bar, 'waiting', 3.),
+        make_all_delta(w_id, 'updated', baz, 'running', 4.),
+        pruned,
+    ]
+    coalescer = DeltaCoalescer()
+    expected = deepcopy(data)
+    for delta in deltas:
+        coalescer.add(delta)
+        apply_delta(TASK_PROXIES, delta.task_proxies, expected)
+    merged = coalescer.pop()
+    apply_delta(TASK_PROXIES, merged.task_proxies, data)
+
+    assert data[TASK_PROXIES] == expected[TASK_PROXIES]
+    assert data[TASK_PROXIES][foo].state == 'running'
+    # foo was added, bar never existed as far as the merged delta goes
+    assert [tp.id for tp in merged.task_proxies.added] == [foo]
+    assert not merged.task_proxies.updated
+    assert list(merged.task_proxies.pruned) == [baz]
+    assert merged.task_proxies.time == 5.
+    assert merged.workflow.time == 5.
+    assert (coalescer.received, coalescer.published) == (5, 1)
+    # nothing pending
+    assert coalescer.pop() is None
+
+
+async def test_coalesce_delta(
+    data_store_mgr: DataStoreMgr,
+    make_all_delta,
+):
+    """Deltas within the coalescing window are pushed as one."""
+    w_tokens = Tokens(user='user', workflow='workflow_id')
+    w_id = w_tokens.id
+    await data_store_mgr.register_workflow(w_id=w_id, is_active=False)
+    data_store_mgr.delta_coalesce_window = 0.05
+    queue: Queue = Queue()
+    data_store_mgr.delta_queues[w_id]['sub'] = queue
+    tp_id = w_tokens.duplicate(cycle='1', task='foo').id
+
+    for ind, state in enumerate(('waiting', 'preparing', 'running')):
+        data_store_mgr._coalesce_delta(
+            w_id,
+            ALL_DELTAS,
+            make_all_delta(w_id, 'added', tp_id, state, float(ind)),
+        )
+    assert queue.empty()
+    await asyncio.sleep(0.1)
+    assert queue.qsize() == 1
+    _, _, delta_store = queue.get()
+    assert delta_store['added'][TASK_PROXIES][tp_id].state == 'running'
+    assert data_store_mgr.get_coalescing_stats() == {
+        w_id: {'received': 3, 'published': 1, 'ratio': 3.0}
+    }
+
+    # pending deltas are flushed before contact updates
+    data_store_mgr._coalesce_delta(
+        w_id,
+        ALL_DELTAS,
+        make_all_delta(w_id, 'updated', tp_id, 'succeeded', 4.),
+    )
+    data_store_mgr._update_contact(w_id, status='stopped')
+    assert queue.qsize() == 2
+    _, _, delta_store = queue.get()
+    assert delta_store['updated'][TASK_PROXIES][tp_id].state == 'succeeded'
@@ -13,13 +13,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
+import gzip
 import json
 from textwrap import dedent
+import zlib
 
 import pytest
+from tornado.httpclient import HTTPClientError
 
 from cylc.flow.id import Tokens
 
+from cylc.uiserver.graphql.persisted_queries import query_hash
+
 
 @pytest.fixture
 def gql_query(jp_fetch):
@@ -176,3 +182,224 @@ async def test_multi(gql_query, monkeypatch, cylc_uis, dummy_workflow):
         ),
     )
     assert response.code == 200
+
+
+async def test_document_cache(gql_query, cylc_uis):
+    """Repeated queries should reuse the parsed & validated document."""
+    query = 'query { workflows { id } }'
+    cache = cylc_uis.document_cache
+    misses = cache.misses
+    for _ in range(2):
+        response = await gql_query(*('cylc', 'graphql'), query=query)
+        assert response.code == 200
+        assert json.loads(response.body) == {'data': {'workflows': []}}
+    assert (cache.misses, cache.hits) == (misses + 1, 1)
+
+    # invalid queries should be cached along with their errors
+    for _ in range(2):
+        with pytest.raises(HTTPClientError) as exc_ctx:
+            await gql_query(*('cylc', 'graphql'), query='query { foo }')
+        assert exc_ctx.value.code == 400
+    assert (cache.misses, cache.hits) == (misses + 2, 2)
+
+
+async def test_persisted_query(jp_fetch, cylc_uis, monkeypatch):
+    """Queries sent by hash should be resolved from the registry."""
+    query = 'query { workflows { id } }'
+    extensions = {
+        'persistedQuery': {'version': 1, 'sha256Hash': query_hash(query)}
+    }
+
+    async def _fetch(**body):
+        response = await jp_fetch(
+            'cylc',
+            'graphql',
+            method='POST',
+            headers={'Content-Type': 'application/json'},
+            body=json.dumps(body),
+        )
+        return json.loads(response.body)
+
+    # persisted queries are disabled by default
+    body = await _fetch(extensions=extensions)
+    assert body['errors'][0]['extensions'] == {
+        'code': 'PERSISTED_QUERY_NOT_SUPPORTED'
+    }
+    monkeypatch.setattr(cylc_uis.query_registry, 'enabled', True)
+
+    # unknown hash => the client should resend with the query
+    body = await _fetch(extensions=extensions)
+    assert body['errors'][0]['extensions'] == {
+        'code': 'PERSISTED_QUERY_NOT_FOUND'
+    }
+
+    # query + hash => the query is learned
+    body = await _fetch(query=query, extensions=extensions)
+    assert body == {'data': {'workflows': []}}
+
+    # the hash alone is now sufficient
+    body = await _fetch(extensions=extensions)
+    assert body == {'data': {'workflows': []}}
+    assert cylc_uis.query_registry.stats()['hits'] == 1
+
+
+async def test_exceptions_in_result(
+    gql_query, monkeypatch, cylc_uis, dummy_workflow
+):
+    """Exceptions returned by resolvers should be reported as errors."""
+    await dummy_workflow('foo')
+
+    async def _multi_request(*args, **kwargs):
+        return [ValueError('boom')]
+
+    monkeypatch.setattr(
+        cylc_uis.workflows_mgr, 'multi_request', _multi_request
+    )
+    response = await gql_query(
+        *('cylc', 'graphql'),
+        query='mutation { pause(workflows: ["*"]) { result } }',
+    )
+    assert response.code == 200
+    body = json.loads(response.body)
+    assert body['data'] == {'pause': {'result': []}}
+    assert body['errors'][0]['message'] == 'boom'
+    assert body['errors'][0]['path'] == ['pause', 'result']
+
+
+@pytest.mark.parametrize(
+    'jp_server_config',
+    [{
+        'ServerApp': {'jpserver_extensions': {'cylc.uiserver': True}},
+        'CylcUIServer': {'mutation_deadline': 2.5},
+    }],
+    ids=['mutation_deadline=2.5'],
+)
+async def test_mutation_deadline(
+    gql_query, monkeypatch, cylc_uis, dummy_workflow
+):
+    """The mutation deadline should be applied to the workflow requests."""
+    await dummy_workflow('foo')
+    calls = []
+
+    async def _multi_request(*args, **kwargs):
+        calls.append(kwargs)
+        return []
+
+    monkeypatch.setattr(
+        cylc_uis.workflows_mgr, 'multi_request', _multi_request
+    )
+    response = await gql_query(
+        *('cylc', 'graphql'),
+        query='mutation { pause(workflows: ["*"]) { result } }',
+    )
+    assert response.code == 200
+    assert [call['deadline'] for call in calls] == [2.5]
+
+
+@pytest.mark.parametrize(
+    'jp_server_config',
+    [{
+        'ServerApp': {'jpserver_extensions': {'cylc.uiserver': True}},
+        'CylcUIServer': {'compression_level': 1},
+    }],
+    ids=['compression_level=1'],
+)
+@pytest.mark.parametrize(
+    'accept_encoding, content_encoding, decompress',
+    [
+        pytest.param('gzip, deflate', 'gzip', gzip.decompress, id='gzip'),
+        pytest.param('deflate', 'deflate', zlib.decompress, id='deflate'),
+        pytest.param('identity', None, None, id='identity'),
+    ]
+)
+async def test_response_compression(
+    jp_fetch, cylc_uis, accept_encoding, content_encoding, decompress
+):
+    """Large responses should be compressed if the client accepts it."""
+    query = {'query': 'query { workflows { id } }'}
+    response = await jp_fetch(
+        'cylc',
+        'graphql',
+        'batch',
+        method='POST',
+        headers={
+            'Content-Type': 'application/json',
+            'Accept-Encoding': accept_encoding,
+        },
+        body=json.dumps([query] * 100),
+        decompress_response=False,
+    )
+    assert response.code == 200
+    body = response.body
+    assert response.headers.get('Content-Encoding') == content_encoding
+    if decompress:
+        body = decompress(body)
+    assert json.loads(body) == [
+        {'data': {'workflows': []}, 'id': None, 'status': 200}
+    ] * 100
+
+
+@pytest.mark.parametrize(
+    'jp_server_config',
+    [{
+        'ServerApp': {'jpserver_extensions': {'cylc.uiserver': True}},
+        'CylcUIServer': {'batch_concurrency': 8},
+    }],
+    ids=['batch_concurrency=8'],
+)
+async def test_batch_concurrency(
+    jp_fetch, monkeypatch, cylc_uis, dummy_workflow
+):
+    """Batch queries should run concurrently, mutations one at a time."""
+    await dummy_workflow('foo')
+    resolvers = cylc_uis.resolvers
+    get_workflows = resolvers.get_workflows
+    running = []
+    log = []
+
+    async def _get_workflows(args):
+        running.append(None)
+        log.append(('query', len(running)))
+        await asyncio.sleep(0.05)
+        running.pop()
+        return await get_workflows(args)
+
+    async def _multi_request(*args, **kwargs):
+        log.append(('mutation', len(running)))
+        return []
+
+    monkeypatch.setattr(resolvers, 'get_workflows', _get_workflows)
+    monkeypatch.setattr(
+        cylc_uis.workflows_mgr, 'multi_request', _multi_request
+    )
+    query = 'query { workflows { id } }'
+    mutation = 'mutation { pause(workflows: ["*"]) { result } }'
+    entries = [query, query, query, mutation, query]
+    response = await jp_fetch(
+        'cylc',
+        'graphql',
+        'batch',
+        method='POST',
+        headers={'Content-Type': 'application/json'},
+        body=json.dumps([
+            {'query': entry, 'id': index}
+            for index, entry in enumerate(entries)
+        ]),
+    )
+    assert response.code == 200
+
+    # the responses should be in the order of the request
+    body = json.loads(response.body)
+    assert [entry['id'] for entry in body] == [0, 1, 2, 3, 4]
+    assert body[3]['data'] == {'pause': {'result': []}}
+    assert len(body[4]['data']['workflows']) == 1
+
+    # the queries before the mutation should have run concurrently and
+    # finished before it
+    assert log == [
+        ('query', 1),
+        ('query', 2),
+        ('query', 3),
+        ('mutation', 0),
+        ('query', 1),
+    ]
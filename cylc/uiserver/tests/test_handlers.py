@@ -23,7 +23,10 @@ from tornado.httputil import HTTPServerRequest
 from tornado.testing import AsyncHTTPTestCase, get_async_test_timeout
 from tornado.web import Application
 
-from cylc.uiserver.graphql.tornado_ws import GRAPHQL_WS
+from cylc.uiserver.graphql.tornado_ws import (
+    GRAPHQL_WS,
+    GRAPHQL_WS_MSGPACK,
+)
 from cylc.uiserver.handlers import SubscriptionHandler
 
 
@@ -65,6 +68,27 @@ class SubscriptionHandlerTest(AsyncHTTPTestCase):
     def test_websockets_subprotocol(self):
         handler = self._create_handler()
         assert handler.select_subprotocol(subprotocols=[]) == GRAPHQL_WS
+        assert handler.select_subprotocol(
+            subprotocols=['x', GRAPHQL_WS]
+        ) == GRAPHQL_WS
+
+    @pytest.mark.usefixtures("mock_authentication_yossarian")
+    def test_websockets_subprotocol_msgpack(self):
+        pytest.importorskip('msgpack')
+        handler = self._create_handler()
+        assert handler.select_subprotocol(
+            subprotocols=[GRAPHQL_WS_MSGPACK, GRAPHQL_WS]
+        ) == GRAPHQL_WS_MSGPACK
+
+    @pytest.mark.usefixtures("mock_authentication_yossarian")
+    def test_websockets_compression_options(self):
+        handler = self._create_handler()
+        assert handler.get_compression_options() is None
+        handler.compression_level = 6
+        assert handler.get_compression_options() == {'compression_level': 6}
+        # the Jupyter Server setting takes precedence
+        handler.settings['websocket_compression_options'] = {}
+        assert handler.get_compression_options() == {}
 
     @pytest.mark.usefixtures("mock_authentication_yossarian")
     def test_websockets_check_origin_accepts_same_origin(self):
@@ -138,3 +162,12 @@ async def test_userprofile(
     assert user_profile['owner'] == getuser()
     assert 'read' in user_profile['permissions']
     assert 'cylc' in user_profile['extensions']
+
+
+@pytest.mark.integration
+async def test_metrics(jp_fetch, cylc_uis):
+    """Test the metrics endpoint."""
+    response = await jp_fetch('cylc', 'metrics')
+    metrics = json.loads(response.body.decode())
+    assert metrics == cylc_uis.get_metrics()
+    assert {'deltas', 'coalescing', 'scan'} <= set(metrics)
@@ -15,6 +15,7 @@
 
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
 from typing import Any, Dict, List, Tuple
 import logging
 import os
@@ -30,12 +31,15 @@ else:
     from async_timeout import timeout
 
 from cylc.flow import CYLC_LOG
+from cylc.flow.data_messages_pb2 import PbWorkflow
+from cylc.flow.data_store_mgr import DELTA_ADDED, WORKFLOW
 from cylc.flow.exceptions import CylcError
 from cylc.flow.id import Tokens
 from cylc.flow.scripts.clean import CleanOptions
 from cylc.uiserver.resolvers import (
     ENOENT_MSG,
     _schema_opts_to_api_opts,
+    Resolvers,
     Services,
     process_cat_log_stderr,
 )
@@ -410,3 +414,33 @@ async def test_clean__error(
     err_msg = "CylcError: bad things!!"
     assert (await ret) == [False, err_msg]
     assert err_msg in caplog.text
+
+
+@pytest.mark.parametrize('lazy', [True, False])
+async def test_subscribe_delta_workflow_ids(data_store_mgr, lazy):
+    """Subscriptions are passed workflow IDs (rather than Tokens)."""
+    w_id = Tokens(user='user', workflow='a').id
+    data_store_mgr.lazy = lazy
+    data_store_mgr.data[w_id] = {
+        WORKFLOW: PbWorkflow(id=w_id, name='a', owner='user')
+    }
+    data_store_mgr.delta_queues[w_id] = {}
+    resolvers = Resolvers(
+        None, data_store_mgr, logging.getLogger('cylc'), None, None
+    )
+    sub = resolvers.subscribe_delta(
+        'op',
+        SimpleNamespace(context={}, field_name='x'),
+        {'workflows': [w_id], 'ignore_interval': 0, 'initial_burst': True},
+    )
+    try:
+        async with timeout(5):
+            delta = await sub.__anext__()
+        assert delta[DELTA_ADDED][WORKFLOW].id == w_id
+        # the data is held for the lifetime of the subscription
+        assert data_store_mgr.demand == ({w_id: 1} if lazy else {})
+    finally:
+        # (the base generator raises RuntimeError on close)
+        with suppress(RuntimeError):
+            await sub.aclose()
+    assert data_store_mgr.demand == {}
@@ -0,0 +1,214 @@
+# Copyright (C) NIWA & British Crown (Met Office) & Contributors.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+from functools import partial
+import json
+from types import SimpleNamespace
+
+import graphene
+import pytest
+
+from cylc.uiserver.data_store_mgr import DELTA_SERIAL
+from cylc.uiserver.graphql.tornado_ws import (
+    GQL_CONNECTION_ACK,
+    GQL_CONNECTION_INIT,
+    GQL_DATA,
+    GRAPHQL_WS,
+    GRAPHQL_WS_MSGPACK,
+    SerialisedResult,
+    SubscriptionResultCache,
+    TornadoSubscriptionServer,
+)
+from cylc.uiserver.handlers import SubscriptionHandler
+
+
+def get_schema(payloads, calls):
+    """Return a schema with a subscription which yields the payloads."""
+
+    class Subscription(graphene.ObjectType):
+        value = graphene.String()
+
+        async def subscribe_value(root, info):
+            for payload in payloads:
+                yield payload
+
+        def resolve_value(root, info):
+            calls.append(root)
+            return root['value']
+
+    class Query(graphene.ObjectType):
+        value = graphene.String()
+
+    return graphene.Schema(query=Query, subscription=Subscription)
+
+
+def get_params(query, user='me'):
+    return {
+        'query': query,
+        'kwargs': {
+            'variable_values': None,
+            'operation_name': None,
+            'context_value': {'current_user': user},
+        },
+    }
+
+
+async def collect(server, params):
+    iterator = await server.execute(params)
+    return [result async for result in iterator]
+
+
+async def test_shared_results():
+    """Identical subscriptions should share one execution and encoding."""
+    payloads = [
+        {'id': '~u/a', DELTA_SERIAL: 0, 'value': 'x'},
+        {'id': '~u/a', DELTA_SERIAL: 1, 'value': 'y'},
+        # not stamped by the data store manager, e.g. an initial burst
+        {'id': '~u/a', 'value': 'z'},
+    ]
+    calls = []
+    server = TornadoSubscriptionServer(get_schema(payloads, calls))
+    query = 'subscription { value }'
+
+    one = await collect(server, get_params(query))
+    two = await collect(server, get_params(query))
+    # the stamped payloads were only resolved for the first subscription
+    assert len(calls) == 4
+    assert one[0] is two[0]
+    assert one[1] is two[1]
+    assert one[2] is not two[2]
+    assert isinstance(one[0], SerialisedResult)
+    assert json.loads(one[1].payload) == {'data': {'value': 'y'}}
+    assert (server.result_cache.hits, server.result_cache.misses) == (2, 2)
+
+    # different users must not share results
+    three = await collect(server, get_params(query, user='you'))
+    assert len(calls) == 7
+    assert three[0] is not one[0]
+
+
+async def test_shared_results_disabled():
+    payloads = [{'id': '~u/a', DELTA_SERIAL: 0, 'value': 'x'}]
+    calls = []
+    server = TornadoSubscriptionServer(
+        get_schema(payloads, calls), result_cache_size=0
+    )
+    params = get_params('subscription { value }')
+    await collect(server, params)
+    await collect(server, params)
+    assert len(calls) == 2
+    assert not server.result_cache.results
+
+
+def test_result_cache_eviction():
+    cache = SubscriptionResultCache(size=2)
+    for serial in range(3):
+        key = cache.key({'id': 'a', DELTA_SERIAL: serial}, 'sel')
+        cache.put(key, serial)
+    assert list(cache.results) == [('a', 1, 'sel'), ('a', 2, 'sel')]
+    assert cache.get(('a', 0, 'sel')) is None
+    assert cache.get(('a', 1, 'sel')) == 1
+    # the most recently used entry is retained
+    cache.put(('a', 3, 'sel'), 3)
+    assert list(cache.results) == [('a', 1, 'sel'), ('a', 3, 'sel')]
+
+
+def test_build_message_serialised():
+    """Pre-encoded payloads should be spliced into the message."""
+    server = TornadoSubscriptionServer(None)
+
+    class Result:
+        data = {'value': '</x>'}
+        formatted = {'data': data}
+
+    execution_result = SerialisedResult(Result())
+    message = server.build_message('1', GQL_DATA, execution_result)
+    assert json.loads(message) == server.build_message(
+        '1', GQL_DATA, Result.formatted
+    )
+
+
+def test_build_packed_message_serialised():
+    """Pre-encoded MessagePack payloads should be spliced into the message."""
+    msgpack = pytest.importorskip('msgpack')
+    server = TornadoSubscriptionServer(None)
+
+    class Result:
+        data = {'value': [1, None]}
+        formatted = {'data': data}
+
+    execution_result = SerialisedResult(Result())
+    for op_id in ('1', None):
+        message = server.build_packed_message(
+            op_id, GQL_DATA, execution_result
+        )
+        assert msgpack.unpackb(message) == server.build_message(
+            op_id, GQL_DATA, Result.formatted
+        )
+
+
+async def test_handle_messages(monkeypatch):
+    """Messages should be handled as they arrive until the socket closes."""
+    ws = SimpleNamespace(queue=asyncio.Queue(), closing=asyncio.Event())
+    ws.recv = partial(SubscriptionHandler.recv, ws)
+    server = TornadoSubscriptionServer(None)
+    events = []
+
+    async def _on_open(connection_context):
+        events.append('open')
+
+    async def _on_message(connection_context, message):
+        events.append(message)
+
+    async def _on_close(connection_context):
+        events.append('close')
+
+    monkeypatch.setattr(server, 'on_open', _on_open)
+    monkeypatch.setattr(server, 'on_message', _on_message)
+    monkeypatch.setattr(server, 'on_close', _on_close)
+
+    task = asyncio.create_task(server.handle(ws))
+    await ws.queue.put('a')
+    await asyncio.sleep(0.01)
+    assert events == ['open', 'a']
+
+    # messages received before the socket closed should still be handled
+    await ws.queue.put('b')
+    ws.closing.set()
+    await asyncio.wait_for(task, 1)
+    assert events == ['open', 'a', 'b', 'close']
+
+
+async def test_msgpack_subprotocol(jp_ws_fetch, cylc_uis):
+    """Clients may select MessagePack encoded (binary) messages."""
+    msgpack = pytest.importorskip('msgpack')
+    ws = await jp_ws_fetch(
+        'cylc',
+        'subscriptions',
+        subprotocols=[GRAPHQL_WS_MSGPACK, GRAPHQL_WS],
+        compression_options={},
+    )
+    try:
+        assert ws.selected_subprotocol == GRAPHQL_WS_MSGPACK
+        await ws.write_message(
+            msgpack.packb({'type': GQL_CONNECTION_INIT, 'payload': {}}),
+            binary=True,
+        )
+        message = await asyncio.wait_for(ws.read_message(), 5)
+        assert isinstance(message, bytes)
+        assert msgpack.unpackb(message) == {'type': GQL_CONNECTION_ACK}
+    finally:
+        ws.close()
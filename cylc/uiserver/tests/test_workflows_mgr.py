@@ -13,15 +13,22 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
+from functools import partial
 from itertools import product
 import logging
+import os
 from random import random
+import threading
+from time import time
+from types import SimpleNamespace
 from typing import Type
 
 import pytest
+import zmq
 
 from cylc.flow.id import Tokens
-from cylc.flow.exceptions import ClientError, ClientTimeout
+from cylc.flow.exceptions import ClientError, ClientTimeout, WorkflowStopped
 from cylc.flow.network import API
 from cylc.flow.workflow_files import (
     WorkflowFiles,
@@ -29,7 +36,12 @@ from cylc.flow.workflow_files import (
 )
 
 from cylc.uiserver.app import CylcUIServer
+from cylc.uiserver.watcher import RunDirWatcher
 from cylc.uiserver.workflows_mgr import (
+    ClientPool,
+    ConnectQueue,
+    ScanScheduler,
+    scan_paths,
     workflow_request,
     WorkflowsManager,
 )
@@ -209,6 +221,472 @@ async def test_workflow_state_change_uuid(
         assert changes[0][3][CFF.UUID] == '42'
 
 
+async def test_workflow_state_changes_scoped(tmp_path):
+    """It only reports removals within the rescanned directories."""
+    wfm = WorkflowsManager(None, LOG, context=None, run_dir=tmp_path)
+    wid_a, wid_b, wid_c = (
+        Tokens(user=wfm.owner, workflow=name).id
+        for name in ('x/a', 'y/b', 'c')
+    )
+    wfm.get_workflows = lambda: (set(), {wid_a, wid_b, wid_c})
+    (tmp_path / 'x').mkdir()
+    (tmp_path / 'y').mkdir()
+    mk_flow(tmp_path, 'x/a', active=True)
+    mk_flow(tmp_path, 'x/d', active=False)
+
+    # rescan "x" only, "y/b" and "c" have been removed but are not in scope
+    changes = [
+        change[:3]
+        async for change in wfm._workflow_state_changes(
+            wfm._workflow_pipe(scan_paths({tmp_path / 'x'}, tmp_path, 3)),
+            scope={'x'},
+        )
+    ]
+    assert sorted(changes) == [
+        (wid_a, 'inactive', 'active'),
+        (Tokens(user=wfm.owner, workflow='x/d').id, None, 'inactive'),
+    ]
+
+    # rescan "y/b" which has been removed
+    changes = [
+        change[:3]
+        async for change in wfm._workflow_state_changes(
+            wfm._workflow_pipe(scan_paths({tmp_path / 'y/b'}, tmp_path, 3)),
+            scope={'y/b'},
+        )
+    ]
+    assert changes == [(wid_b, 'inactive', None)]
+
+
+async def test_scan_cache(tmp_path):
+    """It only re-reads the contact files of workflows which change."""
+    wfm = WorkflowsManager(
+        None, LOG, context=None, run_dir=tmp_path, scan_cache=True
+    )
+    wfm.get_workflows = lambda: (set(), set())
+    mk_flow(tmp_path, 'a', active=True)
+    mk_flow(tmp_path, 'b', active=False)
+    mk_flow(tmp_path, 'c', active=True)
+    cache = wfm.scan_cache
+
+    async def scan():
+        cache.start()
+        ret = {
+            change[0]: change[3]
+            async for change in wfm._workflow_state_changes()
+        }
+        cache.finish()
+        return ret
+
+    changes = await scan()
+    assert len(changes) == 3
+    assert (cache.last['hits'], cache.last['misses']) == (0, 3)
+    assert set(cache.entries) == {tmp_path / name for name in 'abc'}
+
+    # nothing has changed => no need to re-read the contact files
+    assert len(await scan()) == 3
+    assert (cache.last['hits'], cache.last['misses']) == (3, 0)
+    assert cache.last['hit_rate'] == 1
+
+    # a has been restarted, b has been started, c has been removed
+    contact = tmp_path / 'a' / WorkflowFiles.Service.DIRNAME / (
+        WorkflowFiles.Service.CONTACT
+    )
+    contact.unlink()
+    contact.write_text(
+        contact_text := '\n'.join([
+            f'{CFF.API}={API}',
+            f'{CFF.HOST}=43',
+            f'{CFF.PORT}=43',
+            f'{CFF.NAME}=43',
+            f'{CFF.UUID}=43'
+        ])
+    )
+    (
+        tmp_path / 'b' / WorkflowFiles.Service.DIRNAME
+        / WorkflowFiles.Service.CONTACT
+    ).write_text(contact_text)
+    for path in sorted((tmp_path / 'c').glob('**/*'), reverse=True):
+        path.unlink() if path.is_file() else path.rmdir()
+    (tmp_path / 'c').rmdir()
+    changes = await scan()
+    assert (cache.last['hits'], cache.last['misses']) == (0, 2)
+    assert {flow[CFF.UUID] for flow in changes.values()} == {'43'}
+    assert set(cache.entries) == {tmp_path / 'a', tmp_path / 'b'}
+
+    # the cache can be disabled
+    wfm = WorkflowsManager(
+        None, LOG, context=None, run_dir=tmp_path, scan_cache=False
+    )
+    wfm.get_workflows = lambda: (set(), set())
+    cache = wfm.scan_cache
+    await scan()
+    await scan()
+    assert (cache.last['hits'], cache.last['misses']) == (0, 2)
+    assert not cache.entries
+
+
+async def test_scan_cache_stale_mtime(tmp_path):
+    """It sees new contact files even if the directory mtime is stale.
+
+    E.G. NFS clients may cache directory attributes.
+    """
+    wfm = WorkflowsManager(
+        None, LOG, context=None, run_dir=tmp_path, scan_cache=True
+    )
+    mk_flow(tmp_path, 'a', active=False)
+    cache = wfm.scan_cache
+    flow = {'name': 'a', 'path': tmp_path / 'a'}
+    assert (await cache.get(flow)).contact is None
+
+    # the workflow starts, but the service dir mtime appears unchanged
+    srv_dir = tmp_path / 'a' / WorkflowFiles.Service.DIRNAME
+    stat = os.stat(srv_dir)
+    (tmp_path / 'x').mkdir()
+    mk_flow(tmp_path / 'x', 'a', active=True)
+    os.rename(
+        tmp_path / 'x' / 'a' / WorkflowFiles.Service.DIRNAME
+        / WorkflowFiles.Service.CONTACT,
+        srv_dir / WorkflowFiles.Service.CONTACT,
+    )
+    os.utime(srv_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert (await cache.get(flow)).contact is not None
+
+
+def test_client_pool(tmp_path, monkeypatch):
+    """It reuses clients for workflows which reconnect to the same endpoint."""
+    class Client:
+        ready = True
+
+        def __init__(self, workflow, context=None):
+            self.stopped = False
+            self.socket = self
+
+        def getsockopt(self, _):
+            return zmq.POLLOUT if self.ready else 0
+
+        def stop(self, stop_loop=True):
+            self.stopped = True
+
+    monkeypatch.setattr(
+        'cylc.uiserver.workflows_mgr.WorkflowRuntimeClient', Client
+    )
+    srv_dir = tmp_path / WorkflowFiles.Service.DIRNAME
+    srv_dir.mkdir()
+    (srv_dir / 'server.key').write_text('server-public')
+    (srv_dir / 'client.key_secret').write_text('client-private')
+    flow = {'name': 'a', 'path': tmp_path, CFF.HOST: 'h', CFF.PORT: '1'}
+    pool = ClientPool(None, ttl=60)
+
+    # the workflow reconnects => the client is reused
+    client = pool.acquire(flow)
+    pool.release(client)
+    assert not client.stopped
+    assert pool.acquire(flow) is client
+    assert (pool.hits, pool.misses) == (1, 1)
+
+    # the workflow has restarted (new keys) => a new client is required
+    pool.release(client)
+    (srv_dir / 'server.key').write_text('server-public-2')
+    new_client = pool.acquire(flow)
+    assert new_client is not client
+    assert pool.stats()['idle'] == 1
+
+    # idle clients are stopped after the TTL
+    pool.evict(now=time() + 61)
+    assert client.stopped
+    assert pool.stats()['evictions'] == 1
+
+    # clients which cannot send requests are not reused
+    new_client.ready = False
+    pool.release(new_client)
+    assert new_client.stopped
+    assert not pool.idle
+
+    # flows which cannot be fingerprinted are not pooled
+    client = pool.acquire({'name': 'b'})
+    pool.release(client)
+    assert client.stopped
+
+
+async def test_connect_result(tmp_path, monkeypatch):
+    """Failures to load the workflow's data are reported as such."""
+    results = []
+
+    async def _connect_workflow(wid, flow):
+        return results.pop(0)
+
+    uiserver = SimpleNamespace(
+        data_store_mgr=SimpleNamespace(connect_workflow=_connect_workflow)
+    )
+    wfm = WorkflowsManager(uiserver, LOG, context=None, run_dir=tmp_path)
+    monkeypatch.setattr(wfm.client_pool, 'acquire', lambda flow: 'client')
+    results.extend([None, False])
+    assert await wfm._connect('~u/a', {}) is True
+    assert await wfm._connect('~u/b', {}) is False
+
+
+async def test_connect_queue():
+    """It limits concurrent connections and connects in priority order."""
+    started = []
+    active = []
+    max_active = []
+
+    async def connect(w_id):
+        started.append(w_id)
+        active.append(w_id)
+        max_active.append(len(active))
+        await asyncio.sleep(0.01)
+        active.remove(w_id)
+        return w_id != 'c'  # c fails to connect
+
+    queue = ConnectQueue(2, LOG)
+    queue.pause()
+    futures = [
+        queue.submit(w_id, priority, partial(connect, w_id))
+        for w_id, priority in (('a', 1), ('b', 3), ('c', 2), ('d', 0))
+    ]
+    # resubmitting is a no-op
+    assert queue.submit('a', 1, partial(connect, 'a')) is futures[0]
+    cancelled = queue.submit('e', 5, partial(connect, 'e'))
+    queue.cancel('e')
+    assert queue.stats()['queued'] == 4
+    assert not started
+
+    queue.resume()
+    assert await asyncio.gather(*futures) == [True, True, False, True]
+    assert cancelled.result() is False
+    assert started == ['b', 'c', 'a', 'd']
+    assert max(max_active) == 2
+    assert queue.stats() == {
+        'limit': 2,
+        'total': 4,
+        'queued': 0,
+        'connecting': 0,
+        'connected': 3,
+        'failed': 1,
+    }
+
+
+def test_scan_scheduler_interval():
+    """It backs off whilst nothing changes and speeds up after changes."""
+    scheduler = ScanScheduler(None, min_interval=1, max_interval=10)
+    intervals = []
+    for _ in range(5):
+        scheduler.record(changed=False, duration=0.01)
+        intervals.append(scheduler.interval)
+    assert intervals == [2, 4, 8, 10, 10]
+
+    # a state change was detected
+    scheduler.record(changed=True, duration=0.01)
+    assert scheduler.interval == 1
+
+    # a workflow was started
+    scheduler.record(changed=False, duration=0.01)
+    scheduler.expedite()
+    assert scheduler.interval == 1
+
+    # slow scans increase the interval (even beyond the maximum)
+    scheduler.record(changed=True, duration=0.5)
+    assert scheduler.interval == 5
+    scheduler.record(changed=False, duration=2)
+    assert scheduler.interval == 20
+    scheduler.expedite()
+    assert scheduler.interval == 20
+
+
+async def test_staged_startup(tmp_path, monkeypatch):
+    """On startup, it connects to the most recently active workflows first.
+
+    All of the connections must be queued before any are started, even if
+    registering the workflows takes a while.
+    """
+    started = []
+    priorities = {'a': 1, 'b': 3, 'c': 2, 'd': 0}
+
+    async def _changes():
+        for w_id in priorities:
+            yield w_id, None, 'active', {'name': w_id}
+
+    async def _register(wid, flow, is_active):
+        for _ in range(priorities[wid]):
+            await asyncio.sleep(0)
+
+    async def _connect(wid, flow):
+        started.append(wid)
+        return True
+
+    uiserver = SimpleNamespace(
+        data_store_mgr=SimpleNamespace(set_status_msg=lambda *args: None)
+    )
+    wfm = WorkflowsManager(
+        uiserver, LOG, context=None, run_dir=tmp_path, connect_limit=1
+    )
+    monkeypatch.setattr(wfm, '_workflow_state_changes', _changes)
+    monkeypatch.setattr(wfm, '_register', _register)
+    monkeypatch.setattr(wfm, '_connect', _connect)
+    monkeypatch.setattr(
+        'cylc.uiserver.workflows_mgr.last_active',
+        lambda flow: priorities[flow['name']],
+    )
+    await asyncio.wait_for(wfm.update(), 5)
+    assert started == ['b', 'c', 'a', 'd']
+    assert not wfm.connect_queue.paused
+
+
+async def test_scan_scheduler(tmp_path):
+    """It requests scans at the scheduled interval."""
+    wfm = WorkflowsManager(None, LOG, context=None, run_dir=tmp_path)
+    scans = []
+
+    async def scan():
+        scans.append(wfm.scan_scheduler.interval)
+
+    wfm.scan = scan
+    wfm.schedule_scans(0.01, 1)
+    try:
+        await asyncio.sleep(0.1)
+        assert len(scans) > 1
+        # the interval is fixed until the result of a scan is recorded
+        assert set(scans) == {0.01}
+        wfm.scan_scheduler.record(False, 0)
+        assert wfm.get_scan_stats()['schedule']['interval'] == 0.02
+    finally:
+        wfm.scan_scheduler.stop()
+
+
+@pytest.mark.skipif(
+    not RunDirWatcher.is_available(), reason='requires inotify'
+)
+async def test_watcher(tmp_path):
+    """It reports the directories of workflows which change."""
+    changes = []
+    overflows = []
+    watcher = RunDirWatcher(
+        tmp_path, 2, changes.append, lambda: overflows.append(1), LOG
+    )
+    (tmp_path / 'x').mkdir()
+    await watcher.start()
+
+    async def wait_for_changes():
+        for _ in range(50):
+            if changes:
+                break
+            await asyncio.sleep(0.05)
+        ret = set().union(*changes)
+        changes.clear()
+        return ret
+
+    try:
+        # a new workflow is installed in a (watched) sub directory
+        mk_flow(tmp_path, 'x/a', active=False)
+        assert tmp_path / 'x/a' in await wait_for_changes()
+        await asyncio.sleep(0.1)
+        changes.clear()
+
+        # the workflow is started
+        mk_flow_contact = tmp_path / 'x/a' / WorkflowFiles.Service.DIRNAME
+        (mk_flow_contact / WorkflowFiles.Service.CONTACT).write_text('x')
+        assert await wait_for_changes() == {tmp_path / 'x/a'}
+
+        # changes to other files are ignored
+        (tmp_path / 'x/a/log').mkdir()
+        (tmp_path / 'x/a' / WorkflowFiles.Service.DIRNAME / 'y').touch()
+        await asyncio.sleep(0.2)
+        assert await wait_for_changes() == set()
+        assert not overflows
+    finally:
+        watcher.stop()
+
+
+@pytest.mark.skipif(
+    not RunDirWatcher.is_available(), reason='requires inotify'
+)
+async def test_watcher_new_tree(tmp_path, monkeypatch):
+    """It watches directory trees moved into the run dir.
+
+    The new tree should be walked off the event loop.
+    """
+    changes = []
+    run_dir = tmp_path / 'run'
+    run_dir.mkdir()
+    watcher = RunDirWatcher(run_dir, 3, changes.append, lambda: None, LOG)
+    await watcher.start()
+
+    # record the threads the tree is walked in
+    threads = set()
+    walk = watcher._walk
+
+    def _walk(path):
+        threads.add(threading.current_thread())
+        return walk(path)
+
+    monkeypatch.setattr(watcher, '_walk', _walk)
+
+    async def wait_for_changes():
+        for _ in range(50):
+            if changes:
+                break
+            await asyncio.sleep(0.05)
+        ret = set().union(*changes)
+        changes.clear()
+        return ret
+
+    try:
+        # a directory containing a workflow is moved into the run dir
+        (tmp_path / 'src').mkdir()
+        mk_flow(tmp_path, 'src/b', active=False)
+        (tmp_path / 'src').rename(run_dir / 'y')
+        assert run_dir / 'y' in await wait_for_changes()
+        await asyncio.sleep(0.1)
+        changes.clear()
+        assert threads and threading.main_thread() not in threads
+
+        # the workflow within it is started
+        service_dir = run_dir / 'y/b' / WorkflowFiles.Service.DIRNAME
+        (service_dir / WorkflowFiles.Service.CONTACT).write_text('x')
+        assert await wait_for_changes() == {run_dir / 'y/b'}
+    finally:
+        watcher.stop()
+
+
+async def test_scan_full(tmp_path):
+    """Scans are only full if requested whilst the run dir is watched."""
+    wfm = WorkflowsManager(None, LOG, context=None, run_dir=tmp_path)
+    wfm._full_scan = False
+    await wfm.scan(expedite=True)
+    assert wfm._full_scan
+
+    wfm.watcher = RunDirWatcher(
+        tmp_path, 2, lambda _: None, lambda: None, LOG
+    )
+    wfm._full_scan = False
+    await wfm.scan(expedite=True)
+    assert not wfm._full_scan
+    await wfm.scan(full=True)
+    assert wfm._full_scan
+
+
+@pytest.mark.skipif(
+    not RunDirWatcher.is_available(), reason='requires inotify'
+)
+async def test_watcher_no_run_dir(tmp_path):
+    """It fails to start if the run dir cannot be watched."""
+    watcher = RunDirWatcher(
+        tmp_path / 'run', 2, lambda _: None, lambda: None, LOG
+    )
+    try:
+        with pytest.raises(OSError):
+            await watcher.start()
+    finally:
+        watcher.stop()
+
+    # the workflows manager should fall back to scans
+    wfm = WorkflowsManager(None, LOG, run_dir=tmp_path / 'run')
+    assert await wfm.watch() is False
+    assert wfm.watcher is None
+
+
 async def test_multi_request(
     workflows_manager: WorkflowsManager,
     async_client: "AsyncClientFixture"
@@ -238,6 +716,35 @@ async def test_multi_request(
     assert response[0] == res
 
 
+async def test_multi_request_changes(
+    workflows_manager: WorkflowsManager,
+    async_client: "AsyncClientFixture"
+):
+    """Workflows may connect or disconnect whilst requests are in flight."""
+    workflows = workflows_manager.workflows
+    async_client.will_return('ok')
+    async_request = async_client.async_request
+
+    async def _async_request(*args, **kwargs):
+        # b connects and c disconnects
+        workflows['b'] = {'req_client': async_client}
+        workflows.pop('c', None)
+        await asyncio.sleep(0)
+        return await async_request(*args, **kwargs)
+
+    async_client.async_request = _async_request  # type: ignore
+    workflows['a'] = {'req_client': async_client}
+    workflows['c'] = {'req_client': async_client}
+
+    # (the workflows may be specified by an iterator)
+    response = await workflows_manager.multi_request(
+        '', (w_id for w_id in 'abc')
+    )
+    assert response[0] == 'ok'
+    assert isinstance(response[1], WorkflowStopped)
+    assert len(response) == 2
+
+
 async def test_multi_request_gather_errors(
     workflows_manager,
     async_client: "AsyncClientFixture",
@@ -288,3 +795,63 @@ async def test_crashed_workflow(one_workflow_aiter, caplog, uis_caplog):
     assert 'register_workflow' in caplog.records[0].message
     # and one when it failed to connect
     assert 'Could not connect' in caplog.records[1].message
+
+
+async def test_multi_request_limit(workflows_manager: WorkflowsManager):
+    """It limits concurrency, preserves order and respects the deadline."""
+    active = []
+    max_active = []
+    sent = []
+
+    class Client:
+        DEFAULT_TIMEOUT = 5
+
+        def __init__(self, workflow, delay):
+            self.workflow = workflow
+            self.delay = delay
+
+        async def async_request(self, command, args, timeout, req_meta):
+            sent.append(self.workflow)
+            active.append(self.workflow)
+            max_active.append(len(active))
+            try:
+                if timeout and self.delay > timeout:
+                    await asyncio.sleep(timeout)
+                    raise ClientTimeout('timeout')
+                await asyncio.sleep(self.delay)
+            finally:
+                active.remove(self.workflow)
+            return self.workflow
+
+    workflows_manager.MULTI_REQUEST_LIMIT = 2
+    workflows_manager._request_limit = asyncio.Semaphore(2)
+    delays = {'a': 0.03, 'b': 0.01, 'c': 0.02, 'd': 1}
+    for w_id, delay in delays.items():
+        workflows_manager.workflows[w_id] = {
+            'req_client': Client(w_id, delay)
+        }
+
+    # results are returned in the order requested (stopped workflows are
+    # skipped)
+    results = await workflows_manager.multi_request(
+        '', ['a', 'b', 'c', 'd', 'e'], deadline=0.2
+    )
+    assert results[:3] == ['a', 'b', 'c']
+    assert len(results) == 4
+    assert max(max_active) == 2
+    # the slow workflow was cut short by the deadline
+    assert isinstance(results[3], ClientTimeout)
+
+    # one result is returned per workflow requested, but duplicates are only
+    # sent the request once
+    sent.clear()
+    assert await workflows_manager.multi_request(
+        '', ['c', 'b', 'c', 'a']
+    ) == ['c', 'b', 'c', 'a']
+    assert sorted(sent) == ['a', 'b', 'c']
+
+    stats = workflows_manager.get_request_stats()
+    assert stats['a']['count'] == 2
+    assert stats['d']['buckets']['<=0.25'] == 1
+    assert 'e' not in stats
+
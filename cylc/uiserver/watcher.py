@@ -0,0 +1,376 @@
+# Copyright (C) NIWA & British Crown (Met Office) & Contributors.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Watch the run directory for workflow changes using Linux inotify.
+
+This is an alternative to scanning the whole run directory for changes.
+
+Directories are watched down to the install "max depth", workflow
+directories are watched for the creation/removal of their workflow
+definition and service directory, service directories are watched for
+changes to the contact file and database.
+
+Each change is reported as a "candidate" path which may contain workflows
+which have changed (i.e. the directory which needs to be rescanned).
+
+Note, inotify only sees changes made by the local kernel, on network
+filesystems (e.g. NFS) changes made from other hosts (e.g. workflows
+started on other hosts) are not reported. These are picked up by the
+periodic full scan.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+from functools import partial
+import os
+from pathlib import Path
+import struct
+import sys
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from cylc.flow.network.scan import EXCLUDE_FILES
+from cylc.flow.workflow_files import WorkflowFiles
+
+if TYPE_CHECKING:
+    from logging import Logger
+
+
+# inotify constants (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+DIR_MASK = (
+    IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+SERVICE_MASK = DIR_MASK | IN_CLOSE_WRITE
+
+EVENT_HEADER = struct.Struct('iIII')
+
+# files which make a directory a workflow
+FLOW_FILES = {WorkflowFiles.FLOW_FILE, WorkflowFiles.SUITE_RC}
+# files in the service directory which indicate a state change
+SERVICE_FILES = {WorkflowFiles.Service.CONTACT, WorkflowFiles.Service.DB}
+SERVICE = WorkflowFiles.Service.DIRNAME
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(
+            ctypes.util.find_library('c') or 'libc.so.6', use_errno=True
+        )
+        libc.inotify_init1  # noqa: B018 (check the symbol is present)
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class RunDirWatcher:
+    """Watch the run directory for workflow changes.
+
+    Args:
+        run_dir:
+            The directory to watch.
+        max_depth:
+            The maximum depth of workflows within the run directory.
+        callback:
+            Called with a set of candidate paths when changes are detected.
+        overflow_callback:
+            Called if changes may have been missed (i.e. the kernel event
+            queue overflowed), a full scan is required.
+        log:
+            Logger.
+
+    """
+
+    def __init__(
+        self,
+        run_dir: Path,
+        max_depth: int,
+        callback: Callable[[Set[Path]], None],
+        overflow_callback: Callable[[], None],
+        log: 'Logger',
+    ):
+        self.run_dir = Path(run_dir)
+        self.max_depth = max_depth
+        self.callback = callback
+        self.overflow_callback = overflow_callback
+        self.log = log
+        self.libc = _load_libc()
+        self.fd: Optional[int] = None
+        # {watch descriptor: path}
+        self.watches: Dict[int, Path] = {}
+        # workflow directories (only their service dirs are of interest)
+        self.flows: Set[Path] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # directory walks in progress (see _add_tree_async)
+        self.tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def is_available() -> bool:
+        """Return True if inotify is available on this platform."""
+        return _load_libc() is not None
+
+    async def start(self) -> None:
+        """Start watching.
+
+        Raises:
+            OSError:
+                If inotify is unavailable or cannot be initialised or if the
+                run directory cannot be watched.
+
+        """
+        if self.libc is None:
+            raise OSError('inotify is not available on this platform')
+        fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.fd = fd
+        self.loop = asyncio.get_running_loop()
+        if not self._add_watch(self.run_dir, DIR_MASK):
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(self.run_dir))
+        await self._add_tree(self.run_dir)
+        self.loop.add_reader(fd, self._read_events)
+
+    def stop(self) -> None:
+        """Stop watching."""
+        if self.fd is None:
+            return
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.remove_reader(self.fd)
+        os.close(self.fd)
+        self.fd = None
+        for task in self.tasks:
+            task.cancel()
+        self.tasks.clear()
+        self.watches.clear()
+        self.flows.clear()
+
+    def _depth(self, path: Path) -> int:
+        return len(path.relative_to(self.run_dir).parts)
+
+    def _add_watch(self, path: Path, mask: int) -> bool:
+        if self.fd is None or self.libc is None:
+            return False
+        wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(path), mask
+        )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            if errno == 28:  # ENOSPC (max_user_watches exceeded)
+                self.log.warning(
+                    f'Unable to watch {path}: inotify watch limit reached'
+                    ' (see /proc/sys/fs/inotify/max_user_watches).'
+                )
+            return False
+        self.watches[wd] = path
+        return True
+
+    def _walk(self, path: Path) -> Tuple[List[Tuple[Path, int]], Set[Path]]:
+        """Find the directories to watch within a (watched) directory.
+
+        This does not modify the watcher so may be run in a thread, the
+        result is applied on the event loop (see _add_tree).
+
+        Returns:
+            (watches, flows)
+                watches: [(path, mask), ...] the directories to watch.
+                flows: The workflow directories found.
+
+        """
+        watches: List[Tuple[Path, int]] = []
+        flows: Set[Path] = set()
+        stack = [path]
+        while stack:
+            path = stack.pop()
+            try:
+                entries = list(os.scandir(path))
+            except OSError:
+                continue
+            names = {entry.name for entry in entries}
+            if names & FLOW_FILES:
+                # workflow dir: don't descend further than the service dir
+                flows.add(path)
+                if SERVICE in names:
+                    watches.append((path / SERVICE, SERVICE_MASK))
+                continue
+            if self._depth(path) >= self.max_depth:
+                continue
+            for entry in entries:
+                if (
+                    entry.name not in EXCLUDE_FILES
+                    and entry.is_dir(follow_symlinks=True)
+                ):
+                    child = Path(entry.path)
+                    if entry.name == SERVICE:
+                        watches.append((child, SERVICE_MASK))
+                    else:
+                        watches.append((child, DIR_MASK))
+                        stack.append(child)
+        return watches, flows
+
+    async def _add_tree(self, path: Path) -> None:
+        """Watch any sub-directories of a (watched) directory.
+
+        The tree is walked in a thread as this may take a while (e.g. if a
+        directory tree was moved into the run directory), the watches are
+        added on the event loop.
+        """
+        assert self.loop is not None  # (for mypy)
+        watches, flows = await self.loop.run_in_executor(
+            None, self._walk, path
+        )
+        if self.fd is None:
+            # the watcher has been stopped
+            return
+        for sub_path, mask in watches:
+            self._add_watch(sub_path, mask)
+        self.flows.update(flows)
+
+    def _add_tree_async(self, path: Path) -> None:
+        """Watch a new directory tree without blocking the event loop.
+
+        The path is reported again once it is being watched as changes made
+        during the walk may have been missed.
+        """
+        if self.loop is None or not self._add_watch(path, DIR_MASK):
+            return
+        task = self.loop.create_task(self._add_tree(path))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        task.add_done_callback(partial(self._tree_added, path))
+
+    def _tree_added(self, path: Path, task: asyncio.Task) -> None:
+        if self.fd is None or task.cancelled():
+            # the watcher has been stopped
+            return
+        exc = task.exception()
+        if exc:
+            self.log.warning(f'Error watching {path}: {exc}')
+            self.overflow_callback()
+        else:
+            self.callback({path})
+
+    def _read_events(self) -> None:
+        """Read pending events and report the candidate paths."""
+        try:
+            data = os.read(self.fd, 64 * 1024)  # type: ignore[arg-type]
+        except BlockingIOError:
+            return
+        except OSError as exc:
+            self.log.warning(f'Error reading inotify events: {exc}')
+            return
+        candidates: Set[Path] = set()
+        overflow = False
+        for wd, mask, name in self._parse_events(data):
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            overflow |= not self._handle_event(wd, mask, name, candidates)
+        if overflow:
+            self.overflow_callback()
+        elif candidates:
+            self.callback(candidates)
+
+    @staticmethod
+    def _parse_events(data: bytes) -> Iterable:
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            yield wd, mask, os.fsdecode(name)
+
+    def _handle_event(
+        self, wd: int, mask: int, name: str, candidates: Set[Path]
+    ) -> bool:
+        """Handle one event, adding any candidate paths.
+
+        Returns:
+            False if a full scan is required.
+
+        """
+        if mask & IN_IGNORED:
+            # the watch has been removed (e.g. the directory was deleted)
+            self.watches.pop(wd, None)
+            return True
+        path = self.watches.get(wd)
+        if path is None:
+            return True
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            if mask & IN_MOVE_SELF and path != self.run_dir:
+                # the directory has moved elsewhere, its parent will report
+                # the move, stop watching it under the old path
+                self._rm_watch(wd)
+            return path != self.run_dir
+        if path.name == SERVICE:
+            if name in SERVICE_FILES:
+                candidates.add(path.parent)
+            return True
+        child = path / name
+        if mask & IN_ISDIR:
+            if name == SERVICE:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_watch(child, SERVICE_MASK)
+                candidates.add(path)
+            elif path in self.flows or name in EXCLUDE_FILES:
+                # e.g. the log directory of a workflow
+                pass
+            else:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree_async(child)
+                else:
+                    self.flows.discard(child)
+                candidates.add(child)
+        elif name in FLOW_FILES:
+            candidates.add(path)
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self.flows.add(path)
+                if (path / SERVICE).is_dir():
+                    self._add_watch(path / SERVICE, SERVICE_MASK)
+            else:
+                self.flows.discard(path)
+        return True
+
+    def _rm_watch(self, wd: int) -> None:
+        if self.fd is not None and self.libc is not None:
+            self.libc.inotify_rm_watch(self.fd, wd)
+        self.watches.pop(wd, None)
@@ -23,38 +23,62 @@ Includes:
 
 """
 import asyncio
+from bisect import bisect_left
+from collections import OrderedDict
 from contextlib import suppress
+from functools import partial
 from getpass import getuser
+from hashlib import sha256
+import heapq
+from itertools import count
+import os
 from pathlib import Path
 import sys
+from time import time
 from typing import (
-    TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Union
+    TYPE_CHECKING, Any, AsyncIterator, Dict, Iterable, List, NamedTuple,
+    Optional, Set, Tuple, Union
 )
 
 import zmq.asyncio
 
+from cylc.flow.async_util import pipe, scandir
+from cylc.flow.cfgspec.glbl_cfg import glbl_cfg
 from cylc.flow.id import Tokens
-from cylc.flow.exceptions import ClientError, ClientTimeout
+from cylc.flow.exceptions import (
+    ClientError,
+    ClientTimeout,
+    WorkflowStopped,
+)
 from cylc.flow.network import API
 from cylc.flow.network.client import WorkflowRuntimeClient
 from cylc.flow.network.scan import (
     api_version,
-    contact_info,
-    is_active,
+    dir_is_flow,
     scan,
     validate_contact_info
 )
+from cylc.flow.pathutil import get_cylc_run_dir
 from cylc.flow.workflow_files import (
     ContactFileFields as CFF,
+    KeyInfo,
+    KeyOwner,
+    KeyType,
     WorkflowFiles,
+    load_contact_file_async,
 )
 
+from cylc.uiserver.watcher import RunDirWatcher
+
 if TYPE_CHECKING:
     from logging import Logger
 
 
 CLIENT_TIMEOUT = 2.0
 
+# methods of detecting changes to workflows on the filesystem
+WORKFLOW_DISCOVERY_MODES = ('scan', 'inotify')
+
 
 async def workflow_request(
     client: WorkflowRuntimeClient,
@@ -104,6 +128,45 @@ async def run_coros_in_order(*coros):
         await coro
 
 
+@pipe
+async def scan_paths(paths, run_dir, max_depth):
+    """List flows installed in the provided directories.
+
+    Like "scan" but only looks at the given paths (which may themselves be
+    flows), used to rescan the directories which have changed.
+
+    Args:
+        paths:
+            Directories within the run dir to look for workflows in.
+        run_dir:
+            The run dir, all workflow registrations will be given
+            relative to this path.
+        max_depth:
+            The maximum depth of workflows within the run dir.
+
+    Yields:
+        dict - Dictionary containing information about the flow.
+
+    """
+    for path in sorted(paths):
+        try:
+            listing = await scandir(path)
+        except (FileNotFoundError, NotADirectoryError):
+            # the directory has been removed
+            continue
+        name = path.relative_to(run_dir)
+        if dir_is_flow(listing):
+            yield {'name': str(name), 'path': path}
+        elif len(name.parts) < max_depth:
+            # there may be nested flows
+            async for flow in scan(
+                run_dir=run_dir,
+                scan_dir=path,
+                max_depth=max_depth - len(name.parts),
+            ):
+                yield flow
+
+
 def db_file_exists(flow) -> bool:
     """Return True if the workflow database exists."""
     return Path(
@@ -113,6 +176,635 @@ def db_file_exists(flow) -> bool:
     ).exists()
 
 
+class ScanCacheEntry(NamedTuple):
+    # the service dir (and contact file) metadata this entry was read with
+    key: Optional[Tuple]
+    # the contact file contents (None if the workflow is not running)
+    contact: Optional[Dict[str, str]]
+    # whether the workflow database exists
+    db_exists: bool
+
+
+class ScanCache:
+    """Cache the contact info of workflows between scans.
+
+    Most workflows do not change between scans. This cache records the
+    listing of each workflow's service directory along with the inode and
+    mtime of the directory (and contact file) and the information read from
+    it. The contact file is only re-read if any of these have changed.
+
+    This saves reading and parsing the contact file only, the listing and
+    stat calls are made on every scan.
+
+    NOTE: The service directory is listed on every scan (even if the entry
+    is cached) rather than relying on stat alone, this forces NFS clients to
+    refresh their attribute cache so that contact files created on other
+    hosts are seen (see cylc-flow#6506).
+
+    Args:
+        enabled:
+            If False, nothing is cached (but statistics are still recorded).
+
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        # {workflow path: ScanCacheEntry}
+        self.entries: Dict[Path, ScanCacheEntry] = {}
+        # paths seen in the current scan
+        self._seen: Set[Path] = set()
+        self._start = 0.
+        # statistics for the current scan
+        self.hits = 0
+        self.misses = 0
+        # statistics for the last completed scan
+        self.last: Dict[str, float] = {}
+        self.scans = 0
+
+    @staticmethod
+    def _key(path: Path, names: Set[str]) -> Optional[Tuple]:
+        """Return the metadata of the service directory (and contact file).
+
+        Args:
+            path: The workflow run directory.
+            names: The listing of the service directory.
+
+        Returns None if the service directory does not exist.
+        """
+        service = path / WorkflowFiles.Service.DIRNAME
+        try:
+            stat = os.stat(service)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        key: Tuple = (
+            stat.st_ino,
+            stat.st_mtime_ns,
+            WorkflowFiles.Service.CONTACT in names,
+            WorkflowFiles.Service.DB in names,
+        )
+        if WorkflowFiles.Service.CONTACT in names:
+            # the contact file could be replaced within the mtime resolution
+            # of the service directory (e.g. stop and immediate restart)
+            try:
+                stat = os.stat(service / WorkflowFiles.Service.CONTACT)
+            except FileNotFoundError:
+                return (*key, None)
+            key += (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        return key
+
+    async def get(self, flow: dict) -> ScanCacheEntry:
+        """Return the contact info for a flow, reading it if changed."""
+        path = flow['path']
+        self._seen.add(path)
+        service = path / WorkflowFiles.Service.DIRNAME
+        try:
+            names = {sub.name for sub in await scandir(service)}
+        except (FileNotFoundError, NotADirectoryError):
+            names = set()
+        # (record the metadata before reading the contact file so that any
+        # subsequent change will be picked up by the next scan)
+        key = self._key(path, names)
+        entry = self.entries.get(path)
+        if entry and key is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+
+        contact = None
+        db_exists = False
+        if key is not None:
+            db_exists = WorkflowFiles.Service.DB in names
+            if WorkflowFiles.Service.CONTACT in names:
+                contact = await load_contact_file_async(
+                    flow['name'], run_dir=path
+                )
+        entry = ScanCacheEntry(key, contact, db_exists)
+        if self.enabled:
+            self.entries[path] = entry
+        return entry
+
+    def db_exists(self, flow: dict) -> bool:
+        """Return True if the workflow database exists."""
+        entry = self.entries.get(flow['path'])
+        if entry is None:
+            return db_file_exists(flow)
+        return entry.db_exists
+
+    def start(self) -> None:
+        """Call at the start of each scan."""
+        self._seen.clear()
+        self.hits = 0
+        self.misses = 0
+        self._start = time()
+
+    def finish(self, full: bool = True) -> None:
+        """Call at the end of each scan.
+
+        Args:
+            full:
+                True if the whole run dir was scanned, entries for workflows
+                which were not seen will be removed.
+
+        """
+        if full:
+            for path in set(self.entries) - self._seen:
+                del self.entries[path]
+        self.scans += 1
+        self.last = {
+            'full': full,
+            'workflows': len(self._seen),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / max(len(self._seen), 1),
+            'duration': time() - self._start,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'scans': self.scans,
+            'cached': len(self.entries),
+            'last': dict(self.last),
+        }
+
+
+@pipe
+async def cached_contact_info(flow, cache):
+    """Read information from the contact file, if the flow is running.
+
+    Combines the "is_active" and "contact_info" steps, using the cache to
+    avoid re-reading the contact file of flows which have not changed.
+
+    Returns False for flows which are not running (use filter_stop=False to
+    yield them).
+
+    Args:
+        flow (dict):
+            Flow information dictionary, provided by scan through the pipe.
+        cache (ScanCache):
+            The scan cache.
+
+    """
+    entry = await cache.get(flow)
+    if entry.contact is None:
+        return False
+    flow['contact'] = (
+        flow['path']
+        / WorkflowFiles.Service.DIRNAME
+        / WorkflowFiles.Service.CONTACT
+    )
+    flow.update(entry.contact)
+    return flow
+
+
+class LatencyHistogram:
+    """Request latency histogram.
+
+    Counts the number of requests which completed within each bucket.
+    """
+
+    # bucket upper bounds (seconds)
+    BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.)
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def observe(self, duration: float) -> None:
+        self.counts[bisect_left(self.BUCKETS, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Examples:
+            >>> histogram = LatencyHistogram()
+            >>> histogram.observe(0.03)
+            >>> histogram.observe(20)
+            >>> stats = histogram.stats()
+            >>> stats['buckets']['<=0.05'], stats['buckets']['>10.0']
+            (1, 1)
+            >>> stats['count'], stats['max']
+            (2, 20)
+
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.,
+            'max': self.max,
+            'buckets': {
+                **{
+                    f'<={bound}': count
+                    for bound, count in zip(self.BUCKETS, self.counts)
+                },
+                f'>{self.BUCKETS[-1]}': self.counts[-1],
+            },
+        }
+
+
+class ClientPool:
+    """Reuse workflow clients when workflows reconnect to the same endpoint.
+
+    Clients are keyed by (host, port, key fingerprint), the fingerprint
+    changes whenever the workflow's CurveZMQ keys are regenerated (i.e. each
+    time the scheduler starts). Released clients are kept idle for up to
+    ``ttl`` seconds in case the workflow reconnects (e.g. if the workflow was
+    briefly detected as stopped or re-registered whilst the scheduler kept
+    running), this saves re-creating the socket and re-loading the keys.
+
+    All clients share the workflow manager's ZMQ context.
+
+    Args:
+        context:
+            The ZMQ context to create sockets in.
+        ttl:
+            Idle clients are stopped after this many seconds.
+
+    """
+
+    def __init__(self, context, ttl: float = 300.):
+        self.context = context
+        self.ttl = ttl
+        # {key: (client, release time)} (oldest first)
+        self.idle: 'OrderedDict[Tuple, Tuple[WorkflowRuntimeClient, float]]'
+        self.idle = OrderedDict()
+        # {id(client): key} for clients in use
+        self._keys: Dict[int, Tuple] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(flow: dict) -> Optional[Tuple]:
+        """Return the pool key for a flow or None if it cannot be pooled."""
+        try:
+            srv_dir = str(Path(flow['path'], WorkflowFiles.Service.DIRNAME))
+            fingerprint = sha256()
+            for key_info in (
+                KeyInfo(
+                    KeyType.PUBLIC, KeyOwner.SERVER, workflow_srv_dir=srv_dir
+                ),
+                KeyInfo(
+                    KeyType.PRIVATE, KeyOwner.CLIENT, workflow_srv_dir=srv_dir
+                ),
+            ):
+                with open(key_info.full_key_path, 'rb') as key_file:
+                    fingerprint.update(key_file.read())
+            return (
+                flow['name'],
+                flow[CFF.HOST],
+                str(flow[CFF.PORT]),
+                fingerprint.hexdigest(),
+            )
+        except (KeyError, OSError):
+            return None
+
+    def acquire(self, flow: dict) -> WorkflowRuntimeClient:
+        """Return a client for the flow, reusing an idle one if possible.
+
+        Raises:
+            ClientError: If a new client cannot be created.
+
+        """
+        self.evict()
+        key = self.key(flow)
+        if key is not None and key in self.idle:
+            client, _ = self.idle.pop(key)
+            self.hits += 1
+        else:
+            client = WorkflowRuntimeClient(flow['name'], context=self.context)
+            self.misses += 1
+        if key is not None:
+            self._keys[id(client)] = key
+        return client
+
+    def release(self, client) -> None:
+        """Return a client to the pool."""
+        key = self._keys.pop(id(client), None)
+        if (
+            key is None
+            or key in self.idle
+            or not self._is_ready(client)
+        ):
+            self._stop(client)
+        else:
+            self.idle[key] = (client, time())
+        self.evict()
+
+    @staticmethod
+    def _is_ready(client) -> bool:
+        """Return True if the client can send a request.
+
+        REQ sockets alternate send/receive, a socket which timed out waiting
+        for a response cannot be reused.
+        """
+        try:
+            return bool(
+                client.socket.getsockopt(zmq.EVENTS) & zmq.POLLOUT
+            )
+        except (AttributeError, zmq.ZMQError):
+            return False
+
+    @staticmethod
+    def _stop(client) -> None:
+        with suppress(IOError, AttributeError):
+            client.stop(stop_loop=False)
+
+    def evict(self, now: Optional[float] = None) -> None:
+        """Stop clients which have been idle for longer than the TTL."""
+        if now is None:
+            now = time()
+        while self.idle:
+            key, (client, released) = next(iter(self.idle.items()))
+            if now - released < self.ttl:
+                break
+            del self.idle[key]
+            self._stop(client)
+            self.evictions += 1
+
+    def close(self) -> None:
+        """Stop all idle clients."""
+        self.evict(now=float('inf'))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'in_use': len(self._keys),
+            'idle': len(self.idle),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class ConnectQueue:
+    """Limit the number of workflows connecting at once.
+
+    Connecting to a workflow involves subscribing to it and loading its
+    entire data-store, connecting to hundreds of workflows at once (e.g. on
+    server startup) would saturate the CPU and network.
+
+    Connections are made in priority order (highest first), the queue can be
+    paused whilst a scan is in progress so that all workflows discovered by
+    the scan are prioritised together.
+
+    Args:
+        limit:
+            The maximum number of concurrent connections.
+        log:
+            Logger.
+
+    """
+
+    def __init__(self, limit: int, log: 'Logger'):
+        self.limit = limit
+        self.log = log
+        # [(-priority, sequence, workflow_id)]
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = count()
+        # {workflow_id: coroutine function} for queued connections
+        self.pending: Dict[str, Any] = {}
+        # {workflow_id: task} for connections in progress
+        self.active: Dict[str, asyncio.Task] = {}
+        # {workflow_id: future} resolved when the connection completes
+        self.futures: Dict[str, asyncio.Future] = {}
+        self.paused = False
+        # progress of the current batch of connections
+        self.total = 0
+        self.connected = 0
+        self.failed = 0
+
+    def submit(
+        self, w_id: str, priority: float, connect
+    ) -> 'asyncio.Future[bool]':
+        """Queue a connection.
+
+        Args:
+            w_id: The workflow ID.
+            priority: Higher priority connections are made first.
+            connect: Coroutine function which connects to the workflow.
+
+        Returns:
+            Future which resolves to True if the connection was successful.
+
+        """
+        if w_id in self.futures:
+            # already queued / connecting
+            return self.futures[w_id]
+        if not self.pending and not self.active:
+            # start a new batch
+            self.total = self.connected = self.failed = 0
+        future = asyncio.get_running_loop().create_future()
+        self.futures[w_id] = future
+        heapq.heappush(self._heap, (-priority, next(self._seq), w_id))
+        self.pending[w_id] = connect
+        self.total += 1
+        self._dispatch()
+        return future
+
+    def cancel(self, w_id: str) -> None:
+        """Remove a queued connection (connections in progress continue)."""
+        if self.pending.pop(w_id, None) is not None:
+            self.total -= 1
+            self._resolve(w_id, False)
+
+    def _resolve(self, w_id: str, result: bool) -> None:
+        future = self.futures.pop(w_id, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def pause(self) -> None:
+        """Queue connections but don't start them."""
+        self.paused = True
+
+    def resume(self) -> None:
+        """Start queued connections."""
+        self.paused = False
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while (
+            not self.paused
+            and self._heap
+            and len(self.active) < self.limit
+        ):
+            *_, w_id = heapq.heappop(self._heap)
+            connect = self.pending.pop(w_id, None)
+            if connect is None:
+                # cancelled
+                continue
+            task = asyncio.create_task(connect())
+            self.active[w_id] = task
+            task.add_done_callback(partial(self._done, w_id))
+
+    def _done(self, w_id: str, task: asyncio.Task) -> None:
+        self.active.pop(w_id, None)
+        success = False
+        if not task.cancelled():
+            exc = task.exception()
+            if exc:
+                self.log.exception(exc)
+            else:
+                # NOTE: WorkflowsManager._connect returns False on failure
+                success = task.result() is not False
+        if success:
+            self.connected += 1
+        else:
+            self.failed += 1
+        self._resolve(w_id, success)
+        if self.total <= self.limit:
+            # no connections were held back, don't report progress
+            pass
+        elif not self.pending and not self.active:
+            self.log.info(
+                f'Connected to {self.connected} of {self.total} workflows'
+                + (f' ({self.failed} failed)' if self.failed else '')
+            )
+        elif (self.connected + self.failed) % self.limit == 0:
+            self.log.info(
+                f'Connecting to workflows:'
+                f' {self.connected + self.failed} of {self.total}'
+            )
+        self._dispatch()
+
+    def stop(self) -> None:
+        """Cancel queued and in-progress connections."""
+        for w_id in list(self.pending):
+            self.cancel(w_id)
+        self._heap.clear()
+        for task in self.active.values():
+            task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'limit': self.limit,
+            'total': self.total,
+            'queued': len(self.pending),
+            'connecting': len(self.active),
+            'connected': self.connected,
+            'failed': self.failed,
+        }
+
+
+def last_active(flow: dict) -> float:
+    """Return the time a workflow was last active.
+
+    Running workflows write to their database as they go so its mtime is a
+    good indication of recent activity.
+    """
+    try:
+        return os.stat(
+            Path(
+                flow['path'],
+                WorkflowFiles.Service.DIRNAME,
+                WorkflowFiles.Service.DB,
+            )
+        ).st_mtime
+    except (KeyError, OSError):
+        return 0.
+
+
+class ScanScheduler:
+    """Schedule workflow scans at an adaptive interval.
+
+    Scans are performed frequently after a change (e.g. a workflow has been
+    started or a state change has been detected), the interval then backs off
+    exponentially towards the maximum whilst nothing changes.
+
+    The interval is never less than SCAN_LOAD_FACTOR x the duration of the
+    last scan, so slow filesystems are not hammered.
+
+    Args:
+        callback:
+            Coroutine function which requests a scan.
+        min_interval:
+            The minimum interval between scans (seconds).
+        max_interval:
+            The maximum interval between scans (seconds).
+
+    """
+
+    # multiply the interval by this for each scan which detects no changes
+    BACKOFF = 2.
+    # scans should not take more than 1/SCAN_LOAD_FACTOR of the time
+    SCAN_LOAD_FACTOR = 10.
+
+    def __init__(self, callback, min_interval: float, max_interval: float):
+        self.callback = callback
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min_interval
+        self.last_duration = 0.
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    def start(self) -> None:
+        """Start scheduling scans."""
+        self._schedule()
+
+    def stop(self) -> None:
+        """Stop scheduling scans."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self) -> None:
+        self.stop()
+        self._handle = asyncio.get_running_loop().call_later(
+            self.interval, self._fire
+        )
+
+    def _fire(self) -> None:
+        # schedule the next scan now in case this request is dropped
+        # (e.g. a scan is already queued), record() will reschedule it
+        self._schedule()
+        asyncio.ensure_future(self.callback())
+
+    def _bound(self, interval: float) -> float:
+        return min(
+            max(
+                interval,
+                self.min_interval,
+                self.last_duration * self.SCAN_LOAD_FACTOR,
+            ),
+            # (the scan load limit takes priority over the maximum)
+            max(self.max_interval, self.last_duration * self.SCAN_LOAD_FACTOR)
+        )
+
+    def expedite(self) -> None:
+        """Scan frequently, changes are expected (e.g. a workflow started)."""
+        self.interval = self._bound(self.min_interval)
+        if self._handle is not None:
+            self._schedule()
+
+    def record(self, changed: bool, duration: float) -> None:
+        """Record the result of a scan and schedule the next one.
+
+        Args:
+            changed:
+                True if the scan detected any changes.
+            duration:
+                The time the scan took (seconds).
+
+        """
+        self.last_duration = duration
+        if changed:
+            self.interval = self._bound(self.min_interval)
+        else:
+            self.interval = self._bound(self.interval * self.BACKOFF)
+        if self._handle is not None:
+            self._schedule()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'interval': self.interval,
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval,
+        }
+
+
 class WorkflowsManager:  # noqa: SIM119
     """Object for tracking workflows by performing filesystem scans.
 
@@ -121,9 +813,25 @@ class WorkflowsManager:  # noqa: SIM119
 
     """
 
-    def __init__(self, uiserver, log, context=None, run_dir=None) -> None:
+    # wait this long after a filesystem change before updating
+    # (allows related changes to be handled together)
+    WATCH_DELAY = 0.5
+
+    # the maximum number of concurrent multi_request requests
+    MULTI_REQUEST_LIMIT = 50
+
+    def __init__(
+        self,
+        uiserver,
+        log,
+        context=None,
+        run_dir=None,
+        scan_cache=False,
+        connect_limit=0,
+    ) -> None:
         self.uiserver = uiserver
         self.log = log
+        self.run_dir = run_dir
         if context is None:
             self.context = zmq.asyncio.Context()
         else:
@@ -133,20 +841,41 @@ class WorkflowsManager:  # noqa: SIM119
         # all workflows currently tracked
         self.workflows: 'Dict[str, Dict]' = {}
 
+        # contact info from previous scans
+        self.scan_cache = ScanCache(enabled=scan_cache)
+
+        # the adaptive scan scheduler (if enabled)
+        self.scan_scheduler: Optional[ScanScheduler] = None
+
+        # workflow clients (reused when workflows reconnect)
+        self.client_pool = ClientPool(self.context)
+
+        # limits the number of concurrent requests sent by multi_request
+        self._request_limit = asyncio.Semaphore(self.MULTI_REQUEST_LIMIT)
+        # {workflow_id: LatencyHistogram}
+        self.request_latency: Dict[str, LatencyHistogram] = {}
+
+        # limits the number of workflows connecting at once (if enabled)
+        self.connect_queue: Optional[ConnectQueue] = (
+            ConnectQueue(connect_limit, log) if connect_limit > 0 else None
+        )
+        # True until the first scan has completed
+        self._startup = True
+
         # the "workflow pipe" used to detect workflows on the filesystem
-        self._scan_pipe = (
+        self._scan_pipe = self._workflow_pipe(
             # all flows on the filesystem
             scan(run_dir)
-            # stop here is the flow is stopped, else...
-            | is_active(is_active=True, filter_stop=False)
-            # extract info from the contact file
-            | contact_info
-            # ensure required contact file fields are present
-            | validate_contact_info
-            # only flows which are using the same api version
-            | api_version(f'=={API}')
         )
 
+        # the filesystem watcher (if workflow_discovery = inotify)
+        self.watcher: Optional[RunDirWatcher] = None
+        # directories which have changed since the last update
+        self._changed_paths: Set[Path] = set()
+        # True if the next update must scan the whole run dir
+        self._full_scan = True
+        self._watch_handle: Optional[asyncio.TimerHandle] = None
+
         # queue for requesting new scans, valid queued values are:
         # * True  - (stop=True)  The stop signal (stops the scanner)
         # * False - (stop=False) Request a new scan
@@ -157,12 +886,103 @@ class WorkflowsManager:  # noqa: SIM119
         # will be ignored
         self._stopping = False
 
+    def _workflow_pipe(self, flows):
+        """Extend a pipe of flows on the filesystem with their contact info."""
+        return (
+            flows
+            # extract info from the contact file (stop here if the flow is
+            # stopped)
+            | cached_contact_info(self.scan_cache, filter_stop=False)
+            # ensure required contact file fields are present
+            | validate_contact_info
+            # only flows which are using the same api version
+            | api_version(f'=={API}')
+        )
+
     def get_workflows(self):
         return self.uiserver.data_store_mgr.get_workflows()
 
-    async def _workflow_state_changes(self):
+    def get_scan_stats(self) -> Dict[str, Any]:
+        """Return workflow scan statistics."""
+        stats = self.scan_cache.stats()
+        if self.scan_scheduler:
+            stats['schedule'] = self.scan_scheduler.stats()
+        stats['clients'] = self.client_pool.stats()
+        if self.connect_queue:
+            stats['connections'] = self.connect_queue.stats()
+        return stats
+
+    async def watch(self) -> bool:
+        """Watch the run dir for changes rather than relying on scans.
+
+        Changes are detected using inotify, the periodic scan should be
+        retained (at a lower frequency) as a safety net.
+
+        Returns:
+            False if the filesystem cannot be watched, in which case updates
+            will continue to rely on scans.
+
+        """
+        run_dir = Path(self.run_dir or get_cylc_run_dir())
+        watcher = RunDirWatcher(
+            run_dir,
+            glbl_cfg().get(['install', 'max depth']),
+            self._on_change,
+            self._on_overflow,
+            self.log,
+        )
+        try:
+            await watcher.start()
+        except OSError as exc:
+            self.log.warning(
+                f'Could not watch {run_dir} ({exc}),'
+                ' falling back to workflow scans.'
+            )
+            watcher.stop()
+            return False
+        self.watcher = watcher
+        self.log.info(f'Watching for workflow changes in {run_dir}')
+        return True
+
+    def _on_change(self, paths: Set[Path]) -> None:
+        """Queue an update for directories which have changed."""
+        self._changed_paths.update(paths)
+        if self._watch_handle is None:
+            self._watch_handle = asyncio.get_running_loop().call_later(
+                self.WATCH_DELAY, self._request_update
+            )
+
+    def _on_overflow(self) -> None:
+        """Queue a full scan (changes may have been missed)."""
+        self.log.debug('Filesystem events may have been missed, rescanning')
+        self._full_scan = True
+        self._request_update()
+
+    def _request_update(self) -> None:
+        self._watch_handle = None
+        if not self._stopping and self._queue.empty():
+            self._queue.put_nowait(False)
+
+    def _in_scope(self, wid: str, names: Set[str]) -> bool:
+        """Return True if the workflow is within any of the named dirs."""
+        workflow = Tokens(wid)['workflow']
+        return any(
+            workflow == name or workflow.startswith(f'{name}/')
+            for name in names
+        )
+
+    async def _workflow_state_changes(self, scan_pipe=None, scope=None):
         """Scan workflows and yield state change events.
 
+        Args:
+            scan_pipe:
+                The pipe to detect workflows with, defaults to a scan of the
+                whole run dir.
+            scope:
+                If the pipe only scans part of the run dir, the directories
+                it covers (relative to the run dir). Workflows outside of
+                these directories will not be reported as removed.
+
         Yields:
             tuple - (wid, before, after, flow)
 
@@ -177,11 +997,18 @@ class WorkflowsManager:  # noqa: SIM119
 
         """
         active_before, inactive_before = self.get_workflows()
+        if scope is not None:
+            active_before = {
+                wid for wid in active_before if self._in_scope(wid, scope)
+            }
+            inactive_before = {
+                wid for wid in inactive_before if self._in_scope(wid, scope)
+            }
 
         active = set()
         inactive = set()
 
-        async for flow in self._scan_pipe:
+        async for flow in scan_pipe or self._scan_pipe:
             # where possible yield results within this `async for` loop to
             # allow the data store to get to work whilst we complete the scan
             # (prevents one slow filesystem operation holding up the works)
@@ -198,7 +1025,7 @@ class WorkflowsManager:  # noqa: SIM119
                     # if the workflow has previously started...
                     self.workflows.get(wid, {}).get(CFF.UUID)
                     # ...but the database has since been removed...
-                    and not db_file_exists(flow)
+                    and not self.scan_cache.db_exists(flow)
                 ):
                     # ...then it is no longer the same run, the transition is:
                     #   <before-state> => None > <after-state>
@@ -259,33 +1086,64 @@ class WorkflowsManager:  # noqa: SIM119
     async def _connect(self, wid, flow):
         """Open a connection to a running workflow."""
         try:
-            flow['req_client'] = WorkflowRuntimeClient(flow['name'])
+            flow['req_client'] = self.client_pool.acquire(flow)
         except ClientError as exc:
             self.log.debug(f'Could not connect to {wid}: {exc}')
             return False
         self.workflows[wid] = flow
-        await self.uiserver.data_store_mgr.connect_workflow(
+        # (connect_workflow returns False on failure)
+        return await self.uiserver.data_store_mgr.connect_workflow(
             wid,
             flow
+        ) is not False
+
+    async def _queue_connect(
+        self, wid, flow, queued: Optional[asyncio.Event] = None
+    ):
+        """Connect to a running workflow via the connect queue (if enabled).
+
+        The workflow is marked as "connecting" whilst it waits in the queue.
+
+        Args:
+            wid: The workflow ID.
+            flow: The workflow as returned by the scan.
+            queued: Event to set once the connection has been queued.
+
+        """
+        if self.connect_queue is None:
+            if queued is not None:
+                queued.set()
+            return await self._connect(wid, flow)
+        self.uiserver.data_store_mgr.set_status_msg(wid, 'connecting')
+        future = self.connect_queue.submit(
+            wid, last_active(flow), partial(self._connect, wid, flow)
         )
-        return True
+        if queued is not None:
+            queued.set()
+        return await future
 
     async def _disconnect(self, wid):
         """Disconnect from a running workflow.
 
         Marks the workflow as stopped.
         """
+        if self.connect_queue:
+            self.connect_queue.cancel(wid)
         self.uiserver.data_store_mgr.disconnect_workflow(wid)
-        with suppress(KeyError, IOError):
-            self.workflows[wid]['req_client'].stop(stop_loop=False)
         with suppress(KeyError):
+            client = self.workflows[wid]['req_client']
+            if client:
+                self.client_pool.release(client)
             self.workflows[wid]['req_client'] = None
 
     async def _unregister(self, wid):
         """Unregister a workflow from the data store."""
+        if self.connect_queue:
+            self.connect_queue.cancel(wid)
         await self.uiserver.data_store_mgr.unregister_workflow(wid)
         if wid in self.workflows:
             self.workflows.pop(wid)
+        self.request_latency.pop(wid, None)
 
     async def update(self) -> None:
         """Scans for workflows, handles any state changes.
@@ -302,17 +1160,62 @@ class WorkflowsManager:  # noqa: SIM119
 
         Between scans workflows can jump from any state to any other state.
 
+        If the run dir is being watched, only the directories which have
+        changed since the last update are scanned (unless a full scan has
+        been requested).
+
         """
+        full = self._full_scan or self.watcher is None
+        if full:
+            self._full_scan = False
+            self._changed_paths.clear()
+            changes = self._workflow_state_changes()
+        elif self._changed_paths:
+            assert self.watcher is not None  # (for mypy)
+            paths, self._changed_paths = self._changed_paths, set()
+            changes = self._workflow_state_changes(
+                self._workflow_pipe(
+                    scan_paths(
+                        paths,
+                        self.watcher.run_dir,
+                        self.watcher.max_depth,
+                    )
+                ),
+                scope={
+                    path.relative_to(self.watcher.run_dir).as_posix()
+                    for path in paths
+                },
+            )
+        else:
+            return
+
         tasks: List[asyncio.Task] = []
+        # set once each connection has been queued (or abandoned)
+        queued: List[asyncio.Event] = []
+        self.scan_cache.start()
+        if self._startup and self.connect_queue:
+            # staged startup: connect to the most recently active workflows
+            # first, this requires the results of the entire scan
+            self.connect_queue.pause()
 
         def run(*coros):
             # start tasks running as soon as possible
             # (we could be connecting to workflows whilst the scan is still
             # running)
-            tasks.append(asyncio.create_task(run_coros_in_order(*coros)))
+            task = asyncio.create_task(run_coros_in_order(*coros))
+            tasks.append(task)
+            return task
+
+        def connect(wid, flow, *coros):
+            # run the coros then queue a connection to the workflow
+            event = asyncio.Event()
+            task = run(*coros, self._queue_connect(wid, flow, event))
+            # (the task may fail before the connection is queued)
+            task.add_done_callback(lambda _: event.set())
+            queued.append(event)
 
         # handle state changes
-        async for wid, before, after, flow in self._workflow_state_changes():
+        async for wid, before, after, flow in changes:
             if before == 'active':
                 if after == 'inactive':
                     # workflow has stopped
@@ -328,9 +1231,8 @@ class WorkflowsManager:  # noqa: SIM119
             elif before is None:
                 if after == 'active':
                     # workflow has been created and started
-                    run(
-                        self._register(wid, flow, is_active=True),
-                        self._connect(wid, flow),
+                    connect(
+                        wid, flow, self._register(wid, flow, is_active=True)
                     )
 
                 elif after == 'inactive':
@@ -340,7 +1242,7 @@ class WorkflowsManager:  # noqa: SIM119
             elif before == 'inactive':
                 if after == 'active':
                     # workflow has been started
-                    run(self._connect(wid, flow))
+                    connect(wid, flow)
 
                 elif after is None:
                     # workflow has been deleted
@@ -361,8 +1263,24 @@ class WorkflowsManager:  # noqa: SIM119
                 ])
                 if after == 'active':
                     # connect to the new workflow
-                    cmds.append(self._connect(wid, flow))
-                run(*cmds)
+                    connect(wid, flow, *cmds)
+                else:
+                    run(*cmds)
+
+        # record scan statistics (see the metrics endpoint)
+        self.scan_cache.finish(full)
+        self.client_pool.evict()
+        if full and self.scan_scheduler:
+            self.scan_scheduler.record(
+                bool(tasks), self.scan_cache.last['duration']
+            )
+
+        if self.connect_queue and self.connect_queue.paused:
+            # wait for the tasks to queue their connections, then connect in
+            # priority order
+            await asyncio.gather(*(event.wait() for event in queued))
+            self.connect_queue.resume()
+        self._startup = False
 
         # wait for everything we have actioned to complete before returning
         await asyncio.gather(*tasks)
@@ -374,32 +1292,165 @@ class WorkflowsManager:  # noqa: SIM119
         args: Optional[Dict[str, Any]] = None,
         multi_args: Optional[Dict[str, Any]] = None,
         timeout=None,
-        req_meta: Optional[Dict[str, Any]] = None
+        req_meta: Optional[Dict[str, Any]] = None,
+        deadline: Optional[float] = None,
     ) -> List[Union[bytes, object, Exception]]:
-        """Send requests to multiple workflows."""
-        if args is None:
-            args = {}
-        if multi_args is None:
-            multi_args = {}
-        if req_meta is None:
-            req_meta = {}
-        gathers = [
-            workflow_request(
-                self.workflows[w_id]['req_client'],
+        """Send requests to multiple workflows.
+
+        At most MULTI_REQUEST_LIMIT requests are in flight at once (across
+        all callers).
+
+        Args:
+            command: Command/Endpoint name.
+            workflows: The workflows to send the request to.
+            args: Endpoint arguments.
+            multi_args: Endpoint arguments for specific workflows.
+            timeout: Client request timeout (secs).
+            req_meta: Meta data related to request, e.g. auth_user
+            deadline:
+                Time allowed for all requests to complete (secs). Request
+                timeouts are reduced to fit within the deadline, requests
+                which have not been sent when it passes fail with
+                ClientTimeout.
+
+        Returns:
+            One response (or exception) for each of the workflows requested
+            in the order requested, stopped workflows are skipped.
+
+            Workflows which are listed more than once are only sent the
+            request once, the response is repeated for each listing.
+
+        """
+        targets = self._targets(workflows)
+        results = {
+            w_id: result
+            async for w_id, result in self._multi_request_iter(
+                list(dict.fromkeys(targets)),
                 command,
-                multi_args.get(w_id, args),
+                args,
+                multi_args,
                 timeout,
-                log=self.log,
-                req_meta=req_meta
+                req_meta,
+                deadline,
             )
+        }
+        return [results[w_id] for w_id in targets]
+
+    def _targets(self, workflows: Iterable[str]) -> List[str]:
+        """Return the workflows which can be requested (i.e. running)."""
+        return [
+            w_id
             for w_id in workflows
             # skip stopped workflows
             if self.workflows.get(w_id, {}).get('req_client')
         ]
-        return await asyncio.gather(*gathers, return_exceptions=True)
 
-    async def scan(self):
-        """Request a new workflow scan."""
+    async def _multi_request_iter(
+        self,
+        targets: List[str],
+        command: str,
+        args: Optional[Dict[str, Any]] = None,
+        multi_args: Optional[Dict[str, Any]] = None,
+        timeout=None,
+        req_meta: Optional[Dict[str, Any]] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[Tuple[str, Union[bytes, object, Exception]]]:
+        """Send requests to the targets, yield responses as they arrive.
+
+        A response is yielded for every target, workflows which have
+        stopped since the targets were determined yield WorkflowStopped.
+        """
+        if args is None:
+            args = {}
+        if multi_args is None:
+            multi_args = {}
+        if req_meta is None:
+            req_meta = {}
+        loop = asyncio.get_running_loop()
+        end = None if deadline is None else loop.time() + deadline
+
+        async def _request(w_id):
+            async with self._request_limit:
+                client = self.workflows.get(w_id, {}).get('req_client')
+                if client is None:
+                    # the workflow has stopped since the request was made
+                    return w_id, WorkflowStopped(w_id)
+                req_timeout = timeout
+                if end is not None:
+                    remaining = end - loop.time()
+                    if remaining <= 0:
+                        exc = ClientTimeout(
+                            f'Deadline passed before contacting {w_id}'
+                        )
+                        exc.workflow = client.workflow
+                        return w_id, exc
+                    req_timeout = min(
+                        timeout or client.DEFAULT_TIMEOUT, remaining
+                    )
+                start = loop.time()
+                try:
+                    return w_id, await workflow_request(
+                        client,
+                        command,
+                        multi_args.get(w_id, args),
+                        req_timeout,
+                        log=self.log,
+                        req_meta=req_meta
+                    )
+                except Exception as exc:
+                    return w_id, exc
+                finally:
+                    self.request_latency.setdefault(
+                        w_id, LatencyHistogram()
+                    ).observe(loop.time() - start)
+
+        tasks = [asyncio.create_task(_request(w_id)) for w_id in targets]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # the caller has stopped listening
+            for task in tasks:
+                task.cancel()
+
+    def get_request_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return request latency histograms by workflow."""
+        return {
+            w_id: histogram.stats()
+            for w_id, histogram in self.request_latency.items()
+        }
+
+    def schedule_scans(self, min_interval: float, max_interval: float):
+        """Scan at an adaptive interval.
+
+        See ScanScheduler.
+        """
+        self.scan_scheduler = ScanScheduler(
+            self.scan, min_interval, max_interval
+        )
+        self.scan_scheduler.start()
+
+    async def scan(self, expedite: bool = False, full: bool = False):
+        """Request a new workflow scan.
+
+        If the run dir is being watched, only the directories which have
+        changed are rescanned unless a full scan is requested (otherwise
+        every scan is a full scan).
+
+        Args:
+            expedite:
+                Changes are expected soon (e.g. a workflow has been asked to
+                start or stop), scan more frequently for a while (see
+                schedule_scans). If the run dir is being watched, these
+                changes are detected by the watcher.
+            full:
+                Scan the whole run dir, even if it is being watched.
+
+        """
+        if expedite and self.scan_scheduler:
+            self.scan_scheduler.expedite()
+        if full or self.watcher is None:
+            self._full_scan = True
         if not self._stopping and self._queue.empty():
             await self._queue.put(False)
 
@@ -437,6 +1488,16 @@ class WorkflowsManager:  # noqa: SIM119
         """
         # prevent any new scans being requested
         self._stopping = True
+        if self.scan_scheduler:
+            self.scan_scheduler.stop()
+        if self.connect_queue:
+            self.connect_queue.stop()
+        self.client_pool.close()
+        if self._watch_handle is not None:
+            self._watch_handle.cancel()
+            self._watch_handle = None
+        if self.watcher is not None:
+            self.watcher.stop()
         # wipe any scan requests
         while not self._queue.empty():
             status = await self._queue.get()
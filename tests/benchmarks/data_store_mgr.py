@@ -0,0 +1,134 @@
+# Copyright (C) NIWA & British Crown (Met Office) & Contributors.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Microbenchmarks for the data store manager.
+
+Usage:
+    python tests/benchmarks/data_store_mgr.py [WORKFLOWS [ELEMENTS]]
+"""
+
+import asyncio
+from copy import deepcopy
+import logging
+import sys
+from time import perf_counter
+
+from cylc.flow.data_messages_pb2 import (  # type: ignore
+    PbEntireWorkflow,
+    PbFamilyProxy,
+)
+from cylc.flow.data_store_mgr import DATA_TEMPLATE, generate_checksum
+
+from cylc.uiserver.data_store_mgr import (
+    DataStoreMgr,
+    TopicChecksum,
+    new_workflow_store,
+)
+from cylc.uiserver.workflows_mgr import WorkflowsManager
+
+
+def timed(name, number, fcn, unit='workflows'):
+    start = perf_counter()
+    fcn()
+    duration = perf_counter() - start
+    print(
+        f'{name:<28} {duration * 1000:8.1f}ms'
+        f' {number / duration:10.0f} {unit}/s'
+    )
+
+
+def make_entire_workflow(w_id):
+    entire_workflow = PbEntireWorkflow()
+    entire_workflow.workflow.id = w_id
+    root_family = PbFamilyProxy()
+    root_family.id = f'{w_id}//1/root'
+    entire_workflow.family_proxies.extend([root_family])
+    return entire_workflow.SerializeToString()
+
+
+def checksums(elements, deltas=1000):
+    """Maintain the checksum of a topic whilst single elements change."""
+    stamps = [f'~user/workflow//1/task{ind}@0.0' for ind in range(elements)]
+    changes = [
+        (stamps[ind], f'{stamps[ind][:-4]}@{ind + 1}.0')
+        for ind in range(0, elements, max(elements // deltas, 1))
+    ][:deltas]
+
+    def full():
+        current = set(stamps)
+        for old, new in changes:
+            current.remove(old)
+            current.add(new)
+            value = generate_checksum(current)
+        return value
+
+    def incremental():
+        checksum = TopicChecksum(stamps)
+        for old, new in changes:
+            checksum.remove(old)
+            checksum.add(new)
+            value = checksum.value
+        return value
+
+    print(f'checksums ({elements} elements):')
+    timed('generate_checksum', len(changes), full, unit='deltas')
+    timed('TopicChecksum', len(changes), incremental, unit='deltas')
+    assert full() == incremental()
+
+
+def main(number=5000, elements=10000):
+    log = logging.getLogger('benchmark')
+    log.setLevel(logging.WARNING)
+    w_ids = [f'~user/workflow{ind}' for ind in range(number)]
+    dumps = [make_entire_workflow(w_id) for w_id in w_ids]
+
+    timed(
+        'deepcopy(DATA_TEMPLATE)',
+        number,
+        lambda: [deepcopy(DATA_TEMPLATE) for _ in w_ids],
+    )
+    timed(
+        'new_workflow_store()',
+        number,
+        lambda: [new_workflow_store() for _ in w_ids],
+    )
+
+    data_store_mgr = DataStoreMgr(WorkflowsManager(None, log), log)
+
+    async def register():
+        for w_id in w_ids:
+            await data_store_mgr.register_workflow(w_id, False)
+
+    timed('register_workflow', number, lambda: asyncio.run(register()))
+    timed(
+        'expand (connect)',
+        number,
+        lambda: [data_store_mgr._expand_workflow(w_id) for w_id in w_ids],
+    )
+    timed(
+        'refresh (parse entire)',
+        number,
+        lambda: [
+            data_store_mgr._parse_entire_workflow(dump, 0.)
+            for dump in dumps
+        ],
+    )
+    data_store_mgr.stop_subscriptions()
+
+    checksums(elements)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
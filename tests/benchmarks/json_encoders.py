@@ -0,0 +1,120 @@
+# Copyright (C) NIWA & British Crown (Met Office) & Contributors.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Microbenchmarks for encoding GraphQL responses.
+
+Usage:
+    python tests/benchmarks/json_encoders.py [ELEMENTS [NUMBER]]
+"""
+
+import json
+import sys
+from time import perf_counter
+
+from cylc.flow.network.graphql import NULL_VALUE, strip_null
+
+from cylc.uiserver.graphql.encoders import json_dumps, orjson, orjson_dumps
+
+
+def timed(name, number, fcn):
+    start = perf_counter()
+    for _ in range(number):
+        fcn()
+    duration = (perf_counter() - start) / number
+    print(f'{name:<36} {duration * 1000:8.1f}ms')
+
+
+def make_response(elements):
+    """Return a GraphQL response with this many task proxies."""
+    return {
+        'data': {
+            'workflows': [{
+                'id': '~user/workflow',
+                'taskProxies': [
+                    {
+                        'id': f'~user/workflow//{ind // 100}/task{ind}',
+                        'name': f'task{ind}',
+                        'state': 'running',
+                        'isHeld': False,
+                        'isQueued': False,
+                        'flowNums': '[1]',
+                        'jobs': [{'id': f'{ind}/01', 'state': 'running'}],
+                    }
+                    for ind in range(elements)
+                ],
+            }],
+        },
+    }
+
+
+def data_search_action(data, action):
+    if isinstance(data, dict):
+        return {
+            key: data_search_action(val, action)
+            for key, val in data.items()
+        }
+    if isinstance(data, list):
+        return [
+            data_search_action(val, action)
+            for val in data
+        ]
+    return action(data)
+
+
+def old_path(response):
+    """The encoder before exceptions were collected during execution.
+
+    Encode, on failure search the response for exceptions, then re-encode.
+    """
+    try:
+        return json.dumps(response, separators=(',', ':'))
+    except TypeError:
+        errors = []
+
+        def exc_to_errors(data):
+            if isinstance(data, Exception):
+                errors.append({'message': f'{data}'})
+                return NULL_VALUE
+            return data
+
+        response = data_search_action(response, exc_to_errors)
+        response.setdefault('errors', []).extend(errors)
+        response = strip_null(response)
+        return json.dumps(response, separators=(',', ':'))
+
+
+def main(elements=50000, number=5):
+    response = make_response(elements)
+    with_exception = make_response(elements)
+    with_exception['data']['workflows'][0]['taskProxies'][-1]['state'] = (
+        ValueError('boom')
+    )
+    print(
+        f'encode a {elements} element result'
+        f' ({len(json_dumps(response))} bytes):'
+    )
+    timed('json', number, lambda: json_dumps(response))
+    if orjson is None:
+        print('orjson                               (not installed)')
+    else:
+        timed('orjson', number, lambda: orjson_dumps(response))
+        assert json.loads(orjson_dumps(response)) == response
+    timed('old path', number, lambda: old_path(response))
+    timed('old path (with an exception)', number,
+          lambda: old_path(with_exception))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))